@@ -0,0 +1,136 @@
+import json
+import os
+import re
+
+SUMMARY_SEPARATOR = '=' * 80
+
+def jsonl_path_for(path):
+    """Structured JSONL artifact that accompanies a human-readable .txt output."""
+    root, ext = os.path.splitext(path)
+    return path if ext == ".jsonl" else f"{root}.jsonl"
+
+def text_path_for(path):
+    """
+    Human-readable output for a requested output path. An output named .jsonl keeps that name
+    for the JSONL artifact and gets its text rendering beside it as .txt, so neither overwrites the other.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.txt" if ext == ".jsonl" else path
+
+def write_jsonl(path, records):
+    """Write records to a JSONL file, one JSON object per line."""
+    with open(path, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def iter_jsonl(path):
+    """Lazily yield records from a JSONL file."""
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+AGENT1_TEXT_HEADER = "# PhD STUDENT AGENT SUMMARIES\nGenerated by AutoScholar System - Agent 1\n\n"
+
+def render_agent1_section(record):
+    """Render one Agent 1 paper record as a section of the summaries file."""
+    return f"## {record['title']}\n\n{record['summary']}\n\n{SUMMARY_SEPARATOR}\n\n"
+
+def render_agent1_text(records):
+    """Render Agent 1 paper records as the human-readable summaries file."""
+    return AGENT1_TEXT_HEADER + "".join(render_agent1_section(record) for record in records)
+
+def render_agent2_text(record):
+    """Render the Agent 2 analysis record as the human-readable fragmentation file."""
+    return (
+        "# POSTDOC AGENT FRAGMENTATION ANALYSIS\n"
+        "Generated by AutoScholar System - Agent 2\n"
+        f"Analyzed {record['papers']} papers\n\n"
+        f"{record['analysis']}"
+    )
+
+def synthesis_paths(path, titles):
+    """
+    Per-main-paper output paths derived from path: agent3_synthesis_X.txt and "Paper A.pdf"
+    give agent3_synthesis_X_Paper_A.txt. Returns (paths, index_path).
+    """
+    root, ext = os.path.splitext(text_path_for(path))
+    ext = ext or ".txt"
+    paths = []
+    for title in titles:
+        stem = re.sub(r"[^\w.-]+", "_", os.path.splitext(os.path.basename(title))[0]).strip("_") or "paper"
+        candidate = f"{root}_{stem}{ext}"
+        suffix = 2
+        while candidate in paths:  # e.g. paper.pdf and paper.docx
+            candidate = f"{root}_{stem}_{suffix}{ext}"
+            suffix += 1
+        paths.append(candidate)
+    return paths, f"{root}_index{ext}"
+
+def render_agent3_index(records):
+    """Render the Agent 3 synthesis records as a human-readable index of main papers and output files."""
+    ok = sum(1 for record in records if record["status"] == "ok")
+    lines = [
+        "# PROFESSOR AGENT SYNTHESIS INDEX",
+        "Generated by AutoScholar System - Agent 3",
+        f"{ok} of {len(records)} main papers synthesized against the same fragmentation analysis",
+        "",
+    ]
+    for i, record in enumerate(records, 1):
+        if record["status"] == "ok":
+            lines.append(f"{i}. {record['main_paper']} -> {record['output'] or '(not saved)'}")
+        else:
+            lines.append(f"{i}. {record['main_paper']} -> FAILED: {record['error']}")
+    return "\n".join(lines) + "\n"
+
+def _parse_agent1_text(path):
+    """Legacy fallback: recover (title, summary) pairs from an Agent 1 .txt file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    sections = content.split("## ")
+    for section in sections[1:]:  # Skip header
+        if section.strip():
+            lines = section.strip().split('\n')
+            if lines:
+                title = lines[0].strip()
+                summary = '\n'.join(lines[1:]).strip()
+                summary = summary.replace(SUMMARY_SEPARATOR, '').strip()
+                if summary and not summary.startswith("ERROR:"):
+                    yield {"title": title, "summary": summary}
+
+def iter_summary_records(input_file):
+    """
+    Lazily yield Agent 1 paper records for input_file.
+    Uses the JSONL artifact when it exists (or is given directly) and falls back to
+    parsing the legacy .txt layout otherwise. Failed ("ERROR: ...") summaries from older
+    outputs are skipped so they never reach Agent 2.
+    """
+    jsonl_path = jsonl_path_for(input_file)
+    if os.path.exists(jsonl_path):
+        for record in iter_jsonl(jsonl_path):
+            summary = record.get("summary")
+            if record.get("type", "paper") == "paper" and summary and not summary.startswith("ERROR:"):
+                yield record
+    else:
+        yield from _parse_agent1_text(input_file)
+
+def load_summaries(input_file):
+    """Return (paper_titles, summaries, file_hashes) from an Agent 1 output."""
+    paper_titles = []
+    summaries = []
+    file_hashes = []
+    for record in iter_summary_records(input_file):
+        paper_titles.append(record["title"])
+        summaries.append(record["summary"])
+        file_hashes.append(record.get("file_hash"))
+    return paper_titles, summaries, file_hashes
+
+def load_fragmentation_analysis(input_file):
+    """Return the Agent 2 fragmentation analysis text, preferring the JSONL artifact."""
+    jsonl_path = jsonl_path_for(input_file)
+    if os.path.exists(jsonl_path):
+        for record in iter_jsonl(jsonl_path):
+            if record.get("type") == "analysis":
+                return record["analysis"]
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return f.read()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+AutoScholar transport benchmark.
+
+Runs call_groq_api against a local fake Groq server (fake_groq.py) and reports
+requests/s, p50/p95/p99 request latency and wall time for each dispatch mode and
+concurrency level. No API quota is used.
+
+Usage:
+    python benchmark.py [--modes sync,async,batch] [--concurrency 1,2,4,8,16,32,64,128,256] [--requests 256]
+    python benchmark.py --latency lognormal:0.5,0.6 --rate-429 0.05 --rate-5xx 0.01 --batch-delay uniform:1,5
+    python benchmark.py --replay run.jsonl        # replay a recorded run (see fake_groq.py --record)
+    python benchmark.py --output results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from fake_groq import FakeGroqServer, add_fault_arguments, fake_from_args
+
+DEFAULT_CONCURRENCY = "1,2,4,8,16,32,64,128,256"
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values (None for an empty list)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+def make_prompts(count, prompt_tokens, run_label):
+    """Distinct synthetic prompts of about prompt_tokens tokens."""
+    filler = "Summarize the theoretical contribution of this study on organizational learning. "
+    body = (filler * (prompt_tokens * 4 // len(filler) + 1))[:prompt_tokens * 4]
+    return [f"[{run_label} #{i}] {body}" for i in range(count)]
+
+def run_case(mode, concurrency, prompts, server):
+    """Send prompts with one dispatch mode and concurrency level; return the measurements."""
+    from utils import call_groq_api
+    from rate_limiter import reset_rate_limiter
+    from telemetry import get_telemetry
+
+    fake = server.fake
+    reset_rate_limiter(rpm=fake.rpm, tpm=fake.tpm, initial_concurrency=concurrency, max_concurrency=concurrency)
+    telemetry = get_telemetry()
+    first_call, first_batch = len(telemetry.calls), len(telemetry.batches)
+
+    started = time.perf_counter()
+    results = call_groq_api(prompts, use_cache=False, dispatch=mode, threads=concurrency)
+    wall = time.perf_counter() - started
+
+    calls = telemetry.calls[first_call:]
+    batches = telemetry.batches[first_batch:]
+    if mode == "batch":
+        latencies = [batch["wait_seconds"] for batch in batches for _ in range(batch["requests"])]
+    else:
+        latencies = [call["latency_seconds"] for call in calls if not call["error"]]
+    ok = sum(1 for result in results if not str(result).startswith("ERROR:"))
+    return {
+        "mode": mode,
+        "concurrency": concurrency if mode == "async" else None,
+        "requests": len(prompts),
+        "ok": ok,
+        "errors": len(prompts) - ok,
+        "attempts": len(calls) if mode != "batch" else len(prompts),
+        "retries": sum(1 for call in calls if call["attempt"] > 1),
+        "throttled": sum(1 for call in calls if call["status"] == 429),
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(ok / wall, 2) if wall > 0 else None,
+        "p50_seconds": percentile(latencies, 0.50),
+        "p95_seconds": percentile(latencies, 0.95),
+        "p99_seconds": percentile(latencies, 0.99),
+        "queue_wait_seconds": round(sum(call["queue_wait_seconds"] for call in calls), 3),
+        "server_max_in_flight": fake.stats["max_in_flight"],
+    }
+
+def print_table(rows):
+    def seconds(value):
+        return f"{value:.3f}" if value is not None else "-"
+
+    print(f"\n{'mode':<6} {'conc':>5} {'reqs':>5} {'ok':>5} {'err':>4} {'retry':>5} {'429':>4} "
+          f"{'wall s':>8} {'req/s':>8} {'p50':>7} {'p95':>7} {'p99':>7}")
+    print("-" * 86)
+    for row in rows:
+        concurrency = row["concurrency"] if row["concurrency"] is not None else "-"
+        print(f"{row['mode']:<6} {concurrency:>5} {row['requests']:>5} {row['ok']:>5} {row['errors']:>4} "
+              f"{row['retries']:>5} {row['throttled']:>4} {row['wall_seconds']:>8.2f} "
+              f"{row['requests_per_second'] or 0:>8.2f} {seconds(row['p50_seconds']):>7} "
+              f"{seconds(row['p95_seconds']):>7} {seconds(row['p99_seconds']):>7}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark call_groq_api dispatch modes against a local fake Groq server",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--modes", default="sync,async,batch", help="Comma-separated dispatch modes to measure")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY,
+                        help="Comma-separated concurrency levels for the async mode")
+    parser.add_argument("--requests", type=int, default=256, help="Prompts per run (sync runs use at most 32)")
+    parser.add_argument("--prompt-tokens", type=int, default=1000, help="Approximate size of each synthetic prompt")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    add_fault_arguments(parser)
+    parser.set_defaults(batch_delay="fixed:1")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    server = FakeGroqServer(fake_from_args(args)).start()
+
+    # The project modules read these at import time, so set them before the first import
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    os.environ.setdefault("GROQ_API_KEY", "fake-benchmark-key")
+    os.environ["GROQ_SHARED_RATE_LIMIT"] = "0"
+    os.environ["GROQ_RATE_LIMIT_RPM"] = str(args.rpm)
+    os.environ["GROQ_RATE_LIMIT_TPM"] = str(args.tpm)
+    os.environ["GROQ_MAX_CONNECTIONS"] = str(max(levels + [100]))
+    os.environ["GROQ_MAX_KEEPALIVE_CONNECTIONS"] = str(max(levels + [20]))
+    os.environ["BATCH_POLL_SECONDS"] = "0.25"
+    from config import GROQ_MODEL, GROQ_TEMPERATURE, GROQ_MAX_TOKENS
+
+    if args.replay:
+        # Replay the recorded workload: same prompts, same outcomes, same latencies
+        replayable = [request for request in server.fake.recording.prompts
+                      if request.get("model") == GROQ_MODEL and request.get("temperature") == GROQ_TEMPERATURE
+                      and request.get("max_tokens") == GROQ_MAX_TOKENS and len(request.get("messages") or []) == 1]
+        if not replayable:
+            print(f"❌ No requests in {args.replay} match the current model settings")
+            return 1
+        recorded_prompts = [request["messages"][0]["content"] for request in replayable]
+        print(f"🔁 Replaying {len(recorded_prompts)} recorded requests from {args.replay}")
+    print(f"🧪 Fake Groq API on {server.base_url}: latency {args.latency}, 429 rate {args.rate_429}, "
+          f"5xx rate {args.rate_5xx}, batch delay {args.batch_delay}")
+
+    rows = []
+    try:
+        for mode in modes:
+            for concurrency in (levels if mode == "async" else levels[:1]):
+                if args.replay:
+                    prompts = recorded_prompts
+                    server.fake.recording.rewind()
+                else:
+                    # Unique prompts per run; sync runs are capped since they send one request at a time
+                    prompts = make_prompts(min(args.requests, 32) if mode == "sync" else args.requests,
+                                           args.prompt_tokens, f"{mode}-{concurrency}")
+                server.fake.stats["max_in_flight"] = 0
+                print(f"▶️  {mode} x{concurrency}: {len(prompts)} requests...")
+                rows.append(run_case(mode, concurrency, prompts, server))
+    finally:
+        server.stop()
+
+    print_table(rows)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"settings": vars(args), "results": rows}, f, indent=2)
+        print(f"\n📄 Results saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
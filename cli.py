@@ -8,6 +8,13 @@ Usage:
     python cli.py agent2 [--input filename.txt] [--output filename.txt]  
     python cli.py agent3 [--input filename.txt] [--output filename.txt]
     python cli.py full [--timestamp]
+    python cli.py <command> [--no-cache] [--clear-cache]
+    python cli.py <command> [--dispatch auto|batch|async|sync] [--latency-target SECONDS]
+    python cli.py <command> [--telemetry-dir DIR] [--otlp]
+    python cli.py agent3|full --all-main-papers
+    python cli.py corpus --manifest projects.json [--output corpus_dir]
+    python cli.py agent1|full|corpus [--near-duplicates off|report|skip|merge] [--duplicate-threshold 0.7]
+    python cli.py <command> [--full-text] [--skip-appendix] [--keep-references]
 """
 
 import argparse
@@ -15,13 +22,21 @@ import sys
 import os
 from datetime import datetime
 
-from utils import extract_text_from_pdf, get_pdf_files
+from utils import extract_text_from_file, extract_texts_parallel, file_content_hash, get_pdf_files, configure_dispatch, configure_extraction, DISPATCH_MODES
+from extraction_cache import get_extraction_cache
+from response_cache import get_response_cache
+from rate_limiter import report_rate_budget_share
 from phd_student_agent import PhDStudentAgent
 from postdoc_agent import PostdocAgent
 from professor_agent import ProfessorAgent
+from artifacts import load_summaries, load_fragmentation_analysis, synthesis_paths
+from pipeline import run_full_pipeline as run_pipeline
+from corpus import run_corpus
+from near_duplicates import NEAR_DUPLICATE_MODES, configure_near_duplicates, dedupe_papers
+from telemetry import get_telemetry, export_telemetry
 from config import MAIN_PAPER_FOLDER, REFERENCES_FOLDER
 
-def run_agent1(output_file=None):
+def run_agent1(output_file=None, workers=None, incremental=True, stream=False):
     """Run Agent 1 (PhD Student) - Paper Summarization."""
     print("🎓 Running Agent 1 - PhD Student Paper Summarization")
     print("-" * 50)
@@ -34,41 +49,60 @@ def run_agent1(output_file=None):
     
     print(f"📚 Found {len(reference_files)} reference papers")
     
+    if not output_file:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"agent1_summaries_{timestamp}.txt"
+    
+    if stream:
+        # Summarize each paper as soon as it is extracted, appending results as they complete
+        records = PhDStudentAgent().summarize_paper_stream(
+            reference_files,
+            save_path=output_file,
+            workers=workers,
+            incremental=incremental
+        )
+        if not records:
+            print("❌ No valid papers to process!")
+            return False
+        print(f"\n✅ Agent 1 completed successfully!")
+        print(f"📄 Output saved to: {output_file}")
+        print(f"📊 Papers summarized: {len(records)}")
+        return True
+    
     # Extract texts
-    paper_texts = []
-    paper_titles = []
+    papers = {"texts": [], "titles": [], "hashes": []}
     
-    for i, file_path in enumerate(reference_files, 1):
-        filename = os.path.basename(file_path)
-        print(f"  Processing {i}/{len(reference_files)}: {filename}")
-        
-        text = extract_text_from_pdf(file_path)
+    texts = extract_texts_parallel(reference_files, workers=workers, reference_papers=True)
+    for file_path, text in zip(reference_files, texts):
         if text.strip():
-            paper_texts.append(text)
-            paper_titles.append(filename)
+            papers["texts"].append(text)
+            papers["titles"].append(os.path.basename(file_path))
+            papers["hashes"].append(file_content_hash(file_path))
     
-    if not paper_texts:
+    if not papers["texts"]:
         print("❌ No valid papers to process!")
         return False
     
+    # Skip or merge near-duplicate papers (same paper under two names, preprint and published version)
+    papers, _ = dedupe_papers(papers)
+    
     # Run Agent 1
     agent1 = PhDStudentAgent()
     
-    if not output_file:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"agent1_summaries_{timestamp}.txt"
-    
     summaries = agent1.summarize_paper_batch(
-        paper_texts=paper_texts,
-        paper_titles=paper_titles,
-        save_path=output_file
+        paper_texts=papers["texts"],
+        paper_titles=papers["titles"],
+        save_path=output_file,
+        file_hashes=papers["hashes"],
+        incremental=incremental
     )
     
+    summarized = sum(1 for summary in summaries if not summary.startswith("ERROR:"))
     print(f"\n✅ Agent 1 completed successfully!")
     print(f"📄 Output saved to: {output_file}")
-    print(f"📊 Papers summarized: {len(summaries)}")
+    print(f"📊 Papers summarized: {summarized} of {len(summaries)}")
     
-    return True
+    return summarized > 0
 
 def run_agent2(input_file=None, output_file=None):
     """Run Agent 2 (Postdoc) - Fragmentation Analysis."""
@@ -92,27 +126,9 @@ def run_agent2(input_file=None, output_file=None):
     
     print(f"📄 Using input file: {input_file}")
     
-    # Parse summaries from Agent 1 output
+    # Load summaries from Agent 1 output (JSONL artifact, or legacy txt)
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        summaries = []
-        paper_titles = []
-        
-        sections = content.split("## ")
-        for section in sections[1:]:  # Skip header
-            if section.strip():
-                lines = section.strip().split('\n')
-                if lines:
-                    title = lines[0].strip()
-                    summary = '\n'.join(lines[1:]).strip()
-                    summary = summary.replace('='*80, '').strip()
-                    
-                    if summary:
-                        paper_titles.append(title)
-                        summaries.append(summary)
-        
+        paper_titles, summaries, file_hashes = load_summaries(input_file)
         print(f"📊 Parsed {len(summaries)} summaries")
         
     except Exception as e:
@@ -129,7 +145,8 @@ def run_agent2(input_file=None, output_file=None):
     fragmentation_analysis = agent2.review_and_refine_batch(
         summaries=summaries,
         paper_titles=paper_titles,
-        save_path=output_file
+        save_path=output_file,
+        file_hashes=file_hashes
     )
     
     print(f"\n✅ Agent 2 completed successfully!")
@@ -137,8 +154,8 @@ def run_agent2(input_file=None, output_file=None):
     
     return True
 
-def run_agent3(input_file=None, output_file=None):
-    """Run Agent 3 (Professor) - Final Synthesis."""
+def run_agent3(input_file=None, output_file=None, all_main_papers=False, workers=None):
+    """Run Agent 3 (Professor) - Final Synthesis, for the first or for every main paper."""
     print("🎓 Running Agent 3 - Professor Final Synthesis")
     print("-" * 50)
     
@@ -161,8 +178,7 @@ def run_agent3(input_file=None, output_file=None):
     
     # Load fragmentation analysis
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            fragmentation_analysis = f.read()
+        fragmentation_analysis = load_fragmentation_analysis(input_file)
         print("📊 Loaded fragmentation analysis")
     except Exception as e:
         print(f"❌ Error loading input file: {e}")
@@ -174,8 +190,13 @@ def run_agent3(input_file=None, output_file=None):
         if not main_paper_files:
             print("❌ No main paper found in mainPaper folder!")
             return False
+        if all_main_papers:
+            return run_agent3_all(main_paper_files, fragmentation_analysis, output_file, workers)
+        if len(main_paper_files) > 1:
+            print(f"ℹ️  {len(main_paper_files)} main papers found; using the first. "
+                  "Pass --all-main-papers to synthesize each of them.")
         
-        main_paper_content = extract_text_from_pdf(main_paper_files[0])
+        main_paper_content = extract_text_from_file(main_paper_files[0])
         main_paper_title = os.path.basename(main_paper_files[0])
         print(f"📖 Loaded main paper: {main_paper_title}")
         
@@ -201,7 +222,40 @@ def run_agent3(input_file=None, output_file=None):
     
     return True
 
-def run_full_pipeline(use_timestamp=True):
+def run_agent3_all(main_paper_files, fragmentation_analysis, output_file=None, workers=None):
+    """Agent 3 for every main paper: one synthesis each, generated concurrently, plus an index file."""
+    texts = extract_texts_parallel(main_paper_files, workers=workers)
+    main_papers = [
+        (os.path.basename(file_path), text)
+        for file_path, text in zip(main_paper_files, texts) if text.strip()
+    ]
+    if not main_papers:
+        print("❌ No text could be extracted from the main papers!")
+        return False
+    print(f"📖 Loaded {len(main_papers)} main papers")
+    
+    if not output_file:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"agent3_synthesis_{timestamp}.txt"
+    save_paths, index_path = synthesis_paths(output_file, [title for title, _ in main_papers])
+    
+    reports = ProfessorAgent().generate_final_reports(
+        main_papers=main_papers,
+        fragmentation_analysis=fragmentation_analysis,
+        save_paths=save_paths,
+        index_path=index_path
+    )
+    failed = sum(1 for report in reports if report.startswith("ERROR:"))
+    if failed == len(reports):
+        print(f"\n❌ Agent 3 failed: every main-paper synthesis failed")
+        print(f"📄 Errors listed in: {index_path}")
+        return False
+    
+    print(f"\n✅ Agent 3 completed: {len(reports) - failed} of {len(reports)} syntheses ready")
+    print(f"📄 Index saved to: {index_path}")
+    return True
+
+def run_full_pipeline(use_timestamp=True, workers=None, incremental=True, stream=False, all_main_papers=False):
     """Run the complete three-agent pipeline."""
     print("🔄 Running Full Pipeline - All Three Agents")
     print("-" * 50)
@@ -216,20 +270,11 @@ def run_full_pipeline(use_timestamp=True):
         agent2_output = "agent2_fragmentation.txt"
         agent3_output = "agent3_synthesis.txt"
     
-    # Step 1: Run Agent 1
-    print("\n🎓 Step 1: Running Agent 1...")
-    if not run_agent1(agent1_output):
-        return False
-    
-    # Step 2: Run Agent 2
-    print("\n🔬 Step 2: Running Agent 2...")
-    if not run_agent2(agent1_output, agent2_output):
-        return False
-    
-    # Step 3: Run Agent 3
-    print("\n🎓 Step 3: Running Agent 3...")
-    if not run_agent3(agent2_output, agent3_output):
+    # Independent stages (main-paper extraction, Discussion parsing) overlap with Agents 1 and 2
+    if run_pipeline(agent1_output, agent2_output, agent3_output, workers, incremental, stream, all_main_papers) is None:
         return False
+    if all_main_papers:
+        agent3_output = synthesis_paths(agent3_output, [])[1]
     
     print(f"\n🎉 Full Pipeline Completed Successfully!")
     print("="*50)
@@ -240,6 +285,30 @@ def run_full_pipeline(use_timestamp=True):
     
     return True
 
+def run_corpus_mode(manifest, output_dir=None, use_timestamp=True, workers=None, incremental=True,
+                    all_main_papers=False):
+    """Run Agent 1 once over every project's deduplicated references, then Agents 2 and 3 per project."""
+    print("🔄 Running Corpus Mode - Shared Agent 1, Agents 2 and 3 per Project")
+    print("-" * 50)
+    
+    if not manifest or not os.path.exists(manifest):
+        print(f"❌ Corpus manifest not found: {manifest}")
+        print("💡 Pass --manifest with a JSON file listing the projects")
+        return False
+    if not output_dir:
+        output_dir = f"corpus_{datetime.now().strftime('%Y%m%d_%H%M%S')}" if use_timestamp else "corpus"
+    
+    if run_corpus(manifest, output_dir, workers, incremental, all_main_papers) is None:
+        return False
+    
+    print(f"\n🎉 Corpus Mode Completed Successfully!")
+    print("="*50)
+    print(f"📁 Outputs: {output_dir}/<project>/")
+    print(f"📄 Corpus summary: {os.path.join(output_dir, 'corpus_summary.json')}")
+    print("="*50)
+    
+    return True
+
 def main():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(
@@ -254,12 +323,26 @@ Examples:
   python cli.py agent3                    # Run Agent 3 using latest Agent 2 output
   python cli.py full                      # Run all three agents in sequence
   python cli.py full --no-timestamp      # Run all agents without timestamp in filenames
+  python cli.py agent1 --workers 16       # Extract reference papers with 16 processes
+  python cli.py agent1 --no-cache         # Re-parse every paper, ignoring cached text
+  python cli.py agent1 --clear-cache      # Empty the extraction and response caches before running
+  python cli.py agent2 --no-response-cache  # Always call the API, even for previously seen prompts
+  python cli.py agent1 --no-incremental   # Re-summarize all papers, not only new or changed ones
+  python cli.py agent1 --dispatch async   # Parallel sync calls instead of the Batch API
+  python cli.py agent1 --stream          # Summarize each paper as soon as it is extracted
+  python cli.py full --latency-target 60  # Let the planner use the Batch API only if sync calls would take >60s
+  python cli.py full --otlp               # Also export trace spans as OTLP-JSON next to the run report
+  python cli.py agent3 --all-main-papers  # One synthesis per main paper, generated concurrently, plus an index
+  python cli.py corpus --manifest projects.json  # Many projects; shared reference papers are summarized once
+  python cli.py agent1 --near-duplicates report  # List near-duplicate papers but still summarize all of them
+  python cli.py agent1 --skip-appendix    # Besides stopping at References, drop Appendix pages before them
+  python cli.py agent1 --full-text        # Parse every page of the reference papers, including the bibliography
         """
     )
     
     parser.add_argument(
         "command",
-        choices=["agent1", "agent2", "agent3", "full"],
+        choices=["agent1", "agent2", "agent3", "full", "corpus"],
         help="Which agent or pipeline to run"
     )
     
@@ -270,7 +353,12 @@ Examples:
     
     parser.add_argument(
         "--output", "-o",
-        help="Output file path"
+        help="Output file path (for corpus: output directory)"
+    )
+    
+    parser.add_argument(
+        "--manifest", "-m",
+        help="Corpus: JSON file listing the projects (mainPaper and subFolder pairs)"
     )
     
     parser.add_argument(
@@ -279,24 +367,157 @@ Examples:
         help="Don't use timestamp in output filenames (for full pipeline)"
     )
     
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the extracted-text cache and re-parse every document"
+    )
+    
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Delete all cached extracted text and LLM responses before running"
+    )
+    
+    parser.add_argument(
+        "--no-response-cache",
+        action="store_true",
+        help="Bypass the LLM response cache and send every prompt to the API"
+    )
+    
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        help="Number of parallel extraction processes (default: one per CPU)"
+    )
+    
+    parser.add_argument(
+        "--no-incremental",
+        action="store_true",
+        help="Re-summarize every reference paper instead of reusing stored summaries of unchanged files"
+    )
+    
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Agent 1: summarize papers while others are still being extracted, appending each summary as it completes"
+    )
+    
+    parser.add_argument(
+        "--all-main-papers",
+        action="store_true",
+        help="Agent 3: synthesize every paper in mainPaper against the same fragmentation analysis"
+    )
+    
+    parser.add_argument(
+        "--full-text",
+        action="store_true",
+        help="Parse every page of the reference papers too, instead of stopping at their References heading"
+    )
+    
+    parser.add_argument(
+        "--skip-appendix",
+        action="store_true",
+        help="Also leave Appendix pages out of the extracted text"
+    )
+    
+    parser.add_argument(
+        "--keep-references",
+        action="store_true",
+        help="Keep each reference paper's parsed reference list and save it in its Agent 1 JSONL record"
+    )
+    
+    parser.add_argument(
+        "--near-duplicates",
+        choices=NEAR_DUPLICATE_MODES,
+        help="Agent 1: what to do with near-duplicate reference papers (default: NEAR_DUPLICATE_MODE, report)"
+    )
+    
+    parser.add_argument(
+        "--duplicate-threshold",
+        type=float,
+        help="Shingle similarity (0-1) at which two reference papers count as near-duplicates"
+    )
+    
+    parser.add_argument(
+        "--dispatch",
+        choices=DISPATCH_MODES,
+        help="How to send multiple prompts: Batch API, async-parallel, sequential, or auto (default)"
+    )
+    
+    parser.add_argument(
+        "--latency-target",
+        type=float,
+        help="Seconds you are willing to wait for a group of calls; used by --dispatch auto"
+    )
+    
+    parser.add_argument(
+        "--telemetry-dir",
+        help="Where to write the JSON run report and Prometheus metrics (default: TELEMETRY_DIR)"
+    )
+    
+    parser.add_argument(
+        "--otlp",
+        action="store_true",
+        help="Also write trace spans for every stage and API call in OTLP-JSON format"
+    )
+    
     args = parser.parse_args()
     
     print("🎯 AUTOSCHOLAR CLI")
     print("="*40)
     
+    configure_dispatch(args.dispatch, args.latency_target)
+    configure_extraction(
+        full_text=args.full_text or None,
+        skip_appendix=args.skip_appendix or None,
+        keep_references=args.keep_references or None
+    )
+    try:
+        configure_near_duplicates(args.near_duplicates, args.duplicate_threshold)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    
+    cache = get_extraction_cache()
+    if args.clear_cache:
+        removed = cache.clear()
+        print(f"🧹 Cleared {removed} cached extraction(s) from {cache.cache_dir}")
+        removed = get_response_cache().clear()
+        print(f"🧹 Cleared {removed} cached LLM response(s)")
+    if args.no_cache:
+        cache.enabled = False
+        print("⚠️  Extraction cache disabled for this run")
+    if args.no_response_cache:
+        get_response_cache().enabled = False
+        print("⚠️  LLM response cache disabled for this run")
+    
+    telemetry = get_telemetry()
+    telemetry.annotate(command=args.command, dispatch=args.dispatch or "config", stream=args.stream)
     try:
         if args.command == "agent1":
-            success = run_agent1(args.output)
+            success = run_agent1(args.output, args.workers, not args.no_incremental, args.stream)
         elif args.command == "agent2":
             success = run_agent2(args.input, args.output)
         elif args.command == "agent3":
-            success = run_agent3(args.input, args.output)
+            success = run_agent3(args.input, args.output, args.all_main_papers, args.workers)
         elif args.command == "full":
-            success = run_full_pipeline(not args.no_timestamp)
+            success = run_full_pipeline(not args.no_timestamp, args.workers, not args.no_incremental, args.stream,
+                                        args.all_main_papers)
+        elif args.command == "corpus":
+            success = run_corpus_mode(args.manifest, args.output, not args.no_timestamp, args.workers,
+                                      not args.no_incremental, args.all_main_papers)
         else:
             print("❌ Invalid command")
             return 1
         
+        response_cache = get_response_cache()
+        if response_cache.enabled and response_cache.hits + response_cache.misses:
+            print(f"💾 LLM response cache: {response_cache.hits} hit(s), {response_cache.misses} miss(es)")
+        telemetry.annotate(success=bool(success), response_cache_hits=response_cache.hits,
+                           response_cache_misses=response_cache.misses)
+        report_rate_budget_share()
+        
         if success:
             print("\n✅ Operation completed successfully!")
             return 0
@@ -310,6 +531,8 @@ Examples:
     except Exception as e:
         print(f"\n❌ Error: {e}")
         return 1
+    finally:
+        export_telemetry(args.telemetry_dir, args.otlp or None)
 
 if __name__ == "__main__":
     sys.exit(main())
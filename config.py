@@ -6,10 +6,92 @@ load_dotenv()
 # GROQ API Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "meta-llama/llama-4-maverick-17b-128e-instruct")  # Default to llama-4-maverick (most powerful Llama 4 model for academic analysis)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None  # Override the API endpoint (e.g. a local proxy)
+GROQ_TEMPERATURE = 0.7
+GROQ_MAX_TOKENS = 2048
+GROQ_CONCURRENCY = int(os.getenv("GROQ_CONCURRENCY", "4"))  # Initial in-flight requests for non-batch parallel calls
+GROQ_STREAM = os.getenv("GROQ_STREAM", "1") == "1"  # Stream long reports to disk token by token as they are generated
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "64"))  # Ceiling the adaptive limiter may grow to
+
+# Rate Limits (starting values; refined from x-ratelimit-* response headers)
+GROQ_RATE_LIMIT_RPM = float(os.getenv("GROQ_RATE_LIMIT_RPM", "30"))
+GROQ_RATE_LIMIT_TPM = float(os.getenv("GROQ_RATE_LIMIT_TPM", "30000"))
+GROQ_SHARED_RATE_LIMIT = os.getenv("GROQ_SHARED_RATE_LIMIT", "1") == "1"  # Share the budget with other local runs on the same key
+GROQ_RATE_STATE_DIR = os.getenv("GROQ_RATE_STATE_DIR") or os.path.join(  # Where the shared budget file lives (per user)
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "autoscholar")
+
+# Dispatch Planning (how call_groq_api sends a list of prompts)
+GROQ_DISPATCH = os.getenv("GROQ_DISPATCH", "auto")  # auto | batch | async | sync
+DISPATCH_LATENCY_TARGET_SECONDS = float(os.getenv("DISPATCH_LATENCY_TARGET", "300"))  # Use sync/async if expected to finish within this
+SYNC_DISPATCH_MAX_PROMPTS = 2  # Lists this small are sent sequentially
+GROQ_EST_CALL_SECONDS = 20  # Typical latency of one 2048-token completion, used for planning
+
+# Batch API Configuration
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "50000"))  # Requests per batch file
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_MB", "100")) * 1024 * 1024  # Size of one batch file
+BATCH_SPOOL_BYTES = 16 * 1024 * 1024  # Batch input above this spills from memory to a temp file
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "10"))
+
+# HTTP Connection Pool (shared by every Groq client in the process)
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+GROQ_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "20"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "60"))  # Seconds an idle connection is kept
+GROQ_HTTP2 = os.getenv("GROQ_HTTP2", "1") == "1"  # Used only if the optional h2 package is installed
 
 # Processing Configuration
 CHUNK_SIZE = 4000  # Maximum tokens per chunk
+CHUNK_OVERLAP = 200  # Tokens of trailing sentences repeated at the start of the next chunk
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "131072"))  # Context window of GROQ_MODEL
 MAX_RETRIES = 3    # Maximum API retry attempts
+MAX_THROTTLE_RETRIES = 20  # Extra retries allowed for 429 responses, paced by the rate limiter
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "8"))  # Extracted papers buffered ahead of summarization in --stream mode
+
+# Extraction Cache Configuration
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", ".autoscholar_cache/extracted")
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512")) * 1024 * 1024
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0"))  # Parallel extraction processes (0 = one per CPU)
+EXTRACTOR_VERSION = "3"  # Bump whenever extraction output changes to invalidate cached text
+
+# Lazy PDF Extraction (stop at the References heading instead of parsing the bibliography and appendices)
+# Reference papers always stop at their References heading unless EXTRACTION_FULL_TEXT is set
+EXTRACTION_STOP_AT_REFERENCES = os.getenv("EXTRACTION_STOP_AT_REFERENCES", "0") == "1"  # Main papers too
+EXTRACTION_FULL_TEXT = os.getenv("EXTRACTION_FULL_TEXT", "0") == "1"  # Parse every page of every paper
+EXTRACTION_SKIP_APPENDIX = os.getenv("EXTRACTION_SKIP_APPENDIX", "0") == "1"  # Also drop Appendix pages before the References
+EXTRACTION_KEEP_REFERENCES = os.getenv("EXTRACTION_KEEP_REFERENCES", "0") == "1"  # Parse the reference list into its own field
+EXTRACTION_MIN_BODY_FRACTION = 0.3  # References/Appendix headings in the first 30% of pages (tables of contents) are ignored
+
+# LLM Response Cache Configuration
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".autoscholar_cache/responses.sqlite3")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_HOURS", "168")) * 3600  # 0 disables expiry
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# Incremental Agent 1 (summaries reused by file content hash)
+SUMMARY_MANIFEST_PATH = os.getenv("SUMMARY_MANIFEST_PATH", ".autoscholar_cache/agent1_manifest.json")
+
+# Agent 2 Tree-Reduce Configuration
+POSTDOC_TREE_MIN_PAPERS = int(os.getenv("POSTDOC_TREE_MIN_PAPERS", "30"))  # Tree-reduce above this many papers, or whenever one prompt would not fit
+POSTDOC_GROUP_SIZE = int(os.getenv("POSTDOC_GROUP_SIZE", "10"))  # Summaries per partial analysis
+POSTDOC_MERGE_FANIN = int(os.getenv("POSTDOC_MERGE_FANIN", "4"))  # Partial reports merged per call
+POSTDOC_MIN_THEME_PAPERS = 3  # A theme needs at least this many papers; otherwise it is a minor fragment
+
+# Agent 2 Theme Pre-Pass (local TF-IDF clustering of Agent 1 constructs)
+POSTDOC_THEME_PREPASS = os.getenv("POSTDOC_THEME_PREPASS", "0") == "1"  # Opt-in: send a theme table instead of every summary
+POSTDOC_THEME_TABLE_ROWS = int(os.getenv("POSTDOC_THEME_TABLE_ROWS", "80"))  # Largest themes included in the table
+THEME_VECTOR_DIM = 1024  # Hashed term features per construct
+THEME_SIMILARITY_THRESHOLD = float(os.getenv("THEME_SIMILARITY_THRESHOLD", "0.5"))  # Cosine similarity to join a theme
+THEME_VECTOR_CACHE_PATH = os.getenv("THEME_VECTOR_CACHE_PATH", ".autoscholar_cache/theme_vectors.npz")
+THEME_VECTOR_CACHE_MAX_ROWS = int(os.getenv("THEME_VECTOR_CACHE_MAX_ROWS", "200000"))
+
+# Near-Duplicate Detection (MinHash/LSH over word shingles of reference papers, before Agent 1)
+NEAR_DUPLICATE_MODE = os.getenv("NEAR_DUPLICATE_MODE", "report")  # off, report (list only), skip or merge
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))  # Estimated Jaccard similarity that counts as a duplicate
+NEAR_DUPLICATE_SIGNATURE_SIZE = 128  # MinHash signature length (one-permutation bins)
+NEAR_DUPLICATE_SHINGLE_WORDS = 5  # Words per shingle
+
+# Telemetry (per-call and per-stage run reports)
+TELEMETRY_DIR = os.getenv("TELEMETRY_DIR", ".autoscholar_cache/telemetry")  # run_<id>.json and run_<id>.prom are written here
+TELEMETRY_OTLP = os.getenv("TELEMETRY_OTLP", "0") == "1"  # Also write trace spans as OTLP-JSON (run_<id>.otlp.json)
+TELEMETRY_KEEP_RUNS = int(os.getenv("TELEMETRY_KEEP_RUNS", "50"))  # Files of older runs are deleted (0 = keep all)
 
 # File Paths
 MAIN_PAPER_FOLDER = "mainPaper"
@@ -34,6 +116,24 @@ Text to summarize:
 {text}
 """
 
+PHD_COMBINE_PROMPT = """
+You are a PhD student who has summarized different sections of an academic paper.
+Now combine these section summaries into one coherent overall summary, keeping the same numbered structure:
+
+1. Full citation (authors, year, title, journal)
+2. Research question(s)
+3. Theoretical frameworks or lenses used
+4. Core theoretical constructs & definitions
+5. Key methods and data sources
+6. Main findings and conclusions
+7. Any stated limitations or boundary conditions
+
+Section summaries:
+{summaries}
+
+Please provide a unified, comprehensive summary:
+"""
+
 POSTDOC_PROMPT = """
 You are an analytical agent specialized in mapping theory landscapes. Given a set of paper summaries, your task is to:
 
@@ -52,6 +152,56 @@ Paper summaries:
 {summaries}
 """
 
+POSTDOC_PARTIAL_PROMPT = """
+You are an analytical agent specialized in mapping theory landscapes. You are given ONE GROUP of paper summaries from a larger corpus; other groups are analyzed separately and merged later.
+
+List every theoretical concept or theme discussed in these papers, including themes that appear in only one paper (they may reach the 3-paper threshold once groups are merged).
+Group concepts that appear under different names into one theme, and classify each theme as:
+- "convergent": the same idea shared across papers, possibly under different names
+- "divergent": a topic treated in isolation or in conflicting ways across sub-fields
+
+Return ONLY a JSON array, no prose, where each element is:
+{{"theme": "<name>", "also_called": ["<other names>"], "kind": "convergent" or "divergent", "papers": [<paper numbers>], "note": "<one sentence>"}}
+Use the paper numbers exactly as given ("Paper 12" -> 12).
+
+Paper summaries:
+{summaries}
+"""
+
+POSTDOC_MERGE_PROMPT = """
+You are merging partial theme maps produced for different groups of papers from the same corpus.
+Each partial map is a JSON array of themes with the paper numbers that discuss them.
+
+Merge themes that describe the same concept (including under different names) into one theme.
+The "papers" list of a merged theme MUST be the union of the paper numbers of every theme merged into it; never drop paper numbers.
+Keep themes that have no counterpart unchanged. Reclassify "kind" if merging shows a theme is convergent or divergent across groups.
+
+Return ONLY a JSON array, no prose, in the same format:
+{{"theme": "<name>", "also_called": ["<other names>"], "kind": "convergent" or "divergent", "papers": [<paper numbers>], "note": "<one sentence>"}}
+
+Partial theme maps:
+{partials}
+"""
+
+POSTDOC_FINAL_PROMPT = """
+You are an analytical agent specialized in mapping theory landscapes. A corpus of {papers} paper summaries has been mapped into the theme table below. Paper counts are exact.
+Themes tagged [convergent] or [divergent] have already been classified; classify untagged themes yourself from their names, alternative names and notes.
+
+IMPORTANT RULE: Only themes listed under "Themes in at least 3 papers" may be reported as convergent themes or divergent fragments; everything under "Minor fragments" must be reported as a minor fragment.
+
+Output your findings in three sections:
+- Convergent themes (list + brief explanation, with the number of papers)
+- Divergent fragments (list + how they diverge, with the number of papers)
+- Suggested integrative links (short bullet ideas)
+Finish with a short list of minor fragments.
+
+Themes in at least 3 papers:
+{themes}
+
+Minor fragments (fewer than 3 papers):
+{minor_fragments}
+"""
+
 PROFESSOR_PROMPT = """
 You are a senior Professor agent responsible for final synthesis and comparison. Given the fragmentation analysis from Agent 2, your task is to:
 
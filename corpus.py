@@ -0,0 +1,287 @@
+import json
+import os
+import re
+from collections import Counter
+
+from utils import extract_discussion_section, extract_texts_parallel, file_content_hash, get_document_files
+from phd_student_agent import PhDStudentAgent
+from postdoc_agent import PostdocAgent
+from professor_agent import ProfessorAgent
+from artifacts import iter_summary_records, jsonl_path_for, render_agent1_text, synthesis_paths, write_jsonl
+from near_duplicates import dedupe_papers
+from pipeline import Stage, StageError, load_main_paper, load_main_papers, print_timing_breakdown, run_stages
+from config import MAIN_PAPER_FOLDER, REFERENCES_FOLDER
+
+def load_corpus_manifest(manifest_path):
+    """
+    Read a corpus manifest and return its projects as dicts with name, main_paper and references folders.
+
+    The manifest is JSON: {"projects": [...]} (or just the list), where each project is either
+    a directory holding mainPaper/ and subFolder/, or an object with "main_paper" and
+    "references" folders and an optional "name". Relative paths are resolved against the
+    manifest's directory. Projects with a missing folder, or whose main paper folder holds no
+    document, are skipped with a warning.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data.get("projects", []) if isinstance(data, dict) else data
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    projects = []
+    names = set()
+    for i, entry in enumerate(entries, 1):
+        if isinstance(entry, str):
+            entry = {"main_paper": os.path.join(entry, MAIN_PAPER_FOLDER),
+                     "references": os.path.join(entry, REFERENCES_FOLDER),
+                     "name": os.path.basename(os.path.normpath(entry))}
+        name = re.sub(r"[^\w.-]+", "_", entry.get("name") or f"project{i}")
+        while name in names:
+            name += "_"
+        if not entry.get("main_paper") or not entry.get("references"):
+            print(f"⚠️  Skipping project {name}: both \"main_paper\" and \"references\" folders are required")
+            continue
+        main_paper = os.path.join(base_dir, entry["main_paper"])
+        references = os.path.join(base_dir, entry["references"])
+        if not os.path.isdir(main_paper) or not os.path.isdir(references):
+            print(f"⚠️  Skipping project {name}: folder not found ({main_paper if not os.path.isdir(main_paper) else references})")
+            continue
+        if not get_document_files(main_paper):
+            print(f"⚠️  Skipping project {name}: no main paper found in {main_paper}")
+            continue
+        names.add(name)
+        projects.append({"name": name, "main_paper": main_paper, "references": references})
+    return projects
+
+def collect_references(projects):
+    """
+    Hash every project's reference files and deduplicate them by content across all projects.
+
+    Returns:
+        tuple: (unique, membership, files, duplicates) where unique maps content hash -> first file
+        path seen, membership maps project name -> list of (title, content hash) in that project's
+        file order, files is the number of reference files found and duplicates the number of those
+        whose content was already seen (in any project). A file repeated inside one project is listed once.
+    """
+    unique = {}
+    membership = {}
+    files = 0
+    duplicates = 0
+    for project in projects:
+        seen = set()
+        membership[project["name"]] = []
+        for file_path in get_document_files(project["references"]):
+            files += 1
+            file_hash = file_content_hash(file_path)
+            if file_hash in unique:
+                duplicates += 1
+            if file_hash in seen:
+                continue
+            seen.add(file_hash)
+            unique.setdefault(file_hash, file_path)
+            membership[project["name"]].append((os.path.basename(file_path), file_hash))
+    return unique, membership, files, duplicates
+
+def build_corpus_pipeline(projects, output_dir, workers=None, incremental=True, all_main_papers=False,
+                          failures=None):
+    """
+    Describe corpus mode as a stage graph.
+
+    Reference papers of every project are deduplicated by content hash (and by near-duplicate
+    text, see near_duplicates.py) and summarized once, in one Agent 1 dispatch. Each project then
+    gets its own Agent 2 and Agent 3 stages, built from the shared summaries, which run
+    concurrently with the other projects' stages. A failing project stage does not stop the run:
+    its error is recorded in failures (project name -> message) and that project's later stages
+    are skipped.
+    """
+    failures = {} if failures is None else failures
+    def references(inputs):
+        unique, membership, files, duplicates = collect_references(projects)
+        print(f"📚 {files} reference files across {len(projects)} projects -> {len(unique)} unique papers "
+              f"({duplicates} duplicate(s) will not be summarized again)")
+        hashes = list(unique)
+        texts = extract_texts_parallel([unique[file_hash] for file_hash in hashes], workers=workers, reference_papers=True)
+        papers = {"hashes": [], "titles": [], "texts": []}
+        extraction_failures = []
+        for file_hash, text in zip(hashes, texts):
+            if text.strip():
+                papers["hashes"].append(file_hash)
+                papers["titles"].append(os.path.basename(unique[file_hash]))
+                papers["texts"].append(text)
+            else:
+                extraction_failures.append(unique[file_hash])
+                print(f"⚠️  Warning: No text extracted from {os.path.basename(unique[file_hash])}")
+        if not papers["texts"]:
+            raise RuntimeError("No valid reference papers in any project!")
+
+        # Near-duplicates (preprint and published version) stand in for each other in every project
+        deduped, duplicate_of = dedupe_papers(papers)
+        if deduped is not papers:
+            kept_hash = {papers["hashes"][i]: papers["hashes"][kept] for i, kept in duplicate_of.items()}
+            for name, entries in membership.items():
+                seen = set()
+                membership[name] = []
+                for title, file_hash in entries:
+                    file_hash = kept_hash.get(file_hash, file_hash)
+                    if file_hash not in seen:
+                        seen.add(file_hash)
+                        membership[name].append((title, file_hash))
+        return {"papers": deduped, "membership": membership, "files": files, "duplicates": duplicates,
+                "extraction_failures": extraction_failures,
+                "near_duplicates": len(duplicate_of) if deduped is not papers else 0}
+
+    def agent1(inputs):
+        print("\n🎓 Agent 1 - PhD Student Paper Summarization (shared across projects)")
+        papers = inputs["references"]["papers"]
+        save_path = os.path.join(output_dir, "agent1_summaries.txt")
+        PhDStudentAgent().summarize_paper_batch(
+            paper_texts=papers["texts"],
+            paper_titles=papers["titles"],
+            save_path=save_path,
+            file_hashes=papers["hashes"],
+            incremental=incremental
+        )
+        # Keep the full records (model, usage) so each project's own Agent 1 file matches the normal layout
+        records = {record["file_hash"]: record for record in iter_summary_records(save_path)}
+        print(f"✅ Agent 1 completed: {len(records)} unique summaries")
+        return records
+
+    def project_stages(project):
+        name = project["name"]
+        project_dir = os.path.join(output_dir, name)
+
+        def guarded(stage, func):
+            def run(inputs):
+                if name in failures:
+                    return None
+                try:
+                    return func(inputs)
+                except Exception as e:
+                    failures.setdefault(name, f"{stage}: {e}")
+                    print(f"❌ [{name}] {stage} failed: {e} (other projects continue)")
+                    return None
+            return run
+
+        def agent2(inputs):
+            records = []
+            for title, file_hash in inputs["references"]["membership"][name]:
+                record = inputs["agent1"].get(file_hash)
+                if record and not record["summary"].startswith("ERROR:"):
+                    records.append(dict(record, title=title))
+            if not records:
+                raise RuntimeError(f"No summaries available for project {name}")
+            os.makedirs(project_dir, exist_ok=True)
+            agent1_output = os.path.join(project_dir, "agent1_summaries.txt")
+            write_jsonl(jsonl_path_for(agent1_output), records)
+            with open(agent1_output, 'w', encoding='utf-8') as f:
+                f.write(render_agent1_text(records))
+            print(f"\n🔬 [{name}] Agent 2 - Postdoc Fragmentation Analysis ({len(records)} papers)")
+            return PostdocAgent().review_and_refine_batch(
+                summaries=[record["summary"] for record in records],
+                paper_titles=[record["title"] for record in records],
+                save_path=os.path.join(project_dir, "agent2_fragmentation.txt"),
+                file_hashes=[record["file_hash"] for record in records]
+            )
+
+        def agent3(inputs):
+            print(f"\n🎓 [{name}] Agent 3 - Professor Final Synthesis")
+            output = os.path.join(project_dir, "agent3_synthesis.txt")
+            main = inputs[f"main_paper:{name}"]
+            if all_main_papers:
+                save_paths, index_path = synthesis_paths(output, main["titles"])
+                reports = ProfessorAgent().generate_final_reports(
+                    main_papers=list(zip(main["titles"], main["contents"])),
+                    fragmentation_analysis=inputs[f"agent2:{name}"],
+                    save_paths=save_paths,
+                    discussions=[extract_discussion_section(content) for content in main["contents"]],
+                    index_path=index_path
+                )
+                if all(report.startswith("ERROR:") for report in reports):
+                    raise RuntimeError("Every main-paper synthesis failed")
+                return reports
+            return ProfessorAgent().generate_final_report(
+                main_paper_content=main["content"],
+                fragmentation_analysis=inputs[f"agent2:{name}"],
+                save_details_path=output,
+                main_paper_discussion=extract_discussion_section(main["content"])
+            )
+
+        if all_main_papers:
+            load_main = lambda inputs: load_main_papers(workers, project["main_paper"])
+        else:
+            load_main = lambda inputs: load_main_paper(project["main_paper"])
+        return [
+            Stage(f"main_paper:{name}", guarded("main paper", load_main)),
+            Stage(f"agent2:{name}", guarded("Agent 2", agent2), ["references", "agent1"]),
+            Stage(f"agent3:{name}", guarded("Agent 3", agent3), [f"main_paper:{name}", f"agent2:{name}"]),
+        ]
+
+    stages = [
+        Stage("references", references),
+        Stage("agent1", agent1, ["references"]),
+    ]
+    for project in projects:
+        stages += project_stages(project)
+    return stages
+
+def run_corpus(manifest_path, output_dir, workers=None, incremental=True, all_main_papers=False):
+    """
+    Run corpus mode for every project in the manifest and write a corpus_summary.json.
+
+    Projects that fail are marked "failed" (with the error) in corpus_summary.json; the others finish.
+
+    Returns:
+        dict: Stage artifacts, or None if the manifest had no usable projects, a shared stage
+        failed or every project failed
+    """
+    projects = load_corpus_manifest(manifest_path)
+    if not projects:
+        print(f"❌ No usable projects in {manifest_path}")
+        return None
+    print(f"🗂️  Corpus mode: {len(projects)} projects -> {output_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    failures = {}
+    stages = build_corpus_pipeline(projects, output_dir, workers, incremental, all_main_papers, failures)
+    try:
+        artifacts, timings = run_stages(stages)
+    except StageError as e:
+        print(f"❌ Corpus {e}")
+        print_timing_breakdown(stages, e.timings)
+        return None
+    print_timing_breakdown(stages, timings)
+
+    references = artifacts["references"]
+    projects_per_paper = Counter(file_hash for files in references["membership"].values() for _, file_hash in files)
+    summary = {
+        "manifest": os.path.abspath(manifest_path),
+        "reference_files": references["files"],
+        "unique_papers": len(references["papers"]["hashes"]),
+        "duplicates_skipped": references["duplicates"],
+        "near_duplicates_skipped": references["near_duplicates"],
+        "extraction_failures": references["extraction_failures"],
+        "agent1_output": os.path.join(output_dir, "agent1_summaries.txt"),
+        "projects": [
+            {
+                "name": project["name"],
+                "status": "failed" if project["name"] in failures else "ok",
+                "error": failures.get(project["name"]),
+                "main_paper": project["main_paper"],
+                "references": project["references"],
+                "papers": len(references["membership"][project["name"]]),
+                "shared_papers": sum(1 for _, file_hash in references["membership"][project["name"]]
+                                     if projects_per_paper[file_hash] > 1),
+                "output_dir": os.path.join(output_dir, project["name"]),
+            }
+            for project in projects
+        ],
+    }
+    with open(os.path.join(output_dir, "corpus_summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"♻️  {summary['duplicates_skipped']} duplicate reference file(s) reused instead of re-summarized")
+    if summary["extraction_failures"]:
+        print(f"⚠️  {len(summary['extraction_failures'])} reference file(s) had no extractable text "
+              f"(listed in corpus_summary.json)")
+    if failures:
+        print(f"❌ {len(failures)} of {len(projects)} project(s) failed: {', '.join(sorted(failures))} "
+              f"(see corpus_summary.json)")
+    return artifacts if len(failures) < len(projects) else None
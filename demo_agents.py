@@ -10,10 +10,11 @@ import os
 import sys
 from datetime import datetime
 
-from utils import extract_text_from_pdf, get_pdf_files
+from utils import extract_text_from_file, extract_texts_parallel, get_pdf_files
 from phd_student_agent import PhDStudentAgent
 from postdoc_agent import PostdocAgent
 from professor_agent import ProfessorAgent
+from artifacts import load_summaries, load_fragmentation_analysis
 from config import MAIN_PAPER_FOLDER, REFERENCES_FOLDER
 
 def demo_agent_1():
@@ -34,14 +35,11 @@ def demo_agent_1():
     paper_texts = []
     paper_titles = []
     
-    for file_path in reference_files:
-        filename = os.path.basename(file_path)
-        print(f"  📄 Processing: {filename}")
-        
-        text = extract_text_from_pdf(file_path)
+    texts = extract_texts_parallel(reference_files, reference_papers=True)
+    for file_path, text in zip(reference_files, texts):
         if text.strip():
             paper_texts.append(text)
-            paper_titles.append(filename)
+            paper_titles.append(os.path.basename(file_path))
     
     if not paper_texts:
         print("❌ No valid papers to process!")
@@ -72,28 +70,9 @@ def demo_agent_2(agent1_output_file):
         print("❌ Agent 1 output file not found!")
         return None
     
-    # Parse summaries from Agent 1 output
+    # Load summaries from Agent 1 output (JSONL artifact, or legacy txt)
     try:
-        with open(agent1_output_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Simple parsing of Agent 1 output
-        summaries = []
-        paper_titles = []
-        
-        sections = content.split("## ")
-        for section in sections[1:]:  # Skip header
-            if section.strip():
-                lines = section.strip().split('\n')
-                if lines:
-                    title = lines[0].strip()
-                    summary = '\n'.join(lines[1:]).strip()
-                    summary = summary.replace('='*80, '').strip()
-                    
-                    if summary:
-                        paper_titles.append(title)
-                        summaries.append(summary)
-        
+        paper_titles, summaries, file_hashes = load_summaries(agent1_output_file)
         print(f"📊 Parsed {len(summaries)} summaries from Agent 1")
         
     except Exception as e:
@@ -107,7 +86,8 @@ def demo_agent_2(agent1_output_file):
     fragmentation_analysis = agent2.review_and_refine_batch(
         summaries=summaries,
         paper_titles=paper_titles,
-        save_path=output_file
+        save_path=output_file,
+        file_hashes=file_hashes
     )
     
     print(f"\n✅ Agent 2 Demo Complete!")
@@ -127,8 +107,7 @@ def demo_agent_3(agent2_output_file):
     
     # Load fragmentation analysis from Agent 2
     try:
-        with open(agent2_output_file, 'r', encoding='utf-8') as f:
-            fragmentation_analysis = f.read()
+        fragmentation_analysis = load_fragmentation_analysis(agent2_output_file)
         print("📊 Loaded fragmentation analysis from Agent 2")
     except Exception as e:
         print(f"❌ Error loading Agent 2 output: {e}")
@@ -141,7 +120,7 @@ def demo_agent_3(agent2_output_file):
             print("❌ No main paper found!")
             return None
         
-        main_paper_content = extract_text_from_pdf(main_paper_files[0])
+        main_paper_content = extract_text_from_file(main_paper_files[0])
         main_paper_title = os.path.basename(main_paper_files[0])
         print(f"📖 Loaded main paper: {main_paper_title}")
         
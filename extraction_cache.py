@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import threading
+
+from config import (
+    EXTRACTION_CACHE_DIR,
+    EXTRACTION_CACHE_MAX_BYTES,
+    EXTRACTOR_VERSION,
+)
+
+_EVICT_TO_FRACTION = 0.9  # Evict down to this share of max_bytes, so the next puts do not walk the cache again
+
+_content_hashes = {}  # (path, size, mtime_ns) -> SHA-256 of the file's bytes
+_content_hashes_lock = threading.Lock()
+
+def file_content_hash(file_path):
+    """
+    SHA-256 of a file's bytes, used to recognise unchanged papers across runs.
+    Remembered per file (path, size and mtime) for the life of the process, so the extraction
+    cache key and the summary manifest share a single read of each file.
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _content_hashes_lock:
+        cached = _content_hashes.get(memo_key)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    with _content_hashes_lock:
+        _content_hashes[memo_key] = digest.hexdigest()
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """
+    Content-addressed on-disk cache for extracted document text.
+
+    Entries are keyed by a SHA-256 of the file bytes plus the extractor version
+    and settings, so renamed or moved files still hit and edited files miss. Each
+    entry is a plain UTF-8 text file, optionally with a JSON sidecar of extraction
+    metadata (pages skipped, reference list); its mtime doubles as the LRU timestamp.
+    The cache directory is only walked when a running estimate of its size crosses
+    max_bytes, so a put costs a few stats rather than a scan of every entry.
+    """
+
+    def __init__(self, cache_dir=EXTRACTION_CACHE_DIR, max_bytes=EXTRACTION_CACHE_MAX_BYTES,
+                 extractor_version=EXTRACTOR_VERSION):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extractor_version = extractor_version
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._size_estimate = None  # bytes as of the last walk plus this process's writes since
+        self._size_lock = threading.Lock()
+
+    def file_key(self, file_path, variant="", content_hash=None):
+        """
+        Return the cache key for a file: hash of its content hash, the extractor version and settings
+        variant. Pass content_hash when it is already known to skip reading the file.
+        """
+        content_hash = content_hash or file_content_hash(file_path)
+        key = f"{self.extractor_version}\0{variant}\0{content_hash}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key, ext=".txt"):
+        return os.path.join(self.cache_dir, key[:2], f"{key}{ext}")
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def get(self, key):
+        """Return cached text for key, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                text = file.read()
+        except OSError:
+            self.misses += 1
+            return None
+        for used_path in (path, self._entry_path(key, ".json")):
+            try:
+                os.utime(used_path, None)  # mark as recently used
+            except OSError:
+                pass
+        self.hits += 1
+        return text
+
+    def get_meta(self, key):
+        """Return the metadata stored with key's text, or None if there is none."""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._entry_path(key, ".json"), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, text, meta=None):
+        """Store text (and optional metadata) under key and evict least recently used entries over the size cap."""
+        if not self.enabled or not text:
+            return
+        path = self._entry_path(key)
+        meta_path = self._entry_path(key, ".json")
+        replaced = self._file_size(path) + self._file_size(meta_path)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if meta is not None:
+                # Sidecar first, so a text entry is never visible without its metadata
+                tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    json.dump(meta, file, ensure_ascii=False)
+                os.replace(tmp_path, meta_path)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Could not write extraction cache entry: {e}")
+            return
+        with self._size_lock:
+            if self._size_estimate is None:
+                self._size_estimate = self.size_bytes()  # one walk per process; it already counts this entry
+            else:
+                self._size_estimate += self._file_size(path) + self._file_size(meta_path) - replaced
+            over = self._size_estimate > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith((".txt", ".json")):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Delete least recently used entries once the cache exceeds max_bytes, in one batch down to
+        _EVICT_TO_FRACTION of it. Returns the number of text entries removed.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > self.max_bytes:
+            removed, total = self._evict_oldest(entries, total, int(self.max_bytes * _EVICT_TO_FRACTION))
+        with self._size_lock:
+            self._size_estimate = total
+        return removed
+
+    def _evict_oldest(self, entries, total, target):
+        removed = 0
+        sizes = {path: size for _, size, path in entries}
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            if path not in sizes:
+                continue
+            # A text entry and its metadata sidecar are evicted together
+            root = os.path.splitext(path)[0]
+            for entry_path in (f"{root}.txt", f"{root}.json"):
+                if entry_path not in sizes:
+                    continue
+                try:
+                    os.remove(entry_path)
+                    total -= sizes.pop(entry_path)
+                    removed += entry_path.endswith(".txt")
+                except OSError:
+                    pass
+        return removed, total
+
+    def clear(self):
+        """Remove every cached entry. Returns the number of entries deleted."""
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+                removed += path.endswith(".txt")
+            except OSError:
+                pass
+        with self._size_lock:
+            self._size_estimate = None
+        return removed
+
+    def size_bytes(self):
+        """Total size of all cached entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+_extraction_cache = None
+
+def get_extraction_cache():
+    """Return the process-wide extraction cache, creating it on first use."""
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache()
+    return _extraction_cache
@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+"""
+Fake Groq API server for offline testing and benchmarking.
+
+Speaks the chat-completions (including stream=True), files and batches endpoints
+closely enough for the Groq SDK, with injectable latency, 429s, 5xx errors and
+batch queue delays. It can also sit in front of the real API to record a run and
+replay that recording deterministically later.
+
+Usage:
+    python fake_groq.py [--port 8765] [--latency lognormal:0.8,0.5] [--rate-429 0.05] [--rate-5xx 0.01]
+    python fake_groq.py --record run.jsonl [--upstream https://api.groq.com]
+    python fake_groq.py --replay run.jsonl [--strict]
+
+Then point AutoScholar at it with GROQ_BASE_URL=http://127.0.0.1:8765
+"""
+
+import argparse
+import email.parser
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+API_PREFIX = "/openai/v1"
+FILLER_WORDS = (
+    "the results suggest that the construct relates to performance across firms while the "
+    "evidence remains mixed for smaller samples and future research should test moderators"
+).split()
+
+class Distribution:
+    """
+    A delay distribution parsed from a spec string:
+    "fixed:S", "uniform:LOW,HIGH", "lognormal:MEDIAN,SIGMA" or "exp:MEAN" (seconds).
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, params = str(spec).partition(":")
+        if not params:  # a bare number means a fixed delay
+            kind, params = "fixed", kind
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",")]
+        if kind not in ("fixed", "uniform", "lognormal", "exp"):
+            raise ValueError(f"Unknown distribution: {spec}")
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        return rng.expovariate(1.0 / self.params[0])
+
+    def __repr__(self):
+        return self.spec
+
+def request_key(body):
+    """Key that identifies a chat request independently of streaming and transport details."""
+    relevant = {name: body.get(name) for name in ("model", "messages", "temperature", "max_tokens")}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode("utf-8")).hexdigest()
+
+def count_tokens(text):
+    return max(1, len(text) // 4)
+
+def completion_object(model, content, usage):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+def stream_events(model, content, usage):
+    """Yield the SSE payloads of a streamed completion: a few words per chunk, usage on the last one."""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    pieces = re.findall(r"\S+\s*", content) or [content]
+    for i in range(0, len(pieces), 4):
+        chunk = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": {"content": "".join(pieces[i:i + 4])}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+    final = {
+        "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        "x_groq": {"id": completion_id, "usage": usage},
+    }
+    yield f"data: {json.dumps(final)}\n\n".encode("utf-8")
+    yield b"data: [DONE]\n\n"
+
+def parse_sse_completion(raw):
+    """Recover (content, usage) from a recorded SSE body."""
+    parts = []
+    usage = None
+    for line in raw.decode("utf-8", errors="replace").splitlines():
+        if not line.startswith("data: ") or line == "data: [DONE]":
+            continue
+        chunk = json.loads(line[6:])
+        usage = (chunk.get("x_groq") or {}).get("usage") or chunk.get("usage") or usage
+        for choice in chunk.get("choices") or []:
+            parts.append((choice.get("delta") or {}).get("content") or "")
+    return "".join(parts), usage
+
+class Recording:
+    """
+    Recorded chat outcomes keyed by request_key, stored as JSONL.
+    Each key holds its outcomes in the order they happened (including 429s and errors),
+    and replay hands them out in that order, repeating the last one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.prompts = []  # recorded request bodies in order, for replaying a workload
+        self._cursor = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    if entry["key"] not in self.entries:
+                        self.prompts.append(entry["request"])
+                    self.entries.setdefault(entry["key"], []).append(entry)
+        return self
+
+    def add(self, request, status, latency, content=None, usage=None, error_body=None, retry_after=None, ttft=None):
+        entry = {
+            "key": request_key(request),
+            "request": {name: request.get(name) for name in ("model", "messages", "temperature", "max_tokens")},
+            "status": status,
+            "latency": round(latency, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "content": content,
+            "usage": usage,
+            "error_body": error_body,
+            "retry_after": retry_after,
+        }
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def rewind(self):
+        """Start handing out every key's outcomes from the first one again."""
+        with self._lock:
+            self._cursor.clear()
+
+    def completed(self, key):
+        """The first successful outcome recorded for key (batch lines are never throttled), or None."""
+        return next((entry for entry in self.entries.get(key, []) if entry["status"] == 200), None)
+
+    def next(self, key):
+        with self._lock:
+            outcomes = self.entries.get(key)
+            if not outcomes:
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return outcomes[min(index, len(outcomes) - 1)]
+
+class FakeGroq:
+    """
+    Server state: fault-injection settings, advertised rate limits, uploaded files and batches.
+
+    Args:
+        latency (str): Distribution of time to a complete (non-streamed) response
+        tokens_per_second (float): Generation speed used to pace streamed chunks
+        completion_tokens (int): Length of synthetic completions
+        rate_429 / rate_5xx (float): Probability that a request is throttled / fails
+        retry_after (float): retry-after seconds sent with injected 429s
+        rpm / tpm (int): Limits advertised in x-ratelimit-* headers
+        enforce_limits (bool): Also answer 429 when requests exceed rpm/tpm in the last minute
+        batch_delay (str): Distribution of time a batch spends queued before completing
+        seed (int): Seed for every random decision, so a run can be repeated
+        recording (Recording): Replay recorded outcomes instead of synthesizing them
+        upstream (str): Proxy to this API and write what it returns to record_path
+    """
+
+    def __init__(self, latency="lognormal:0.8,0.5", tokens_per_second=400, completion_tokens=300,
+                 rate_429=0.0, rate_5xx=0.0, retry_after=1.0, rpm=14400, tpm=6000000, enforce_limits=False,
+                 batch_delay="fixed:2", seed=0, recording=None, strict=False, upstream=None, record_path=None):
+        self.latency = Distribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.rpm = rpm
+        self.tpm = tpm
+        self.enforce_limits = enforce_limits
+        self.batch_delay = Distribution(batch_delay)
+        self.recording = recording
+        self.strict = strict
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.recorder = Recording(record_path) if record_path else None
+        self.rng = random.Random(seed)
+        self.files = {}
+        self.batches = {}
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+        self._window = deque()  # (time, tokens) of requests in the last minute
+        self._lock = threading.Lock()
+        self._proxy = httpx.Client(timeout=600) if self.upstream else None
+        self._upstream_files = {}  # upstream input file id -> {custom_id: request body}
+        self._upstream_outputs = {}  # upstream output file id -> input file id
+
+    def _draw(self, distribution=None):
+        with self._lock:
+            return distribution.sample(self.rng) if distribution else self.rng.random()
+
+    def rate_limit_headers(self, tokens=0):
+        """Account for a request in the one-minute window and return (headers, over_limit)."""
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] > 60:
+                self._window.popleft()
+            used_requests = len(self._window)
+            used_tokens = sum(amount for _, amount in self._window)
+            over = self.enforce_limits and (used_requests + 1 > self.rpm or used_tokens + tokens > self.tpm)
+            if not over:
+                self._window.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+            reset = 60 - (now - self._window[0][0]) if self._window else 0.0
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(max(0, self.rpm - used_requests)),
+            "x-ratelimit-reset-requests": f"{reset:.2f}s",
+            "x-ratelimit-limit-tokens": str(self.tpm),
+            "x-ratelimit-remaining-tokens": str(max(0, self.tpm - used_tokens)),
+            "x-ratelimit-reset-tokens": f"{reset:.2f}s",
+        }
+        if over:
+            headers["retry-after"] = f"{max(reset, 0.05):.2f}"
+        return headers, over
+
+    def synthesize(self, body):
+        """Deterministic fake completion for a request: (content, usage)."""
+        prompt = "".join(message.get("content") or "" for message in body.get("messages") or [])
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        words = [FILLER_WORDS[(int(digest[i % 64], 16) + i) % len(FILLER_WORDS)] for i in range(self.completion_tokens)]
+        content = f"Fake completion {digest[:12]}: " + " ".join(words) + "."
+        prompt_tokens = count_tokens(prompt)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": self.completion_tokens,
+                 "total_tokens": prompt_tokens + self.completion_tokens}
+        return content, usage
+
+    def outcome(self, body):
+        """
+        Decide how to answer one chat request.
+        Returns a dict with status, latency, headers and either content/usage or an error body.
+        """
+        key = request_key(body)
+        recorded = self.recording.next(key) if self.recording else None
+        if self.recording and recorded is None and self.strict:
+            return {"status": 404, "latency": 0.0, "headers": {},
+                    "error_body": {"error": {"message": f"No recorded response for request {key[:12]}"}}}
+        prompt_tokens = count_tokens(json.dumps(body.get("messages") or []))
+        headers, over = self.rate_limit_headers(prompt_tokens + (body.get("max_tokens") or 0))
+        if recorded is not None:
+            if recorded.get("retry_after") is not None:
+                headers["retry-after"] = str(recorded["retry_after"])
+            return {"status": recorded["status"], "latency": recorded["latency"], "ttft": recorded.get("ttft"),
+                    "headers": headers, "content": recorded.get("content"), "usage": recorded.get("usage"),
+                    "error_body": recorded.get("error_body")}
+        if over or self._draw() < self.rate_429:
+            headers.setdefault("retry-after", str(self.retry_after))
+            return {"status": 429, "latency": 0.01, "headers": headers,
+                    "error_body": {"error": {"message": "Rate limit reached (injected)", "type": "tokens",
+                                             "code": "rate_limit_exceeded"}}}
+        if self._draw() < self.rate_5xx:
+            return {"status": 503, "latency": self._draw(self.latency) / 2, "headers": headers,
+                    "error_body": {"error": {"message": "Service unavailable (injected)", "type": "internal_server_error"}}}
+        content, usage = self.synthesize(body)
+        return {"status": 200, "latency": self._draw(self.latency), "headers": headers,
+                "content": content, "usage": usage}
+
+    def batch_output(self, input_file_id):
+        """Build the output JSONL of a batch by answering each input line."""
+        lines = []
+        for line in self.files[input_file_id]["data"].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request["body"]
+            recorded = self.recording.completed(request_key(body)) if self.recording else None
+            if recorded is not None:
+                content, usage, status = recorded["content"], recorded["usage"], 200
+            elif self.recording and self.strict:
+                content, usage, status = None, None, 404
+            elif self._draw() >= self.rate_5xx:
+                (content, usage), status = self.synthesize(body), 200
+            else:
+                content, usage, status = None, None, 500
+            error = "No recorded response" if status == 404 else "Request failed (injected)"
+            response = {"status_code": status, "request_id": uuid.uuid4().hex,
+                        "body": completion_object(body.get("model"), content, usage) if status == 200
+                        else {"error": {"message": error}}}
+            lines.append(json.dumps({"id": f"batch_req_{uuid.uuid4().hex[:16]}", "custom_id": request["custom_id"],
+                                     "response": response, "error": None}))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling behaves as against the real API
+    server_version = "FakeGroq/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def _read_body(self):
+        length = int(self.headers.get("content-length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload, headers=None, content_type="application/json"):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, status, headers):
+        self.send_response(status)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        path = self.path.split("?")[0]
+        if not path.startswith(API_PREFIX):
+            return self._send(404, {"error": {"message": f"Unknown path {path}"}})
+        route = path[len(API_PREFIX):]
+        body = self._read_body() if method == "POST" else b""
+        if self.fake.upstream:
+            return self._proxy(method, route, body)
+        if method == "POST" and route == "/chat/completions":
+            return self._chat(json.loads(body))
+        if method == "POST" and route == "/files":
+            return self._upload(body)
+        match = re.fullmatch(r"/files/([\w-]+)/content", route)
+        if method == "GET" and match:
+            file = self.fake.files.get(match.group(1))
+            if file is None:
+                return self._send(404, {"error": {"message": "File not found"}})
+            return self._send(200, file["data"], content_type="application/octet-stream")
+        if method == "POST" and route == "/batches":
+            return self._create_batch(json.loads(body))
+        match = re.fullmatch(r"/batches/([\w-]+)", route)
+        if method == "GET" and match:
+            return self._retrieve_batch(match.group(1))
+        return self._send(404, {"error": {"message": f"Unsupported endpoint {method} {route}"}})
+
+    def _chat(self, body):
+        fake = self.fake
+        with fake._lock:
+            fake.stats["requests"] += 1
+            fake.stats["in_flight"] += 1
+            fake.stats["max_in_flight"] = max(fake.stats["max_in_flight"], fake.stats["in_flight"])
+        try:
+            outcome = fake.outcome(body)
+            if outcome["status"] != 200:
+                with fake._lock:
+                    fake.stats["throttled" if outcome["status"] == 429 else "errors"] += 1
+                time.sleep(outcome["latency"])
+                return self._send(outcome["status"], outcome["error_body"], outcome["headers"])
+            if not body.get("stream"):
+                time.sleep(outcome["latency"])
+                return self._send(200, completion_object(body.get("model"), outcome["content"], outcome["usage"]),
+                                  outcome["headers"])
+            events = list(stream_events(body.get("model"), outcome["content"], outcome["usage"]))
+            # Spend the first-token share of the latency up front, then pace chunks at tokens_per_second
+            ttft = outcome.get("ttft")
+            if ttft is None:
+                ttft = outcome["latency"] * 0.3
+            per_event = 4.0 / fake.tokens_per_second if fake.tokens_per_second else 0.0
+            time.sleep(ttft)
+            self._start_chunked(200, outcome["headers"])
+            for event in events:
+                self._write_chunk(event)
+                if per_event:
+                    time.sleep(per_event)
+            self._end_chunked()
+        finally:
+            with fake._lock:
+                fake.stats["in_flight"] -= 1
+
+    def _upload(self, body):
+        message = email.parser.BytesParser().parsebytes(
+            b"content-type: " + self.headers["content-type"].encode("latin-1") + b"\r\n\r\n" + body
+        )
+        data = b""
+        filename = "upload.jsonl"
+        for part in message.get_payload():
+            if part.get_param("name", header="content-disposition") == "file":
+                data = part.get_payload(decode=True)
+                filename = part.get_filename() or filename
+        file_id = f"file_{uuid.uuid4().hex[:24]}"
+        self.fake.files[file_id] = {"data": data}
+        return self._send(200, {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                                "filename": filename, "purpose": "batch"})
+
+    def _create_batch(self, body):
+        if body.get("input_file_id") not in self.fake.files:
+            return self._send(400, {"error": {"message": "input_file_id not found"}})
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        self.fake.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": body.get("endpoint"),
+            "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window", "24h"),
+            "status": "validating", "created_at": int(time.time()), "output_file_id": None,
+            "_ready_at": time.monotonic() + self.fake._draw(self.fake.batch_delay),
+        }
+        return self._retrieve_batch(batch_id)
+
+    def _retrieve_batch(self, batch_id):
+        batch = self.fake.batches.get(batch_id)
+        if batch is None:
+            return self._send(404, {"error": {"message": "Batch not found"}})
+        if batch["status"] != "completed":
+            if time.monotonic() >= batch["_ready_at"]:
+                output_id = f"file_{uuid.uuid4().hex[:24]}"
+                self.fake.files[output_id] = {"data": self.fake.batch_output(batch["input_file_id"])}
+                batch.update(status="completed", output_file_id=output_id, completed_at=int(time.time()))
+            else:
+                batch["status"] = "in_progress"
+        return self._send(200, {key: value for key, value in batch.items() if not key.startswith("_")})
+
+    def _proxy(self, method, route, body):
+        """Forward to the upstream API and record chat outcomes (including batch results) as they pass."""
+        fake = self.fake
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in ("host", "content-length", "accept-encoding", "connection")}
+        headers["accept-encoding"] = "identity"  # relay and record bodies exactly as sent
+        request = fake._proxy.build_request(method, fake.upstream + API_PREFIX + route, headers=headers,
+                                            content=body or None)
+        started = time.perf_counter()
+        response = fake._proxy.send(request, stream=True)
+        try:
+            passthrough = {name: value for name, value in response.headers.items()
+                           if name.lower().startswith("x-ratelimit") or name.lower() == "retry-after"}
+            if response.headers.get("content-type", "").startswith("text/event-stream"):
+                # Relay the stream as it arrives so clients still see real time-to-first-token
+                self._start_chunked(response.status_code, passthrough)
+                raw = b""
+                ttft = None
+                for data in response.iter_raw():
+                    ttft = ttft if ttft is not None else time.perf_counter() - started
+                    raw += data
+                    self._write_chunk(data)
+                self._end_chunked()
+                content, usage = parse_sse_completion(raw)
+                fake.recorder.add(json.loads(body), response.status_code, time.perf_counter() - started,
+                                  content=content, usage=usage, ttft=ttft)
+                return
+            data = response.read()
+        finally:
+            response.close()
+        latency = time.perf_counter() - started
+        self._send(response.status_code, data, passthrough, response.headers.get("content-type", "application/json"))
+        self._record_proxied(method, route, body, response, data, latency)
+
+    def _record_proxied(self, method, route, body, response, data, latency):
+        fake = self.fake
+        try:
+            payload = json.loads(data) if data and not route.endswith("/content") else None
+        except ValueError:
+            payload = None
+        if method == "POST" and route == "/chat/completions":
+            if response.status_code == 200:
+                fake.recorder.add(json.loads(body), 200, latency, content=payload["choices"][0]["message"]["content"],
+                                  usage=payload.get("usage"))
+            else:
+                fake.recorder.add(json.loads(body), response.status_code, latency, error_body=payload,
+                                  retry_after=response.headers.get("retry-after"))
+        elif method == "POST" and route == "/files" and response.status_code == 200:
+            message = email.parser.BytesParser().parsebytes(
+                b"content-type: " + self.headers["content-type"].encode("latin-1") + b"\r\n\r\n" + body
+            )
+            requests = {}
+            for part in message.get_payload():
+                if part.get_param("name", header="content-disposition") == "file":
+                    for line in part.get_payload(decode=True).decode("utf-8").splitlines():
+                        if line.strip():
+                            line = json.loads(line)
+                            requests[line["custom_id"]] = line["body"]
+            fake._upstream_files[payload["id"]] = requests
+        elif route.startswith("/batches") and payload and payload.get("output_file_id"):
+            fake._upstream_outputs[payload["output_file_id"]] = payload.get("input_file_id")
+        elif route.endswith("/content") and response.status_code == 200:
+            file_id = route.split("/")[2]
+            requests = fake._upstream_files.get(fake._upstream_outputs.get(file_id), {})
+            for line in data.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                request = requests.get(result.get("custom_id"))
+                result_body = (result.get("response") or {}).get("body") or {}
+                if request is not None and result_body.get("choices"):
+                    fake.recorder.add(request, 200, 0.0, content=result_body["choices"][0]["message"]["content"],
+                                      usage=result_body.get("usage"))
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # listen() backlog; the default of 5 drops connections at high concurrency
+
+class FakeGroqServer:
+    """
+    Run a FakeGroq on a background thread.
+    Use as a context manager; base_url is what GROQ_BASE_URL should be set to.
+    """
+
+    def __init__(self, fake=None, host="127.0.0.1", port=0):
+        self.fake = fake or FakeGroq()
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.fake = self.fake
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def add_fault_arguments(parser):
+    """Command-line options shared by this server and benchmark.py."""
+    parser.add_argument("--latency", default="lognormal:0.8,0.5",
+                        help="Response time distribution: fixed:S, uniform:LOW,HIGH, lognormal:MEDIAN,SIGMA or exp:MEAN")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="Pacing of streamed chunks")
+    parser.add_argument("--completion-tokens", type=int, default=300, help="Length of synthetic completions")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after seconds sent with injected 429s")
+    parser.add_argument("--rpm", type=int, default=14400, help="Requests-per-minute limit advertised in headers")
+    parser.add_argument("--tpm", type=int, default=6000000, help="Tokens-per-minute limit advertised in headers")
+    parser.add_argument("--enforce-limits", action="store_true", help="Answer 429 when --rpm/--tpm are exceeded")
+    parser.add_argument("--batch-delay", default="fixed:2", help="Time a batch stays queued (distribution spec)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and fault injection")
+    parser.add_argument("--replay", help="Serve outcomes from this recording instead of synthesizing them")
+    parser.add_argument("--strict", action="store_true", help="With --replay, answer 404 for unrecorded requests")
+
+def fake_from_args(args, **overrides):
+    """Build a FakeGroq from add_fault_arguments options."""
+    settings = dict(
+        latency=args.latency, tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens,
+        rate_429=args.rate_429, rate_5xx=args.rate_5xx, retry_after=args.retry_after, rpm=args.rpm, tpm=args.tpm,
+        enforce_limits=args.enforce_limits, batch_delay=args.batch_delay, seed=args.seed,
+        recording=Recording(args.replay).load() if args.replay else None, strict=args.strict,
+    )
+    settings.update(overrides)
+    return FakeGroq(**settings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq API server for offline runs and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--record", help="Proxy to --upstream and append every chat outcome to this JSONL file")
+    parser.add_argument("--upstream", default="https://api.groq.com", help="Real API used with --record")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    if args.record:
+        fake = FakeGroq(upstream=args.upstream, record_path=args.record)
+        mode = f"recording {args.upstream} to {args.record}"
+    else:
+        fake = fake_from_args(args)
+        mode = f"replaying {args.replay}" if args.replay else (
+            f"latency {args.latency}, 429 rate {args.rate_429}, 5xx rate {args.rate_5xx}, batch delay {args.batch_delay}")
+    server = FakeGroqServer(fake, args.host, args.port)
+    print(f"🧪 Fake Groq API on {server.base_url} ({mode})")
+    print(f"   export GROQ_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {fake.stats['requests']} chat requests, {fake.stats['throttled']} throttled, "
+              f"{fake.stats['errors']} errors, {fake.stats['max_in_flight']} max in flight")
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import contextvars
+import json
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    GROQ_MODEL,
+    GROQ_TEMPERATURE,
+    GROQ_MAX_TOKENS,
+    BATCH_MAX_REQUESTS,
+    BATCH_MAX_BYTES,
+    BATCH_SPOOL_BYTES,
+    BATCH_POLL_SECONDS,
+)
+from telemetry import get_telemetry
+
+TERMINAL_STATUSES = ["completed", "failed", "expired", "cancelled"]
+
+def _field(obj, name):
+    """Read a field from an SDK object or a plain dict."""
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+def _request_line(custom_id, prompt):
+    req = {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": GROQ_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": GROQ_TEMPERATURE,
+            "max_tokens": GROQ_MAX_TOKENS
+        }
+    }
+    return (json.dumps(req, ensure_ascii=False) + "\n").encode("utf-8")
+
+def split_into_batches(prompts, max_requests=BATCH_MAX_REQUESTS, max_bytes=BATCH_MAX_BYTES):
+    """
+    Yield (indices, lines) groups that each respect the Batch API request-count and file-size limits.
+    Each line is an encoded JSONL request whose custom_id is the prompt's index.
+    """
+    indices = []
+    lines = []
+    size = 0
+    for i, prompt in enumerate(prompts):
+        line = _request_line(f"req-{i}", prompt)
+        if lines and (len(lines) >= max_requests or size + len(line) > max_bytes):
+            yield indices, lines
+            indices, lines, size = [], [], 0
+        indices.append(i)
+        lines.append(line)
+        size += len(line)
+    if lines:
+        yield indices, lines
+
+def _submit_and_wait(client, run_id, part, lines):
+    """Upload one batch file, create the job, poll it to completion and return {custom_id: content}."""
+    label = f"batch {part + 1}"
+    # Spooled file: stays in memory for typical jobs, spills to a private temp file for huge ones,
+    # and is streamed to the upload either way. Nothing is written to the working directory.
+    with tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES) as spooled:
+        for line in lines:
+            spooled.write(line)
+        spooled.seek(0)
+        file_obj = client.files.create(
+            file=(f"autoscholar_{run_id}_{part}.jsonl", spooled, "application/jsonl"),
+            purpose="batch",
+        )
+    print(f"📤 Uploaded {label} ({len(lines)} requests)")
+
+    batch = client.batches.create(
+        completion_window="24h",
+        endpoint="/v1/chat/completions",
+        input_file_id=_field(file_obj, "id"),
+    )
+    batch_id = _field(batch, "id")
+    created_ns = time.time_ns()
+    created_at = time.perf_counter()
+
+    # Wait for batch to complete
+    while True:
+        status = client.batches.retrieve(batch_id)
+        state = _field(status, "status")
+        if state in TERMINAL_STATUSES:
+            break
+        print(f"Batch status ({label}): {state}... waiting...")
+        time.sleep(BATCH_POLL_SECONDS)
+    wait_seconds = time.perf_counter() - created_at
+
+    if state != "completed":
+        get_telemetry().record_batch(batch_id, len(lines), wait_seconds, state, created_ns)
+        raise Exception(f"Batch job failed or did not complete: {state}")
+
+    # Download results and map them by custom_id
+    output = client.files.content(_field(status, "output_file_id"))
+    raw = output.read() if hasattr(output, "read") else output
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+
+    results = {}
+    prompt_tokens = completion_tokens = 0
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        response = obj.get("response") or {}
+        body = _field(response, "body") or {}
+        usage = body.get("usage") or {}
+        prompt_tokens += usage.get("prompt_tokens") or 0
+        completion_tokens += usage.get("completion_tokens") or 0
+        if _field(response, "status_code") not in (None, 200) or not body.get("choices"):
+            error = obj.get("error") or body.get("error") or "no completion returned"
+            results[obj["custom_id"]] = f"ERROR: {error}"
+            continue
+        results[obj["custom_id"]] = body["choices"][0]["message"]["content"]
+    get_telemetry().record_batch(batch_id, len(lines), wait_seconds, state, created_ns, prompt_tokens, completion_tokens)
+    return results
+
+def run_batch_prompts(client, prompts, max_requests=BATCH_MAX_REQUESTS, max_bytes=BATCH_MAX_BYTES):
+    """
+    Run prompts through the Groq Batch API and return completions in prompt order.
+    Oversized jobs are split into several batches that are submitted and polled in parallel.
+    Prompts with no result, including every prompt of a part whose job failed, come back as
+    "ERROR: ..." strings.
+    """
+    run_id = uuid.uuid4().hex[:12]
+    parts = list(split_into_batches(prompts, max_requests, max_bytes))
+    if len(parts) > 1:
+        print(f"📦 Splitting {len(prompts)} requests into {len(parts)} batches")
+
+    merged = {}
+    with ThreadPoolExecutor(max_workers=len(parts) or 1) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _submit_and_wait, client, run_id, part, lines)
+            for part, (_, lines) in enumerate(parts)
+        ]
+        for (indices, _), future in zip(parts, futures):
+            try:
+                merged.update(future.result())
+            except Exception as e:
+                # One failed part must not discard the results of the parts that completed
+                print(f"❌ Batch part with {len(indices)} requests failed: {e}")
+                merged.update({f"req-{i}": f"ERROR: {e}" for i in indices})
+
+    # Return results in order
+    return [merged.get(f"req-{i}", f"ERROR: missing batch result for request {i}") for i in range(len(prompts))]
@@ -0,0 +1,85 @@
+import asyncio
+import atexit
+import threading
+import weakref
+
+import httpx
+from groq import AsyncGroq, DefaultAsyncHttpxClient, DefaultHttpxClient, Groq
+
+from config import (
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    GROQ_HTTP2,
+    GROQ_MAX_CONNECTIONS,
+    GROQ_MAX_KEEPALIVE_CONNECTIONS,
+    GROQ_KEEPALIVE_EXPIRY,
+)
+
+_lock = threading.Lock()
+_sync_client = None
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncGroq
+
+def _http2_enabled():
+    """HTTP/2 is used only when requested and the optional h2 package is installed."""
+    if not GROQ_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _pool_limits():
+    return httpx.Limits(
+        max_connections=GROQ_MAX_CONNECTIONS,
+        max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+    )
+
+def get_groq_client():
+    """
+    Return the process-wide sync Groq client, creating it on first use.
+    All threads share it, so its HTTP connection pool and TLS sessions are reused.
+    SDK-level retries are disabled; call_groq_api retries itself so the rate limiter sees every 429.
+    """
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                http_client = DefaultHttpxClient(limits=_pool_limits(), http2=_http2_enabled())
+                _sync_client = Groq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, http_client=http_client,
+                                    max_retries=0)
+    return _sync_client
+
+def get_async_groq_client():
+    """
+    Return the AsyncGroq client for the running event loop, creating it on first use.
+    Async HTTP connections are bound to a loop, so there is one shared client per loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            http_client = DefaultAsyncHttpxClient(limits=_pool_limits(), http2=_http2_enabled())
+            client = AsyncGroq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, http_client=http_client,
+                               max_retries=0)
+            _async_clients[loop] = client
+    return client
+
+async def close_async_groq_client():
+    """Close the running loop's AsyncGroq client, if one was created."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+def close_groq_client():
+    """Close the shared sync client and its connection pool."""
+    global _sync_client
+    with _lock:
+        client, _sync_client = _sync_client, None
+    if client is not None:
+        client.close()
+
+atexit.register(close_groq_client)
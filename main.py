@@ -16,7 +16,7 @@ import sys
 import time
 from datetime import datetime
 
-from utils import extract_text_from_file, get_document_files, save_report
+from utils import extract_text_from_file, extract_texts_parallel, file_content_hash, get_document_files, save_report
 
 # Keep backward compatibility
 get_pdf_files = get_document_files
@@ -24,6 +24,10 @@ extract_text_from_pdf = extract_text_from_file
 from phd_student_agent import PhDStudentAgent
 from postdoc_agent import PostdocAgent
 from professor_agent import ProfessorAgent
+from artifacts import load_summaries, load_fragmentation_analysis, synthesis_paths
+from pipeline import run_full_pipeline as run_pipeline
+from near_duplicates import dedupe_papers
+from telemetry import export_telemetry
 from config import MAIN_PAPER_FOLDER, REFERENCES_FOLDER, OUTPUT_FILE
 
 def print_header():
@@ -51,37 +55,39 @@ def run_agent_1_only():
     
     # Extract texts
     print("📖 Extracting text from papers...")
-    paper_texts = []
-    paper_titles = []
+    papers = {"texts": [], "titles": [], "hashes": []}
     
-    for i, file_path in enumerate(reference_files, 1):
+    texts = extract_texts_parallel(reference_files, reference_papers=True)
+    for file_path, text in zip(reference_files, texts):
         filename = os.path.basename(file_path)
-        print(f"  Processing {i}/{len(reference_files)}: {filename}")
-        
-        text = extract_text_from_pdf(file_path)
         if text.strip():
-            paper_texts.append(text)
-            paper_titles.append(filename)
+            papers["texts"].append(text)
+            papers["titles"].append(filename)
+            papers["hashes"].append(file_content_hash(file_path))
         else:
             print(f"    ⚠️  Warning: No text extracted from {filename}")
     
-    if not paper_texts:
+    if not papers["texts"]:
         print("❌ No valid papers to process!")
         return
     
+    papers, _ = dedupe_papers(papers)
+    
     # Run Agent 1
     agent1 = PhDStudentAgent()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = f"agent1_summaries_{timestamp}.txt"
     
     summaries = agent1.summarize_paper_batch(
-        paper_texts=paper_texts,
-        paper_titles=paper_titles,
-        save_path=output_file
+        paper_texts=papers["texts"],
+        paper_titles=papers["titles"],
+        save_path=output_file,
+        file_hashes=papers["hashes"]
     )
     
     print(f"\n✅ Agent 1 completed! Summaries saved to: {output_file}")
-    print(f"📊 Total papers summarized: {len(summaries)}")
+    print(f"📊 Total papers summarized: {sum(1 for summary in summaries if not summary.startswith('ERROR:'))} "
+          f"of {len(summaries)}")
 
 def run_agent_2_only():
     """Run only Agent 2 (Postdoc) - Fragmentation Analysis."""
@@ -101,28 +107,9 @@ def run_agent_2_only():
     latest_file = max(agent1_files, key=os.path.getmtime)
     print(f"📄 Using Agent 1 output: {latest_file}")
     
-    # Parse summaries from Agent 1 output
+    # Load summaries from Agent 1 output (JSONL artifact, or legacy txt)
     try:
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract summaries (simple parsing)
-        summaries = []
-        paper_titles = []
-        
-        sections = content.split("## ")
-        for section in sections[1:]:  # Skip header
-            if section.strip():
-                lines = section.strip().split('\n')
-                if lines:
-                    title = lines[0].strip()
-                    summary = '\n'.join(lines[1:]).strip()
-                    summary = summary.replace('='*80, '').strip()
-                    
-                    if summary:
-                        paper_titles.append(title)
-                        summaries.append(summary)
-        
+        paper_titles, summaries, file_hashes = load_summaries(latest_file)
         print(f"📊 Parsed {len(summaries)} summaries from Agent 1 output")
         
     except Exception as e:
@@ -137,11 +124,20 @@ def run_agent_2_only():
     fragmentation_analysis = agent2.review_and_refine_batch(
         summaries=summaries,
         paper_titles=paper_titles,
-        save_path=output_file
+        save_path=output_file,
+        file_hashes=file_hashes
     )
     
     print(f"\n✅ Agent 2 completed! Fragmentation analysis saved to: {output_file}")
 
+def ask_all_main_papers():
+    """When mainPaper holds several papers, ask whether Agent 3 should synthesize all of them."""
+    count = len(get_pdf_files(MAIN_PAPER_FOLDER))
+    if count <= 1:
+        return False
+    answer = input(f"📚 {count} main papers found. Synthesize all of them in parallel? (y/N): ").strip().lower()
+    return answer in ("y", "yes")
+
 def run_agent_3_only():
     """Run only Agent 3 (Professor) - Final Synthesis."""
     print("\n🎓 AGENT 3 ONLY: Professor Final Synthesis")
@@ -162,20 +158,41 @@ def run_agent_3_only():
     
     # Load fragmentation analysis
     try:
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            fragmentation_analysis = f.read()
+        fragmentation_analysis = load_fragmentation_analysis(latest_file)
         print("📊 Loaded fragmentation analysis from Agent 2")
     except Exception as e:
         print(f"❌ Error loading Agent 2 output: {e}")
         return
     
-    # Load main paper
+    # Load main paper(s)
     try:
         main_paper_files = get_pdf_files(MAIN_PAPER_FOLDER)
         if not main_paper_files:
             print("❌ No main paper found!")
             return
         
+        if ask_all_main_papers():
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            texts = extract_texts_parallel(main_paper_files)
+            main_papers = [(os.path.basename(path), text) for path, text in zip(main_paper_files, texts) if text.strip()]
+            if not main_papers:
+                print("❌ No text could be extracted from the main papers!")
+                return
+            save_paths, index_path = synthesis_paths(f"agent3_synthesis_{timestamp}.txt",
+                                                     [title for title, _ in main_papers])
+            reports = ProfessorAgent().generate_final_reports(
+                main_papers=main_papers,
+                fragmentation_analysis=fragmentation_analysis,
+                save_paths=save_paths,
+                index_path=index_path
+            )
+            ready = sum(1 for report in reports if not report.startswith("ERROR:"))
+            if not ready:
+                print(f"\n❌ Agent 3 failed: every main-paper synthesis failed (see {index_path})")
+                return
+            print(f"\n✅ Agent 3 completed! {ready} of {len(reports)} syntheses listed in: {index_path}")
+            return
+        
         main_paper_content = extract_text_from_pdf(main_paper_files[0])
         main_paper_title = os.path.basename(main_paper_files[0])
         print(f"📖 Loaded main paper: {main_paper_title}")
@@ -204,86 +221,23 @@ def run_full_pipeline():
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    # Step 1: Load reference papers
-    print("\n📚 STEP 1: Loading Reference Papers")
-    reference_files = get_pdf_files(REFERENCES_FOLDER)
-    if not reference_files:
-        print("❌ No reference papers found!")
-        return
-    
-    print(f"📋 Found {len(reference_files)} reference papers")
-    
-    # Extract texts
-    paper_texts = []
-    paper_titles = []
-    
-    for i, file_path in enumerate(reference_files, 1):
-        filename = os.path.basename(file_path)
-        print(f"  Processing {i}/{len(reference_files)}: {filename}")
-        
-        text = extract_text_from_pdf(file_path)
-        if text.strip():
-            paper_texts.append(text)
-            paper_titles.append(filename)
-    
-    if not paper_texts:
-        print("❌ No valid papers to process!")
-        return
-    
-    # Step 2: Run Agent 1 (PhD Student)
-    print("\n🎓 STEP 2: Agent 1 - PhD Student Summarization")
-    agent1 = PhDStudentAgent()
     agent1_output = f"agent1_summaries_{timestamp}.txt"
-    
-    summaries = agent1.summarize_paper_batch(
-        paper_texts=paper_texts,
-        paper_titles=paper_titles,
-        save_path=agent1_output
-    )
-    
-    print(f"✅ Agent 1 completed: {len(summaries)} summaries")
-    
-    # Step 3: Run Agent 2 (Postdoc)
-    print("\n🔬 STEP 3: Agent 2 - Postdoc Fragmentation Analysis")
-    agent2 = PostdocAgent()
     agent2_output = f"agent2_fragmentation_{timestamp}.txt"
-    
-    fragmentation_analysis = agent2.review_and_refine_batch(
-        summaries=summaries,
-        paper_titles=paper_titles,
-        save_path=agent2_output
-    )
-    
-    print("✅ Agent 2 completed: Fragmentation analysis ready")
-    
-    # Step 4: Load main paper
-    print("\n� STEP 4: Loading Main Paper")
-    main_paper_files = get_pdf_files(MAIN_PAPER_FOLDER)
-    if not main_paper_files:
-        print("❌ No main paper found!")
-        return
-    
-    main_paper_content = extract_text_from_pdf(main_paper_files[0])
-    main_paper_title = os.path.basename(main_paper_files[0])
-    print(f"📄 Main paper loaded: {main_paper_title}")
-    
-    # Step 5: Run Agent 3 (Professor)
-    print("\n🎓 STEP 5: Agent 3 - Professor Final Synthesis")
-    agent3 = ProfessorAgent()
     agent3_output = f"agent3_synthesis_{timestamp}.txt"
     
-    synthesis_report = agent3.generate_final_report(
-        main_paper_content=main_paper_content,
-        fragmentation_analysis=fragmentation_analysis,
-        save_details_path=agent3_output
-    )
+    all_main_papers = ask_all_main_papers()
     
-    print("✅ Agent 3 completed: Final synthesis ready")
+    # Main-paper extraction and Discussion parsing run while Agents 1 and 2 are in flight
+    artifacts = run_pipeline(agent1_output, agent2_output, agent3_output, all_main_papers=all_main_papers)
+    if artifacts is None:
+        return
+    if all_main_papers:
+        agent3_output = synthesis_paths(agent3_output, [])[1]
     
     # Final summary
     print(f"\n🎉 PIPELINE COMPLETED!")
     print("="*70)
-    print(f"📊 Reference Papers Processed: {len(paper_texts)}")
+    print(f"📊 Reference Papers Processed: {len(artifacts['agent1']['summaries'])}")
     print(f"� Agent 1 Output: {agent1_output}")
     print(f"📄 Agent 2 Output: {agent2_output}")
     print(f"📄 Agent 3 Output: {agent3_output}")
@@ -325,6 +279,9 @@ def main():
         except Exception as e:
             print(f"\n❌ Error: {str(e)}")
             print("Please check your configuration and try again.")
+    
+    # One run report covers everything done in this session
+    export_telemetry()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,240 @@
+import re
+import time
+
+import numpy as np
+
+from config import (
+    NEAR_DUPLICATE_MODE,
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_SIGNATURE_SIZE,
+    NEAR_DUPLICATE_SHINGLE_WORDS,
+)
+from telemetry import get_telemetry
+
+NEAR_DUPLICATE_MODES = ["off", "report", "skip", "merge"]
+_settings = {"mode": NEAR_DUPLICATE_MODE, "threshold": NEAR_DUPLICATE_THRESHOLD}
+
+_HASH_BASE = 0x100000001B3  # FNV 64-bit prime; odd, so it is invertible modulo 2**64
+_HASH_BASE_INVERSE = pow(_HASH_BASE, -1, 2 ** 64)
+_MIX_1 = np.uint64(0xFF51AFD7ED558CCD)  # MurmurHash3 fmix64 constants
+_MIX_2 = np.uint64(0xC4CEB9FE1A85EC53)
+_EMPTY_BIN = np.iinfo(np.uint64).max
+_NON_WORD = re.compile(r"\W+")
+
+def configure_near_duplicates(mode=None, threshold=None):
+    """Set the process-wide near-duplicate mode and Jaccard similarity threshold."""
+    if mode is not None:
+        if mode not in NEAR_DUPLICATE_MODES:
+            raise ValueError(f"Unknown near-duplicate mode: {mode}")
+        _settings["mode"] = mode
+    if threshold is not None:
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Near-duplicate threshold must be in (0, 1], got {threshold}")
+        _settings["threshold"] = threshold
+
+def near_duplicate_mode():
+    return _settings["mode"]
+
+def _band_layout(signature_size, threshold):
+    """
+    Split the signature into LSH bands: (bands, rows) with bands * rows == signature_size.
+    Picks the most selective layout whose S-curve midpoint (1/bands)^(1/rows) stays below the
+    threshold, so pairs at the threshold are very likely to share a band; candidates are verified anyway.
+    """
+    best = (signature_size, 1)
+    for rows in range(1, signature_size + 1):
+        if signature_size % rows == 0 and (1 / (signature_size // rows)) ** (1 / rows) < threshold:
+            best = (signature_size // rows, rows)
+    return best
+
+_power_tables = {}
+
+def _powers(base, count):
+    """base**i modulo 2**64 for i < count, from a table grown on demand and shared across calls."""
+    table = _power_tables.get(base)
+    if table is None or len(table) < count:
+        table = np.full(max(count, 1 << 16), base, dtype=np.uint64)
+        table[0] = 1
+        table = np.cumprod(table, dtype=np.uint64)
+        _power_tables[base] = table
+    return table[:count]
+
+def _mix(values, seed=0):
+    """MurmurHash3 finalizer, vectorized: spreads polynomial hashes evenly over all 64 bits."""
+    values = values ^ np.uint64(seed)
+    values ^= values >> np.uint64(33)
+    values *= _MIX_1
+    values ^= values >> np.uint64(33)
+    values *= _MIX_2
+    values ^= values >> np.uint64(33)
+    return values
+
+def shingle_hashes(text, size=NEAR_DUPLICATE_SHINGLE_WORDS, seed=0):
+    """
+    Distinct 64-bit hashes of the text's overlapping size-word shingles (case and punctuation folded).
+    Words are runs of Unicode letters and digits, so papers in any script are compared. Each
+    shingle is hashed as a polynomial over its UTF-8 bytes, computed for all shingles at once from
+    prefix sums, so there is no per-word Python work.
+    """
+    # data: the words' bytes joined by single spaces, which mark the word boundaries below
+    text = text.lower()
+    if text.isascii():
+        # Fast path for the common case, same words as the regex: [a-z0-9_] runs found with a byte mask
+        raw = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        is_word = (((raw >= ord("a")) & (raw <= ord("z"))) | ((raw >= ord("0")) & (raw <= ord("9")))
+                   | (raw == ord("_")))
+        keep = is_word.copy()
+        keep[1:] |= is_word[:-1]  # plus one space after each word
+        data = np.where(is_word, raw, ord(" "))[keep].astype(np.uint64)
+        if len(data) and data[-1] == ord(" "):
+            data = data[:-1]
+    else:
+        data = np.frombuffer(_NON_WORD.sub(" ", text).strip().encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    if not len(data):
+        return np.zeros(0, dtype=np.uint64)
+    # prefix[i] = sum(data[j] * base^-j for j <= i), so a substring [s, e) hashes to
+    # (prefix[e-1] - prefix[s-1]) * base^(e-1) = sum(data[j] * base^(e-1-j)) wherever it occurs
+    powers = _powers(_HASH_BASE, len(data))
+    prefix = np.cumsum(data * _powers(_HASH_BASE_INVERSE, len(data)), dtype=np.uint64)
+    spaces = np.flatnonzero(data == ord(" "))
+    starts = np.concatenate(([0], spaces + 1))
+    ends = np.concatenate((spaces, [len(data)]))
+    size = min(size, len(starts))
+    starts, ends = starts[:len(starts) - size + 1], ends[size - 1:]
+    before = np.where(starts > 0, prefix[np.maximum(starts - 1, 0)], np.uint64(0))
+    return np.unique(_mix((prefix[ends - 1] - before) * powers[ends - 1], seed))
+
+class NearDuplicateIndex:
+    """
+    Online MinHash/LSH index of document texts.
+
+    Each text gets a one-permutation MinHash signature over its word shingles: every shingle is
+    hashed once, the hash picks a bin, and each bin keeps its minimum. Signatures are banded into
+    LSH buckets; a new text is compared only with the kept texts it shares a bucket with, and joins
+    the first one whose estimated Jaccard similarity reaches the threshold. Duplicates are not
+    indexed themselves, so buckets stay small and the whole pass is near-linear in corpus size.
+    """
+
+    def __init__(self, threshold=None, signature_size=NEAR_DUPLICATE_SIGNATURE_SIZE,
+                 shingle_size=NEAR_DUPLICATE_SHINGLE_WORDS, seed=1):
+        self.threshold = threshold if threshold is not None else _settings["threshold"]
+        self.signature_size = signature_size
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = _band_layout(signature_size, self.threshold)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = {}  # kept key -> signature
+        self.clusters = {}  # kept key -> list of (duplicate key, similarity)
+        self.comparisons = 0
+
+    def signature(self, text):
+        """One-permutation MinHash signature of text: signature_size uint64 values, or None if it has no words."""
+        hashes = shingle_hashes(text, self.shingle_size, self.seed)
+        if not len(hashes):
+            return None
+        signature = np.full(self.signature_size, _EMPTY_BIN, dtype=np.uint64)
+        np.minimum.at(signature, (hashes % np.uint64(self.signature_size)).astype(np.intp), hashes)
+        empty = signature == _EMPTY_BIN
+        if empty.any():
+            # Rotation densification: an empty bin borrows the value of the next non-empty bin
+            filled = np.flatnonzero(~empty)
+            following = np.searchsorted(filled, np.arange(self.signature_size)) % len(filled)
+            signature = signature[filled[following]]
+        return signature
+
+    def add(self, key, text):
+        """
+        Index text under key. Returns (kept key, similarity) if it near-duplicates an indexed
+        text, otherwise None, in which case the text is kept and indexed for later lookups.
+        A text with no words has nothing to compare: it is kept and never matches anything.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        band_keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        candidates = []
+        for buckets, band_key in zip(self._buckets, band_keys):
+            for candidate in buckets.get(band_key, ()):
+                if candidate not in candidates:
+                    candidates.append(candidate)
+        for candidate in candidates:
+            self.comparisons += 1
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= self.threshold:
+                self.clusters[candidate].append((key, similarity))
+                return candidate, similarity
+        self._signatures[key] = signature
+        self.clusters[key] = []
+        for buckets, band_key in zip(self._buckets, band_keys):
+            buckets.setdefault(band_key, []).append(key)
+        return None
+
+    def duplicate_clusters(self):
+        """Clusters with at least one duplicate, as (kept key, [(duplicate key, similarity), ...])."""
+        return [(kept, duplicates) for kept, duplicates in self.clusters.items() if duplicates]
+
+def report_near_duplicates(clusters, titles, mode, elapsed_ms=None, documents=None):
+    """Print the duplicate clusters and attach them to the run's telemetry report."""
+    duplicates = sum(len(members) for _, members in clusters)
+    timing = f" in {elapsed_ms:.0f} ms" if elapsed_ms is not None else ""
+    scanned = f"{documents} papers -> " if documents is not None else ""
+    print(f"🧬 Near-duplicate pass: {scanned}{len(clusters)} cluster(s), {duplicates} duplicate(s){timing}")
+    action = {"report": "still summarized", "skip": "skipped", "merge": "merged into the kept paper"}[mode]
+    for kept, members in clusters:
+        print(f"   • kept {titles[kept]}")
+        for member, similarity in members:
+            print(f"     ~ {titles[member]} (similarity {similarity:.2f}, {action})")
+    get_telemetry().annotate(
+        near_duplicate_mode=mode,
+        near_duplicate_clusters=[
+            {"kept": titles[kept], "duplicates": [{"title": titles[member], "similarity": round(similarity, 3)}
+                                                  for member, similarity in members]}
+            for kept, members in clusters
+        ],
+    )
+
+def merged_title(title, duplicate_titles):
+    """Title of a kept paper that stands for its near-duplicates too."""
+    return f"{title} (also: {', '.join(duplicate_titles)})" if duplicate_titles else title
+
+def dedupe_papers(papers, mode=None, threshold=None):
+    """
+    Find near-duplicate reference papers before Agent 1 and drop or merge them.
+
+    Args:
+        papers (dict): Parallel lists "texts", "titles" and "hashes" (as from load_reference_papers)
+        mode (str): off, report (find only), skip (drop duplicates) or merge (drop duplicates
+            and list their titles on the kept paper); default from configure_near_duplicates
+        threshold (float): Estimated Jaccard similarity of word shingles that counts as a duplicate
+    Returns:
+        tuple: (papers, duplicate_of) where papers keeps the first paper of each cluster (all papers
+        for off and report) and duplicate_of maps each duplicate's index to its kept paper's index
+    """
+    mode = mode or _settings["mode"]
+    if mode == "off" or len(papers["texts"]) < 2:
+        return papers, {}
+    started = time.perf_counter()
+    index = NearDuplicateIndex(threshold)
+    duplicate_of = {}
+    for i, text in enumerate(papers["texts"]):
+        match = index.add(i, text)
+        if match:
+            duplicate_of[i] = match[0]
+    clusters = index.duplicate_clusters()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if not clusters:
+        print(f"🧬 Near-duplicate pass: no duplicates among {len(papers['texts'])} papers ({elapsed_ms:.0f} ms)")
+        return papers, {}
+    report_near_duplicates(clusters, papers["titles"], mode, elapsed_ms, len(papers["texts"]))
+    if mode == "report":
+        return papers, duplicate_of
+
+    kept = [i for i in range(len(papers["texts"])) if i not in duplicate_of]
+    result = {key: [values[i] for i in kept] for key, values in papers.items()}
+    if mode == "merge":
+        members = dict(clusters)
+        result["titles"] = [
+            merged_title(papers["titles"][i], [papers["titles"][member] for member, _ in members.get(i, [])])
+            for i in kept
+        ]
+    return result, duplicate_of
@@ -1,5 +1,54 @@
-from utils import call_groq_api, chunk_text
-from config import PHD_STUDENT_PROMPT
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+
+from utils import call_groq_api, chunk_text, dispatch_mode, estimate_tokens, file_content_hash, iter_extracted_texts, kept_references
+from config import (
+    PHD_STUDENT_PROMPT,
+    PHD_COMBINE_PROMPT,
+    MODEL_CONTEXT_TOKENS,
+    GROQ_MODEL,
+    GROQ_MAX_TOKENS,
+    GROQ_CONCURRENCY,
+    STREAM_QUEUE_SIZE,
+)
+from artifacts import (
+    AGENT1_TEXT_HEADER,
+    jsonl_path_for,
+    render_agent1_section,
+    render_agent1_text,
+    text_path_for,
+    write_jsonl,
+)
+from summary_manifest import get_summary_manifest
+from near_duplicates import NearDuplicateIndex, near_duplicate_mode, report_near_duplicates
+from telemetry import span, traced
+
+def _call_each(prompts, dispatch=None):
+    """call_groq_api for a list whose failed prompts stay "ERROR: ..." entries, even a lone prompt."""
+    try:
+        return call_groq_api(prompts, dispatch=dispatch)
+    except Exception as e:
+        return [f"ERROR: {e}"] * len(prompts)
+
+def _report_failures(titles, summaries):
+    """Print the papers whose summary failed; they are left out of the saved summaries."""
+    failed = [(title, summary) for title, summary in zip(titles, summaries) if summary.startswith("ERROR:")]
+    if failed:
+        print(f"❌ {len(failed)} paper(s) could not be summarized and are left out of the summaries:")
+        for title, summary in failed:
+            print(f"   • {title}: {summary[len('ERROR:'):].strip()}")
+    return len(failed)
+
+def _with_references(record):
+    """Add the reference list kept at extraction (--keep-references) to a paper record."""
+    references = kept_references(record["file_hash"]) if record["file_hash"] else ""
+    if references:
+        record["references"] = references
+    return record
 
 class PhDStudentAgent:
     """Agent that simulates a PhD student summarizing academic papers."""
@@ -7,42 +56,313 @@ class PhDStudentAgent:
     def __init__(self):
         self.name = "PhD Student Agent"
 
-    def summarize_paper_batch(self, paper_texts, paper_titles=None, save_path=None):
+    def _input_budget(self, template):
+        """Tokens available for text inserted into template, leaving room for the completion."""
+        overhead = estimate_tokens(template.format(text="", summaries=""))
+        return MODEL_CONTEXT_TOKENS - GROQ_MAX_TOKENS - overhead
+
+    @traced("agent1")
+    def summarize_paper_batch(self, paper_texts, paper_titles=None, save_path=None, file_hashes=None, incremental=True):
         """
-        Summarize a batch of academic papers efficiently using batch API.
+        Summarize a batch of academic papers in one call_groq_api dispatch (batch, async or sync).
+        Papers that exceed the model's context budget are summarized map-reduce style:
+        their chunks are summarized in the same batch, then combined. A paper fails as a whole
+        if any of its chunk or combine calls fails; failed papers are reported, kept out of the
+        manifest and left out of the saved files.
+        When file_hashes are given, papers already recorded in the summary manifest under the
+        current model and prompt version are reused instead of being sent to the API.
         Args:
             paper_texts (list of str): List of full texts of papers
             paper_titles (list of str): Optional list of paper titles for context
             save_path (str): Optional path to save all summaries
+            file_hashes (list of str): Optional content hash of each paper's source file
+            incremental (bool): Reuse and update the summary manifest (requires file_hashes)
         Returns:
-            list of str: Structured summaries for each paper
+            list of str: Structured summaries for each paper; failed ones are "ERROR: ..." strings
         """
         print(f"📚 {self.name}: Processing {len(paper_texts)} papers in batch...")
         
-        prompts = []
-        for i, text in enumerate(paper_texts):
-            title = paper_titles[i] if paper_titles and i < len(paper_titles) else f"Paper {i+1}"
-            prompt = PHD_STUDENT_PROMPT.format(text=text)
-            prompts.append(prompt)
+        titles = [
+            paper_titles[i] if paper_titles and i < len(paper_titles) else f"Paper {i+1}"
+            for i in range(len(paper_texts))
+        ]
+        summaries = [None] * len(paper_texts)
+        usage = [None] * len(paper_texts)
+        manifest = get_summary_manifest() if incremental and file_hashes else None
+        
+        if manifest:
+            avoided_calls = 0
+            avoided_tokens = 0
+            for i, file_hash in enumerate(file_hashes):
+                entry = manifest.get(file_hash)
+                if entry:
+                    summaries[i] = entry["summary"]
+                    usage[i] = {key: entry.get(key, 0) for key in ("calls", "prompt_tokens", "completion_tokens")}
+                    avoided_calls += entry.get("calls", 1)
+                    avoided_tokens += entry.get("prompt_tokens", 0) + entry.get("completion_tokens", 0)
+            reused = sum(1 for summary in summaries if summary is not None)
+            print(f"♻️  Reusing {reused} stored summaries; {len(paper_texts) - reused} new or changed paper(s) to summarize")
+            if reused:
+                print(f"💰 Avoided ~{avoided_calls} API call(s) and ~{avoided_tokens:,} tokens")
         
-        # Use batch API for all summaries
-        summaries = call_groq_api(prompts, batch_mode=True)
+        pending = [i for i, summary in enumerate(summaries) if summary is None]
+        if pending:
+            fresh, fresh_usage = self._summarize_texts([paper_texts[i] for i in pending], [titles[i] for i in pending])
+            for i, summary, paper_usage in zip(pending, fresh, fresh_usage):
+                summaries[i] = summary
+                usage[i] = paper_usage
+                if manifest and not summary.startswith("ERROR:"):
+                    manifest.put(file_hashes[i], titles[i], summary, **paper_usage)
+            if manifest:
+                manifest.save()
+            _report_failures([titles[i] for i in pending], [summaries[i] for i in pending])
         
-        # Save all summaries to file if requested
+        # Save all summaries to file if requested: JSONL artifact first, txt rendered from it
         if save_path:
+            jsonl_path, save_path = jsonl_path_for(save_path), text_path_for(save_path)
+            records = [
+                _with_references({
+                    "type": "paper",
+                    "title": titles[i],
+                    "file_hash": file_hashes[i] if file_hashes else None,
+                    "model": GROQ_MODEL,
+                    "usage": usage[i],
+                    "summary": summaries[i],
+                })
+                for i in range(len(summaries))
+                if not summaries[i].startswith("ERROR:")
+            ]
             try:
+                write_jsonl(jsonl_path, records)
                 with open(save_path, 'w', encoding='utf-8') as f:
-                    f.write("# PhD STUDENT AGENT SUMMARIES\n")
-                    f.write("Generated by AutoScholar System - Agent 1\n\n")
-                    for i, summary in enumerate(summaries):
-                        title = paper_titles[i] if paper_titles and i < len(paper_titles) else f"Paper {i+1}"
-                        f.write(f"## {title}\n\n{summary}\n\n{'='*80}\n\n")
-                print(f"📄 All PhD summaries saved to {save_path}")
+                    f.write(render_agent1_text(records))
+                print(f"📄 All PhD summaries saved to {save_path} (+ {jsonl_path})")
             except Exception as e:
                 print(f"❌ Error saving PhD summaries: {e}")
         
         return summaries
     
+    @traced("agent1")
+    def summarize_paper_stream(self, file_paths, save_path=None, workers=None, incremental=True,
+                               queue_size=STREAM_QUEUE_SIZE, summary_workers=GROQ_CONCURRENCY):
+        """
+        Extract and summarize papers as a producer-consumer pipeline.
+        Extraction feeds a bounded queue; summarization workers take each paper as soon as
+        its text is ready, and every summary is appended to the output files when it completes.
+        Only the queued and in-flight papers are held in memory, whatever the corpus size.
+        Near-duplicates of papers already extracted are found with an online MinHash/LSH index
+        and, in skip or merge mode, never queued. Each paper is sent with async calls whatever
+        the dispatch mode: a Batch API job per paper would defeat streaming.
+        Args:
+            file_paths (list of str): Reference paper files
+            save_path (str): Optional path of the summaries file, written incrementally
+            workers (int): Extraction processes (default: one per CPU)
+            incremental (bool): Reuse and update the summary manifest
+            queue_size (int): Extracted papers buffered ahead of the summarization workers
+            summary_workers (int): Papers summarized concurrently
+        Returns:
+            list of dict: Paper records (title, file_hash, model, usage, summary and, with
+            --keep-references, references) in completion order;
+            papers whose summary failed are reported and left out
+        """
+        print(f"📚 {self.name}: Streaming {len(file_paths)} papers "
+              f"(queue {queue_size}, {summary_workers} summarization workers)...")
+        summary_workers = max(1, summary_workers or 1)
+        manifest = get_summary_manifest() if incremental else None
+        papers = queue.Queue(maxsize=max(1, queue_size))
+        records = []
+        failures = []
+        write_lock = threading.Lock()
+        started = time.perf_counter()
+        duplicate_mode = near_duplicate_mode()
+        duplicate_index = NearDuplicateIndex() if duplicate_mode != "off" else None
+        extracted_titles = []
+        if dispatch_mode() == "batch":
+            print("⚠️  Streaming sends each paper as soon as it is extracted; using async calls instead of the Batch API")
+        
+        if save_path:
+            jsonl_path, save_path = jsonl_path_for(save_path), text_path_for(save_path)
+            with open(save_path, 'w', encoding='utf-8') as f:
+                f.write(AGENT1_TEXT_HEADER)
+            open(jsonl_path, 'w', encoding='utf-8').close()
+        
+        def produce():
+            try:
+                with span("extraction", files=len(file_paths)):
+                    for _, file_path, text in iter_extracted_texts(file_paths, workers=workers, reference_papers=True):
+                        if text.strip():
+                            title = os.path.basename(file_path)
+                            if duplicate_index:
+                                extracted_titles.append(title)
+                                if duplicate_index.add(len(extracted_titles) - 1, text) and duplicate_mode != "report":
+                                    continue
+                            papers.put((title, file_content_hash(file_path), text))
+                        else:
+                            print(f"⚠️  Warning: No text extracted from {os.path.basename(file_path)}")
+            except Exception as e:
+                print(f"❌ Extraction stopped: {e}")
+            finally:
+                for _ in range(summary_workers):
+                    papers.put(None)
+        
+        def consume():
+            while True:
+                item = papers.get()
+                if item is None:
+                    return
+                title, file_hash, text = item
+                entry = manifest.get(file_hash) if manifest else None
+                if entry:
+                    summary = entry["summary"]
+                    usage = {key: entry.get(key, 0) for key in ("calls", "prompt_tokens", "completion_tokens")}
+                else:
+                    try:
+                        fresh, fresh_usage = self._summarize_texts([text], [title], dispatch="async")
+                        summary, usage = fresh[0], fresh_usage[0]
+                    except Exception as e:
+                        summary, usage = f"ERROR: {e}", None
+                    if manifest and not summary.startswith("ERROR:"):
+                        manifest.put(file_hash, title, summary, **usage)
+                del text, item
+                if summary.startswith("ERROR:"):
+                    with write_lock:
+                        failures.append((title, summary))
+                    print(f"  ❌ Could not summarize {title}: {summary[len('ERROR:'):].strip()}")
+                    continue
+                record = _with_references({
+                    "type": "paper",
+                    "title": title,
+                    "file_hash": file_hash,
+                    "model": GROQ_MODEL,
+                    "usage": usage,
+                    "summary": summary,
+                })
+                with write_lock:
+                    records.append(record)
+                    if len(records) == 1:
+                        print(f"⚡ First summary ready after {time.perf_counter() - started:.1f}s")
+                    if save_path:
+                        try:
+                            with open(jsonl_path, 'a', encoding='utf-8') as f:
+                                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                            with open(save_path, 'a', encoding='utf-8') as f:
+                                f.write(render_agent1_section(record))
+                        except Exception as e:
+                            print(f"❌ Error saving PhD summary for {title}: {e}")
+                    print(f"  📝 Summarized {len(records)}/{len(file_paths)}: {title}")
+        
+        # Each thread runs in a copy of this context so its API calls are attributed to the agent1 span
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True)]
+        threads += [
+            threading.Thread(target=contextvars.copy_context().run, args=(consume,), daemon=True)
+            for _ in range(summary_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if manifest:
+            manifest.save()
+        if failures:
+            _report_failures([title for title, _ in failures], [summary for _, summary in failures])
+        if duplicate_index and duplicate_index.duplicate_clusters():
+            # The kept paper may already be written when its duplicate arrives, so merge acts as skip here
+            report_near_duplicates(duplicate_index.duplicate_clusters(), extracted_titles,
+                                   "skip" if duplicate_mode == "merge" else duplicate_mode, documents=len(extracted_titles))
+        print(f"✅ Streamed {len(records)} summaries in {time.perf_counter() - started:.1f}s")
+        if save_path:
+            print(f"📄 All PhD summaries saved to {save_path} (+ {jsonl_path})")
+        return records
+    
+    def _summarize_texts(self, paper_texts, titles, dispatch=None):
+        """
+        Summarize texts, map-reducing the ones over the context budget.
+        dispatch overrides the configured call_groq_api dispatch mode for every call.
+        Returns (summaries, usage) where usage holds estimated calls and tokens per paper.
+        """
+        budget = self._input_budget(PHD_STUDENT_PROMPT)
+        prompts = []
+        prompt_indices = []  # per paper: indices into prompts
+        for title, text in zip(titles, paper_texts):
+            if estimate_tokens(text) <= budget:
+                prompt_indices.append([len(prompts)])
+                prompts.append(PHD_STUDENT_PROMPT.format(text=text))
+            else:
+                chunks = chunk_text(text)
+                print(f"  ✂️  {title} exceeds the context budget; summarizing {len(chunks)} chunks map-reduce")
+                prompt_indices.append(list(range(len(prompts), len(prompts) + len(chunks))))
+                prompts.extend(PHD_STUDENT_PROMPT.format(text=chunk) for chunk in chunks)
+        
+        # Summarize all papers and chunks together (map step)
+        results = _call_each(prompts, dispatch)
+        partials = [[results[j] for j in indices] for indices in prompt_indices]
+        usage = [
+            {
+                "calls": len(indices),
+                "prompt_tokens": sum(estimate_tokens(prompts[j]) for j in indices),
+                "completion_tokens": sum(estimate_tokens(results[j]) for j in indices),
+            }
+            for indices in prompt_indices
+        ]
+        
+        # Combine chunk summaries of long papers (reduce step)
+        summaries = self._combine_partial_summaries(partials, usage, dispatch)
+        return summaries, usage
+    
+    def _combine_partial_summaries(self, partials, usage=None, dispatch=None):
+        """
+        Reduce each paper's list of chunk summaries to a single summary.
+        Every round sends the combine prompts of all unfinished papers in one dispatch;
+        summaries that do not fit one prompt are combined in groups over several rounds.
+        A paper with a failed chunk or combine result fails as a whole: its summary becomes that
+        "ERROR: ..." string and the error text is never sent on in a combine prompt.
+        If usage is given, combine calls and tokens are added to each paper's entry.
+        """
+        budget = self._input_budget(PHD_COMBINE_PROMPT)
+        partials = [list(p) for p in partials]
+        
+        while True:
+            prompts = []
+            owners = []  # paper index for each combine prompt
+            for i, parts in enumerate(partials):
+                failed = next((part for part in parts if part.startswith("ERROR:")), None)
+                if failed is not None:
+                    partials[i] = parts = [failed]
+                if len(parts) <= 1:
+                    continue
+                group = []
+                group_tokens = 0
+                groups = []
+                for part in parts:
+                    part_tokens = estimate_tokens(part)
+                    if len(group) >= 2 and group_tokens + part_tokens > budget:
+                        groups.append(group)
+                        group = []
+                        group_tokens = 0
+                    group.append(part)
+                    group_tokens += part_tokens
+                if len(group) == 1 and groups:
+                    groups[-1].append(group[0])
+                else:
+                    groups.append(group)
+                for group in groups:
+                    prompts.append(PHD_COMBINE_PROMPT.format(summaries="\n\n".join(group)))
+                    owners.append(i)
+            
+            if not prompts:
+                return [parts[0] if parts else "" for parts in partials]
+            
+            combined = _call_each(prompts, dispatch)
+            for i in set(owners):
+                partials[i] = []
+            for i, prompt, summary in zip(owners, prompts, combined):
+                partials[i].append(summary)
+                if usage is not None:
+                    usage[i]["calls"] += 1
+                    usage[i]["prompt_tokens"] += estimate_tokens(prompt)
+                    usage[i]["completion_tokens"] += estimate_tokens(summary)
+    
     def summarize_paper(self, paper_text, paper_title=""):
         """
         Summarize an academic paper.
@@ -64,21 +384,11 @@ class PhDStudentAgent:
             prompt = PHD_STUDENT_PROMPT.format(text=paper_text)
             return call_groq_api(prompt)
         else:
-            # Multiple chunks - summarize each in batch
+            # Multiple chunks - summarize each together
             prompts = [PHD_STUDENT_PROMPT.format(text=chunk) for chunk in chunks]
-            chunk_summaries = call_groq_api(prompts, batch_mode=True)
+            chunk_summaries = call_groq_api(prompts)
             # Combine chunk summaries into final summary
-            combined_text = "\n\n".join(chunk_summaries)
-            final_prompt = f"""
-            You are a PhD student who has summarized different sections of an academic paper.
-            Now combine these section summaries into one coherent overall summary:
-            
-            Section summaries:
-            {combined_text}
-            
-            Please provide a unified, comprehensive summary:
-            """
-            return call_groq_api(final_prompt)
+            return self._combine_partial_summaries([chunk_summaries])[0]
     
     def process_paper_file(self, paper_path):
         """
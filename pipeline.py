@@ -0,0 +1,313 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import extract_text_from_file, extract_texts_parallel, file_content_hash, get_document_files, extract_discussion_section
+from phd_student_agent import PhDStudentAgent
+from postdoc_agent import PostdocAgent
+from professor_agent import ProfessorAgent
+from artifacts import synthesis_paths
+from near_duplicates import dedupe_papers
+from config import MAIN_PAPER_FOLDER, REFERENCES_FOLDER
+from telemetry import span
+
+class Stage:
+    """
+    One pipeline step.
+
+    func receives a dict mapping each dependency name to the artifact that stage
+    returned, and its own return value becomes this stage's artifact.
+    """
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+class StageError(Exception):
+    """Raised by run_stages when a stage fails; carries the stage name and the timings so far."""
+
+    def __init__(self, stage, error, timings):
+        super().__init__(f"stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+        self.timings = timings
+
+def _check_graph(stages):
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Stage names must be unique")
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {', '.join(missing)}")
+
+def run_stages(stages, max_workers=None):
+    """
+    Run stages as soon as their dependencies have finished, independent ones concurrently.
+    Artifacts are handed from stage to stage in memory.
+
+    Returns:
+        tuple: (artifacts, timings) where timings maps each stage name to (start, end)
+        seconds relative to the start of the run.
+    Raises:
+        StageError: if a stage raised. Stages already running are allowed to finish,
+        but nothing new is started.
+    """
+    _check_graph(stages)
+    artifacts = {}
+    timings = {}
+    timings_lock = threading.Lock()
+    origin = time.perf_counter()
+
+    def timed(stage, inputs):
+        start = time.perf_counter() - origin
+        try:
+            with span(f"stage.{stage.name}", deps=",".join(stage.deps)):
+                return stage.func(inputs)
+        finally:
+            with timings_lock:
+                timings[stage.name] = (start, time.perf_counter() - origin)
+
+    pending = list(stages)
+    running = {}
+    failure = None
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as executor:
+        while True:
+            if failure is None:
+                for stage in [s for s in pending if all(dep in artifacts for dep in s.deps)]:
+                    pending.remove(stage)
+                    inputs = {dep: artifacts[dep] for dep in stage.deps}
+                    running[executor.submit(timed, stage, inputs)] = stage
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    artifacts[stage.name] = future.result()
+                except Exception as e:
+                    failure = failure or (stage.name, e)
+
+    if failure:
+        raise StageError(failure[0], failure[1], timings)
+    if pending:
+        raise ValueError(f"Dependency cycle between stages: {', '.join(s.name for s in pending)}")
+    return artifacts, timings
+
+def critical_path(stages, timings):
+    """
+    Return the chain of stages that determined the total run time, first to last.
+    Walks back from the stage that finished last through whichever dependency finished last.
+    """
+    deps = {stage.name: stage.deps for stage in stages}
+    timed = [name for name in deps if name in timings]
+    if not timed:
+        return []
+    path = [max(timed, key=lambda name: timings[name][1])]
+    while True:
+        previous = [dep for dep in deps[path[-1]] if dep in timings]
+        if not previous:
+            break
+        path.append(max(previous, key=lambda name: timings[name][1]))
+    return path[::-1]
+
+def print_timing_breakdown(stages, timings):
+    """Print per-stage timings, the critical path and how much time overlapping saved."""
+    if not timings:
+        return
+    path = critical_path(stages, timings)
+    wall = max(end for _, end in timings.values())
+    busy = sum(end - start for start, end in timings.values())
+
+    print("\n⏱️  Stage timings")
+    print("-" * 50)
+    for stage in sorted(stages, key=lambda s: timings.get(s.name, (float("inf"),))[0]):
+        if stage.name not in timings:
+            continue
+        start, end = timings[stage.name]
+        marker = "*" if stage.name in path else " "
+        print(f" {marker} {stage.name:<14} {end - start:8.2f}s  (t={start:.2f}s → {end:.2f}s)")
+    print(f"🧭 Critical path: {' → '.join(path)} ({wall:.2f}s)")
+    if busy > wall:
+        print(f"⚡ Overlap saved {busy - wall:.2f}s ({busy:.2f}s of stage work in {wall:.2f}s wall time)")
+
+def load_reference_papers(workers=None):
+    """
+    Extract every reference paper; returns a dict with texts, titles and content hashes.
+    Near-duplicate papers (e.g. a preprint and its published version) are skipped or merged
+    according to the near-duplicate mode.
+    """
+    reference_files = get_document_files(REFERENCES_FOLDER)
+    if not reference_files:
+        raise RuntimeError(f"No reference papers found in {REFERENCES_FOLDER}!")
+    print(f"📚 Found {len(reference_files)} reference papers")
+
+    papers = {"texts": [], "titles": [], "hashes": []}
+    texts = extract_texts_parallel(reference_files, workers=workers, reference_papers=True)
+    for file_path, text in zip(reference_files, texts):
+        if text.strip():
+            papers["texts"].append(text)
+            papers["titles"].append(os.path.basename(file_path))
+            papers["hashes"].append(file_content_hash(file_path))
+    if not papers["texts"]:
+        raise RuntimeError("No valid papers to process!")
+    return dedupe_papers(papers)[0]
+
+def load_main_paper(folder=MAIN_PAPER_FOLDER):
+    """Extract the main paper; returns a dict with its title and text."""
+    main_paper_files = get_document_files(folder)
+    if not main_paper_files:
+        raise RuntimeError(f"No main paper found in {folder} folder!")
+    content = extract_text_from_file(main_paper_files[0])
+    title = os.path.basename(main_paper_files[0])
+    if not content.strip():
+        raise RuntimeError(f"No main paper text could be extracted from {title}!")
+    print(f"📖 Loaded main paper: {title}")
+    return {"title": title, "content": content}
+
+def load_main_papers(workers=None, folder=MAIN_PAPER_FOLDER):
+    """Extract every paper in the main-paper folder; returns a dict with titles and texts."""
+    main_paper_files = get_document_files(folder)
+    if not main_paper_files:
+        raise RuntimeError(f"No main paper found in {folder} folder!")
+    papers = {"titles": [], "contents": []}
+    for file_path, text in zip(main_paper_files, extract_texts_parallel(main_paper_files, workers=workers)):
+        if text.strip():
+            papers["titles"].append(os.path.basename(file_path))
+            papers["contents"].append(text)
+        else:
+            print(f"⚠️  Warning: No text extracted from {os.path.basename(file_path)}")
+    if not papers["contents"]:
+        raise RuntimeError("No main paper text could be extracted!")
+    print(f"📖 Loaded {len(papers['contents'])} main papers")
+    return papers
+
+def build_full_pipeline(agent1_output, agent2_output, agent3_output, workers=None, incremental=True, stream=False,
+                        all_main_papers=False):
+    """
+    Describe the three-agent pipeline as a stage graph.
+
+    Main-paper extraction and Discussion parsing do not depend on the reference
+    papers, so they run while Agents 1 and 2 are waiting on the API. With stream=True,
+    Agent 1 extracts and summarizes reference papers as a producer-consumer pipeline
+    instead of waiting for the whole corpus to be extracted. With all_main_papers=True,
+    Agent 3 writes one synthesis per main paper (named after agent3_output) plus an index.
+    """
+    def agent1(inputs):
+        print("\n🎓 Agent 1 - PhD Student Paper Summarization")
+        if stream:
+            reference_files = get_document_files(REFERENCES_FOLDER)
+            if not reference_files:
+                raise RuntimeError(f"No reference papers found in {REFERENCES_FOLDER}!")
+            records = PhDStudentAgent().summarize_paper_stream(
+                reference_files,
+                save_path=agent1_output,
+                workers=workers,
+                incremental=incremental
+            )
+            if not records:
+                raise RuntimeError("No valid papers to process!")
+            result = {
+                "titles": [record["title"] for record in records],
+                "summaries": [record["summary"] for record in records],
+                "hashes": [record["file_hash"] for record in records],
+            }
+        else:
+            papers = inputs["references"]
+            summaries = PhDStudentAgent().summarize_paper_batch(
+                paper_texts=papers["texts"],
+                paper_titles=papers["titles"],
+                save_path=agent1_output,
+                file_hashes=papers["hashes"],
+                incremental=incremental
+            )
+            # Failed papers are left out so their error text never reaches Agent 2's prompt
+            ok = [i for i, summary in enumerate(summaries) if not summary.startswith("ERROR:")]
+            if not ok:
+                raise RuntimeError("Every paper summary failed")
+            result = {
+                "titles": [papers["titles"][i] for i in ok],
+                "summaries": [summaries[i] for i in ok],
+                "hashes": [papers["hashes"][i] for i in ok],
+            }
+        print(f"✅ Agent 1 completed: {len(result['summaries'])} summaries")
+        return result
+
+    def agent2(inputs):
+        papers = inputs["agent1"]
+        print("\n🔬 Agent 2 - Postdoc Fragmentation Analysis")
+        analysis = PostdocAgent().review_and_refine_batch(
+            summaries=papers["summaries"],
+            paper_titles=papers["titles"],
+            save_path=agent2_output,
+            file_hashes=papers["hashes"]
+        )
+        print("✅ Agent 2 completed: Fragmentation analysis ready")
+        return analysis
+
+    def agent3(inputs):
+        print("\n🎓 Agent 3 - Professor Final Synthesis")
+        if all_main_papers:
+            papers = inputs["main_paper"]
+            save_paths, index_path = synthesis_paths(agent3_output, papers["titles"])
+            reports = ProfessorAgent().generate_final_reports(
+                main_papers=list(zip(papers["titles"], papers["contents"])),
+                fragmentation_analysis=inputs["agent2"],
+                save_paths=save_paths,
+                discussions=inputs["discussion"],
+                index_path=index_path
+            )
+            failed = sum(1 for report in reports if report.startswith("ERROR:"))
+            if failed == len(reports):
+                raise RuntimeError("Every main-paper synthesis failed")
+            print(f"✅ Agent 3 completed: {len(reports) - failed} of {len(reports)} syntheses ready")
+            return reports
+        report = ProfessorAgent().generate_final_report(
+            main_paper_content=inputs["main_paper"]["content"],
+            fragmentation_analysis=inputs["agent2"],
+            save_details_path=agent3_output,
+            main_paper_discussion=inputs["discussion"]
+        )
+        print("✅ Agent 3 completed: Final synthesis ready")
+        return report
+
+    if all_main_papers:
+        main_paper = Stage("main_paper", lambda inputs: load_main_papers(workers))
+        discussion = Stage("discussion", lambda inputs: [
+            extract_discussion_section(content) for content in inputs["main_paper"]["contents"]
+        ], ["main_paper"])
+    else:
+        main_paper = Stage("main_paper", lambda inputs: load_main_paper())
+        discussion = Stage("discussion", lambda inputs: extract_discussion_section(inputs["main_paper"]["content"]),
+                           ["main_paper"])
+    stages = [
+        main_paper,
+        discussion,
+        Stage("agent1", agent1, [] if stream else ["references"]),
+        Stage("agent2", agent2, ["agent1"]),
+        Stage("agent3", agent3, ["main_paper", "discussion", "agent2"]),
+    ]
+    if not stream:
+        stages.insert(0, Stage("references", lambda inputs: load_reference_papers(workers)))
+    return stages
+
+def run_full_pipeline(agent1_output, agent2_output, agent3_output, workers=None, incremental=True, stream=False,
+                      all_main_papers=False):
+    """
+    Run the full pipeline through the stage executor and print the timing breakdown.
+
+    Returns:
+        dict: Stage artifacts, or None if a stage failed
+    """
+    stages = build_full_pipeline(agent1_output, agent2_output, agent3_output, workers, incremental, stream,
+                                 all_main_papers)
+    try:
+        artifacts, timings = run_stages(stages)
+    except StageError as e:
+        print(f"❌ Pipeline {e}")
+        print_timing_breakdown(stages, e.timings)
+        return None
+    print_timing_breakdown(stages, timings)
+    return artifacts
@@ -1,5 +1,24 @@
-from utils import call_groq_api
-from config import POSTDOC_PROMPT
+import json
+
+from utils import call_groq_api, estimate_tokens
+from theme_clusters import cluster_themes
+from config import (
+    POSTDOC_PROMPT,
+    POSTDOC_PARTIAL_PROMPT,
+    POSTDOC_MERGE_PROMPT,
+    POSTDOC_FINAL_PROMPT,
+    POSTDOC_TREE_MIN_PAPERS,
+    POSTDOC_GROUP_SIZE,
+    POSTDOC_MERGE_FANIN,
+    POSTDOC_MIN_THEME_PAPERS,
+    POSTDOC_THEME_PREPASS,
+    POSTDOC_THEME_TABLE_ROWS,
+    GROQ_MODEL,
+    GROQ_MAX_TOKENS,
+    MODEL_CONTEXT_TOKENS,
+)
+from artifacts import jsonl_path_for, render_agent2_text, text_path_for, write_jsonl
+from telemetry import traced
 
 class PostdocAgent:
     """Agent that simulates a Postdoc researcher reviewing and refining summaries."""
@@ -7,44 +26,266 @@ class PostdocAgent:
     def __init__(self):
         self.name = "Postdoc Agent"
 
-    def review_and_refine_batch(self, summaries, paper_titles=None, save_path=None):
+    @traced("agent2")
+    def review_and_refine_batch(self, summaries, paper_titles=None, save_path=None, file_hashes=None,
+                                hierarchical=None, theme_prepass=None):
         """
         Identify convergent/divergent themes and synthesize insights from a batch of summaries.
+        By default every summary is sent, and large corpora are analyzed hierarchically (see
+        _tree_reduce). With the opt-in theme pre-pass, a local clustering step counts the papers
+        behind each theme and only that compact theme table is sent to the model.
         Args:
             summaries (list of str): List of structured summaries from Agent 1
             paper_titles (list of str): Optional list of paper titles for context
             save_path (str): Optional path to save the fragmentation analysis
+            file_hashes (list of str): Optional content hashes of the papers, recorded in the JSONL artifact
+            hierarchical (bool): Force (True) or disable (False) the tree-reduce; by default it is used
+                above POSTDOC_TREE_MIN_PAPERS papers or when a single prompt would not fit the context
+            theme_prepass (bool): Use the local theme table (default: POSTDOC_THEME_PREPASS unless hierarchical)
         Returns:
             str: Fragmentation analysis (convergent themes, divergent fragments, integrative links)
         """
         print(f"🔬 {self.name}: Analyzing theoretical fragmentation across {len(summaries)} papers...")
         
-        # Build a single combined text of all summaries
-        summaries_text = "\n\n".join([
-            f"Paper {i+1}: {paper_titles[i] if paper_titles and i < len(paper_titles) else f'Paper {i+1}'}\n{summary}"
-            for i, summary in enumerate(summaries)
-        ])
+        titles = [
+            paper_titles[i] if paper_titles and i < len(paper_titles) else f"Paper {i+1}"
+            for i in range(len(summaries))
+        ]
+        entries = [f"Paper {i+1}: {title}\n{summary}" for i, (title, summary) in enumerate(zip(titles, summaries))]
         
-        # Use the updated POSTDOC_PROMPT from config
-        prompt = POSTDOC_PROMPT.format(summaries=summaries_text)
+        themes = None
+        if theme_prepass is None:
+            theme_prepass = POSTDOC_THEME_PREPASS and not hierarchical
+        if theme_prepass:
+            themes = cluster_themes(summaries)
         
-        # Get fragmentation analysis
-        analysis = call_groq_api(prompt)
+        # The single combined prompt is only built when it may be sent
+        if themes:
+            mode = "themes"
+            usage, run = self._metered_call()
+            analysis = self._report_from_themes(themes, len(summaries), run, POSTDOC_THEME_TABLE_ROWS)
+        elif hierarchical or (hierarchical is None and (
+                len(summaries) > POSTDOC_TREE_MIN_PAPERS
+                or sum(estimate_tokens(entry) for entry in entries) > self._input_budget(POSTDOC_PROMPT))):
+            mode = "tree"
+            analysis, usage, themes = self._tree_reduce(entries)
+        else:
+            mode = "flat"
+            prompt = POSTDOC_PROMPT.format(summaries="\n\n".join(entries))
+            analysis = call_groq_api(prompt)
+            usage = {
+                "calls": 1,
+                "prompt_tokens": estimate_tokens(prompt),
+                "completion_tokens": estimate_tokens(analysis),
+            }
         
-        # Save analysis to file if requested
+        # Save analysis to file if requested: JSONL artifact first, txt rendered from it
         if save_path:
+            jsonl_path, save_path = jsonl_path_for(save_path), text_path_for(save_path)
+            record = {
+                "type": "analysis",
+                "model": GROQ_MODEL,
+                "papers": len(summaries),
+                "mode": mode,
+                "usage": usage,
+                "analysis": analysis,
+            }
+            if themes:
+                record["themes"] = themes
+            paper_records = [
+                {
+                    "type": "paper",
+                    "title": titles[i],
+                    "file_hash": file_hashes[i] if file_hashes and i < len(file_hashes) else None,
+                }
+                for i in range(len(summaries))
+            ]
             try:
+                write_jsonl(jsonl_path, [record] + paper_records)
                 with open(save_path, 'w', encoding='utf-8') as f:
-                    f.write("# POSTDOC AGENT FRAGMENTATION ANALYSIS\n")
-                    f.write("Generated by AutoScholar System - Agent 2\n")
-                    f.write(f"Analyzed {len(summaries)} papers\n\n")
-                    f.write(analysis)
-                print(f"📄 Postdoc fragmentation analysis saved to {save_path}")
+                    f.write(render_agent2_text(record))
+                print(f"📄 Postdoc fragmentation analysis saved to {save_path} (+ {jsonl_path})")
             except Exception as e:
                 print(f"❌ Error saving Postdoc analysis: {e}")
         
         return analysis
     
+    def _input_budget(self, template):
+        """Tokens available for text inserted into template, leaving room for the completion."""
+        overhead = estimate_tokens(template.format(summaries="", partials="", papers="", themes="", minor_fragments=""))
+        return MODEL_CONTEXT_TOKENS - GROQ_MAX_TOKENS - overhead
+    
+    def _pack(self, items, budget, max_items, min_items=1):
+        """
+        Split items into consecutive groups of at most max_items that fit the token budget.
+        A group is only closed once it has min_items, so an oversized item never stands alone
+        when it has to be merged with something.
+        """
+        groups = []
+        group = []
+        group_tokens = 0
+        for item in items:
+            item_tokens = estimate_tokens(item)
+            if len(group) >= max(1, min_items) and (len(group) >= max_items or group_tokens + item_tokens > budget):
+                groups.append(group)
+                group = []
+                group_tokens = 0
+            group.append(item)
+            group_tokens += item_tokens
+        if group:
+            groups.append(group)
+        return groups
+    
+    def _parse_themes(self, text, paper_count):
+        """
+        Parse a JSON theme list from a partial or merged report.
+        Paper numbers are validated and de-duplicated so counts stay exact; returns [] if unparseable.
+        """
+        start, end = text.find("["), text.rfind("]")
+        try:
+            raw_themes = json.loads(text[start:end + 1]) if start != -1 and end > start else None
+        except ValueError:
+            raw_themes = None
+        if not isinstance(raw_themes, list):
+            print(f"⚠️  {self.name}: Could not parse a partial theme map; its themes are dropped")
+            return []
+        
+        themes = []
+        for theme in raw_themes:
+            if not isinstance(theme, dict) or not theme.get("theme"):
+                continue
+            papers = set()
+            for number in theme.get("papers") or []:
+                try:
+                    number = int(number)
+                except (TypeError, ValueError):
+                    continue
+                if 1 <= number <= paper_count:
+                    papers.add(number)
+            themes.append({
+                "theme": str(theme["theme"]),
+                "also_called": [str(name) for name in theme.get("also_called") or []],
+                "kind": "divergent" if theme.get("kind") == "divergent" else "convergent",
+                "papers": sorted(papers),
+                "note": str(theme.get("note") or ""),
+            })
+        return themes
+    
+    def _metered_call(self):
+        """
+        Return (usage, run) where run(prompts) calls the API and adds to the usage totals.
+        run raises if any prompt failed, so error text never becomes input to the next level.
+        """
+        usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        
+        def run(prompts):
+            results = call_groq_api(prompts)
+            failed = [result for result in results if result.startswith("ERROR:")]
+            if failed:
+                raise RuntimeError(f"{len(failed)} of {len(prompts)} fragmentation call(s) failed: "
+                                   f"{failed[0][len('ERROR:'):].strip()}")
+            usage["calls"] += len(prompts)
+            usage["prompt_tokens"] += sum(estimate_tokens(prompt) for prompt in prompts)
+            usage["completion_tokens"] += sum(estimate_tokens(result) for result in results)
+            return results
+        
+        return usage, run
+    
+    def _reconcile(self, inputs, merged):
+        """
+        Make sure a merge never loses paper counts.
+        Every input theme is matched to the merged theme with the same name or alias and its
+        papers are unioned in; input themes the merge dropped are carried over unchanged.
+        """
+        def key(name):
+            return " ".join(name.lower().split())
+        
+        by_name = {}
+        for theme in merged:
+            for name in [theme["theme"]] + theme["also_called"]:
+                by_name.setdefault(key(name), theme)
+        for partial in inputs:
+            for theme in partial:
+                target = next(
+                    (by_name[key(name)] for name in [theme["theme"]] + theme["also_called"] if key(name) in by_name),
+                    None
+                )
+                if target is None:
+                    target = dict(theme, papers=list(theme["papers"]))
+                    merged.append(target)
+                    by_name[key(theme["theme"])] = target
+                target["papers"] = sorted(set(target["papers"]) | set(theme["papers"]))
+        return merged
+    
+    def _report_from_themes(self, themes, paper_count, run, max_rows=None):
+        """
+        Apply the 3-paper rule to exact theme counts and have the model write the final report.
+        With max_rows, only the most widespread themes are listed.
+        """
+        def describe(theme):
+            kind = f"[{theme['kind']}] " if theme.get("kind") else ""
+            aliases = f" (also: {', '.join(theme['also_called'])})" if theme["also_called"] else ""
+            papers = ", ".join(str(number) for number in theme["papers"])
+            note = f": {theme['note']}" if theme["note"] else ""
+            return f"- {kind}{theme['theme']}{aliases} - {len(theme['papers'])} paper(s) ({papers}){note}"
+        
+        ranked = sorted(themes, key=lambda theme: -len(theme["papers"]))[:max_rows]
+        major = [theme for theme in ranked if len(theme["papers"]) >= POSTDOC_MIN_THEME_PAPERS]
+        minor = [theme for theme in ranked if len(theme["papers"]) < POSTDOC_MIN_THEME_PAPERS]
+        final_prompt = POSTDOC_FINAL_PROMPT.format(
+            papers=paper_count,
+            themes="\n".join(describe(theme) for theme in major) or "(none)",
+            minor_fragments="\n".join(describe(theme) for theme in minor) or "(none)",
+        )
+        return run([final_prompt])[0]
+    
+    def _tree_reduce(self, entries):
+        """
+        Hierarchical fragmentation analysis.
+        Map: groups of summaries are analyzed in parallel into partial theme maps, each theme
+        carrying the paper numbers that discuss it. Reduce: partial maps are merged k at a time
+        (paper lists unioned) until one remains. The 3-paper rule is applied to the merged counts
+        before the final report is written.
+        Returns (analysis, usage, themes).
+        """
+        paper_count = len(entries)
+        usage, run = self._metered_call()
+        
+        # Map step: one partial theme map per group of summaries
+        groups = self._pack(entries, self._input_budget(POSTDOC_PARTIAL_PROMPT), max(1, POSTDOC_GROUP_SIZE))
+        print(f"  🌳 Tree-reduce: {len(groups)} groups of up to {POSTDOC_GROUP_SIZE} summaries")
+        results = run([POSTDOC_PARTIAL_PROMPT.format(summaries="\n\n".join(group)) for group in groups])
+        partials = [self._parse_themes(result, paper_count) for result in results]
+        
+        # Reduce step: merge k partial maps per call until one remains
+        level = 0
+        merge_budget = self._input_budget(POSTDOC_MERGE_PROMPT)
+        while len(partials) > 1:
+            level += 1
+            serialized = [json.dumps(partial, ensure_ascii=False) for partial in partials]
+            groups = self._pack(serialized, merge_budget, max(2, POSTDOC_MERGE_FANIN), min_items=2)
+            print(f"  🌳 Merge level {level}: {len(partials)} partial maps -> {len(groups)}")
+            merged = iter(run([
+                POSTDOC_MERGE_PROMPT.format(partials="\n\n".join(group))
+                for group in groups if len(group) > 1
+            ]))
+            # Single leftover maps pass through to the next level unchanged
+            position = 0
+            next_partials = []
+            for group in groups:
+                inputs = partials[position:position + len(group)]
+                if len(group) > 1:
+                    next_partials.append(self._reconcile(inputs, self._parse_themes(next(merged), paper_count)))
+                else:
+                    next_partials.append(inputs[0])
+                position += len(group)
+            partials = next_partials
+        
+        themes = partials[0] if partials else []
+        
+        analysis = self._report_from_themes(themes, paper_count, run)
+        return analysis, usage, themes
+    
     def review_and_refine(self, summary, paper_title=""):
         """
         Review and refine a PhD student's summary.
@@ -62,7 +303,7 @@ class PostdocAgent:
         # Use batch if summary is a list
         if isinstance(summary, list) and len(summary) > 1:
             prompts = [POSTDOC_PROMPT.format(summary=s) for s in summary]
-            refined_list = call_groq_api(prompts, batch_mode=True)
+            refined_list = call_groq_api(prompts)
             return refined_list
         else:
             refined_summary = call_groq_api(prompt)
@@ -1,5 +1,8 @@
-from utils import call_groq_api
-from config import PROFESSOR_PROMPT, COMPARISON_PROMPT
+from utils import call_groq_api, call_groq_api_stream, call_groq_api_stream_many
+from sections import get_section_index
+from artifacts import jsonl_path_for, render_agent3_index, write_jsonl
+from config import PROFESSOR_PROMPT, COMPARISON_PROMPT, GROQ_STREAM
+from telemetry import traced
 
 class ProfessorAgent:
     """Agent that simulates a Professor analyzing research insights and making comparisons."""
@@ -48,7 +51,7 @@ class ProfessorAgent:
                 f"{PROFESSOR_PROMPT.format(summaries=self._format_summaries_dict({k: v}))}\n\nCRITICAL INSTRUCTION: Focus on identifying where papers make conflicting claims..."
                 for k, v in refined_summaries.items()
             ]
-            analysis_list = call_groq_api(prompts, batch_mode=True)
+            analysis_list = call_groq_api(prompts)
             return "\n\n".join(analysis_list)
         else:
             analysis = call_groq_api(enhanced_prompt)
@@ -67,16 +70,16 @@ class ProfessorAgent:
         """
         print(f"🎓 {self.name}: Analyzing theoretical synthesis in Review Paper...")
         
-        # Extract Discussion/Conclusion section from main paper
-        from utils import extract_discussion_section
-        discussion_section = extract_discussion_section(main_paper_content)
+        # Discussion/Conclusion section from the main paper's cached section index
+        discussion_section = get_section_index(main_paper_content).discussion()
         
         # Enhanced comparison focusing on Review Paper's theoretical synthesis
-        enhanced_prompt = f"""
-        {COMPARISON_PROMPT.format(
+        comparison = COMPARISON_PROMPT.format(
             main_paper=discussion_section[:6000],  # Focus on Discussion section
             reference_insights=reference_insights
-        )}
+        )
+        enhanced_prompt = f"""
+        {comparison}
         
         REVIEW PAPER ANALYSIS FOCUS:
         Since this is a REVIEW PAPER (not an empirical study), evaluate how the Discussion/Conclusion section:
@@ -98,19 +101,23 @@ class ProfessorAgent:
                 f"{COMPARISON_PROMPT.format(main_paper=discussion_section[:6000], reference_insights=ri)}\n\nREVIEW PAPER ANALYSIS FOCUS: ..."
                 for ri in reference_insights
             ]
-            comparison_list = call_groq_api(prompts, batch_mode=True)
+            comparison_list = call_groq_api(prompts)
             return "\n\n".join(comparison_list)
         else:
             comparison_report = call_groq_api(enhanced_prompt)
             return comparison_report
     
-    def generate_final_report(self, main_paper_content, fragmentation_analysis, save_details_path=None):
+    @traced("agent3")
+    def generate_final_report(self, main_paper_content, fragmentation_analysis, save_details_path=None,
+                              main_paper_discussion=None, stream=GROQ_STREAM):
         """
         Generate the complete analysis report.
         
         Args:
             main_paper_content (str): Content of the main paper
             refined_summaries (dict): Refined summaries from all reference papers
+            main_paper_discussion (str): Optional pre-extracted Discussion/Conclusion section
+            stream (bool): Write the synthesis to save_details_path token by token as it is generated
             
         Returns:
             str: Complete final report
@@ -118,11 +125,102 @@ class ProfessorAgent:
         print(f"🎓 {self.name}: Synthesizing and comparing with main paper...")
         
         # Extract Discussion/Conclusion section for better comparison
-        from utils import extract_discussion_section
-        main_paper_discussion = extract_discussion_section(main_paper_content)
+        if main_paper_discussion is None:
+            main_paper_discussion = get_section_index(main_paper_content).discussion()
+        
+        prof_prompt = self._synthesis_prompt(fragmentation_analysis, main_paper_discussion)
+        if stream and save_details_path:
+            # Tokens are appended to a temporary file next to save_details_path as they arrive, so progress
+            # is visible during generation; it replaces save_details_path once the synthesis has finished
+            try:
+                synthesis_report = call_groq_api_stream(prof_prompt, output_path=save_details_path)
+                print(f"📄 Professor synthesis report streamed to {save_details_path}")
+            except Exception as e:
+                print(f"❌ Error streaming Professor synthesis: {e}")
+                raise
+        else:
+            synthesis_report = call_groq_api(prof_prompt)
+
+        # Save full synthesis if requested
+        if save_details_path and not stream:
+            try:
+                with open(save_details_path, 'w', encoding='utf-8') as f:
+                    f.write(synthesis_report)
+                print(f"📄 Professor synthesis report saved to {save_details_path}")
+            except Exception as e:
+                print(f"❌ Error saving Professor synthesis: {e}")
+
+        return self._condensed_report(synthesis_report)
+    
+    @traced("agent3")
+    def generate_final_reports(self, main_papers, fragmentation_analysis, save_paths=None, discussions=None,
+                               index_path=None, stream=GROQ_STREAM):
+        """
+        Generate one synthesis per main paper against the same fragmentation analysis.
+        All syntheses are requested together: streamed concurrently when stream is set,
+        otherwise sent through call_groq_api, which picks async calls or the Batch API.
         
-        # Enhanced prompt with explicit comparison requirements
-        prof_prompt = f"""
+        Args:
+            main_papers (list of tuple): (title, content) for each main paper
+            fragmentation_analysis (str): Agent 2 analysis, shared by every synthesis
+            save_paths (list of str): Optional output file per main paper
+            discussions (list of str): Optional pre-extracted Discussion/Conclusion sections
+            index_path (str): Optional index file listing every main paper and its synthesis
+            stream (bool): Stream each synthesis token by token into a temporary file that replaces
+                its save path once it has finished; a failed synthesis leaves its save path untouched
+            
+        Returns:
+            list of str: Final reports in main_papers order; failed ones are "ERROR: ..." strings
+        """
+        print(f"🎓 {self.name}: Synthesizing {len(main_papers)} main papers in parallel...")
+        if discussions is None:
+            discussions = [get_section_index(content).discussion() for _, content in main_papers]
+        prompts = [self._synthesis_prompt(fragmentation_analysis, discussion) for discussion in discussions]
+        
+        if stream and save_paths:
+            synthesis_reports = call_groq_api_stream_many(prompts, output_paths=save_paths)
+        else:
+            try:
+                synthesis_reports = call_groq_api(prompts)
+            except Exception as e:  # a lone prompt raises instead of returning its error string
+                synthesis_reports = [f"ERROR: {e}"]
+            for path, report in zip(save_paths or [], synthesis_reports):
+                if report.startswith("ERROR:"):
+                    continue
+                try:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(report)
+                except Exception as e:
+                    print(f"❌ Error saving Professor synthesis to {path}: {e}")
+        
+        records = []
+        for i, ((title, _), report) in enumerate(zip(main_papers, synthesis_reports)):
+            failed = report.startswith("ERROR:")
+            records.append({
+                "type": "synthesis",
+                "main_paper": title,
+                "output": save_paths[i] if save_paths else None,
+                "status": "error" if failed else "ok",
+                "error": report[len("ERROR:"):].strip() if failed else None,
+                "chars": 0 if failed else len(report),
+            })
+            print(f"  {'❌' if failed else '📄'} {title}: "
+                  f"{records[-1]['error'] if failed else records[-1]['output'] or 'done'}")
+        if index_path:
+            try:
+                with open(index_path, 'w', encoding='utf-8') as f:
+                    f.write(render_agent3_index(records))
+                write_jsonl(jsonl_path_for(index_path), records)
+                print(f"🗂️  Synthesis index saved to {index_path} (+ {jsonl_path_for(index_path)})")
+            except Exception as e:
+                print(f"❌ Error saving synthesis index: {e}")
+        
+        return [report if report.startswith("ERROR:") else self._condensed_report(report)
+                for report in synthesis_reports]
+    
+    def _synthesis_prompt(self, fragmentation_analysis, main_paper_discussion):
+        """Professor prompt comparing one main paper's Discussion with the fragmentation analysis."""
+        return f"""
 You are a senior Professor agent. Given the following fragmentation analysis and the main paper content, your task is to:
 
 PART 1: SYNTHESIS (5-10 key convergences/divergences only)
@@ -150,19 +248,10 @@ Main Paper Discussion/Conclusion Section:
 
 IMPORTANT: Make sure to include a detailed comparison section that explicitly contrasts the main paper with the fragmentation analysis findings.
 """
-        synthesis_report = call_groq_api(prof_prompt)
-
-        # Save full synthesis if requested
-        if save_details_path:
-            try:
-                with open(save_details_path, 'w', encoding='utf-8') as f:
-                    f.write(synthesis_report)
-                print(f"📄 Professor synthesis report saved to {save_details_path}")
-            except Exception as e:
-                print(f"❌ Error saving Professor synthesis: {e}")
-
-        # Step 2: Combine into final report (condensed)
-        final_report = f"""
+    
+    def _condensed_report(self, synthesis_report):
+        """Wrap a synthesis in the final report layout."""
+        return f"""
 # REVIEW PAPER ANALYSIS REPORT (Condensed)
 Generated by AutoScholar System (Condensed v3.0)
 
@@ -174,7 +263,6 @@ This report presents a condensed analysis of a REVIEW PAPER and its reference li
 
 ---
 Report generated by AutoScholar Academic Analysis System @Ahmed Selim"""
-        return final_report
     
     def _format_summaries_dict(self, summaries_dict):
         """Format dictionary of summaries for API prompt."""
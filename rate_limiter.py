@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to per-process budgets
+    fcntl = None
+
+from config import (
+    GROQ_API_KEY,
+    GROQ_RATE_LIMIT_RPM,
+    GROQ_RATE_LIMIT_TPM,
+    GROQ_CONCURRENCY,
+    GROQ_MAX_CONCURRENCY,
+    GROQ_SHARED_RATE_LIMIT,
+    GROQ_RATE_STATE_DIR,
+)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+def parse_reset_duration(value):
+    """Parse Groq reset values such as '2m59.56s', '7.66s' or '250ms' into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    matched = False
+    for number, unit in _DURATION_PART.findall(value):
+        matched = True
+        number = float(number)
+        seconds += {"ms": number / 1000, "s": number, "m": number * 60, "h": number * 3600}[unit]
+    return seconds if matched else None
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    reserve() never blocks: it deducts the amount (the level may go negative) and
+    returns how long the caller must wait before the reservation is covered, so the
+    same bucket can pace sync threads and asyncio tasks alike.
+    """
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.level = float(capacity)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self.level = min(self.capacity, self.level + elapsed * self.refill_per_second)
+
+    def reserve(self, amount):
+        """Take amount from the bucket and return the number of seconds to wait first."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            amount = min(float(amount), self.capacity)  # oversized requests wait for a full bucket
+            self.level -= amount
+            wait = 0.0
+            if self.level < 0 and self.refill_per_second > 0:
+                wait = -self.level / self.refill_per_second
+            return max(wait, self.paused_until - now)
+
+    def refund(self, amount):
+        """Return unused reservation (e.g. when actual usage was below the estimate)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync_with_server(self, limit, remaining, reset_seconds):
+        """Adopt the server's view of the quota from x-ratelimit-* headers."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.capacity = float(limit)
+            if remaining is not None:
+                self.level = min(self.capacity, float(remaining))
+            if reset_seconds and limit and remaining is not None and remaining < limit:
+                # The server refills back to `limit` over `reset_seconds`
+                self.refill_per_second = (float(limit) - float(remaining)) / reset_seconds
+
+    def pause(self, seconds):
+        """Stop handing out capacity for the given number of seconds."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class SharedRateState:
+    """
+    Rate-limit state shared by every process on this machine that uses the same API key.
+
+    The state lives in a small JSON file guarded by an exclusive flock; each operation
+    is a short locked read-modify-write. Besides the bucket levels it records how many
+    requests and tokens each process has drawn, so runs can report their share.
+    """
+
+    PROCESS_TTL_SECONDS = 600  # forget processes idle for this long
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self.available = True  # False once the state file has failed; buckets then pace this process alone
+        self._thread_lock = threading.Lock()
+
+    def update(self, mutate):
+        """
+        Apply mutate(state, now) under the file lock and persist the result.
+        Raises OSError if the state file cannot be used (after warning once and marking it unavailable).
+        """
+        with self._thread_lock:
+            try:
+                return self._update_file(mutate)
+            except OSError as e:
+                if self.available:
+                    self.available = False
+                    print(f"⚠️  Shared rate budget file {self.path} unusable ({e}); "
+                          f"falling back to this process's own rate limits")
+                raise
+
+    def _update_file(self, mutate):
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        # Never follow a symlink planted at the state path
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        with os.fdopen(fd, "r+", encoding="utf-8") as file:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                raw = file.read()
+                try:
+                    state = json.loads(raw) if raw.strip() else {}
+                except ValueError:
+                    state = {}
+                now = time.time()
+                result = mutate(state, now)
+                self._prune_processes(state, now)
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(state))
+                file.flush()
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        return result
+
+    def _prune_processes(self, state, now):
+        processes = state.setdefault("processes", {})
+        for pid, info in list(processes.items()):
+            if now - info.get("last_seen", 0) > self.PROCESS_TTL_SECONDS or not _process_alive(int(pid)):
+                del processes[pid]
+
+    def record_usage(self, state, now, requests=0, tokens=0):
+        """Add this process's draw to the per-process accounting (call inside update)."""
+        info = state.setdefault("processes", {}).setdefault(str(self.pid), {"requests": 0, "tokens": 0})
+        info["requests"] += requests
+        info["tokens"] += tokens
+        info["last_seen"] = now
+
+    def process_shares(self):
+        """Return {pid: {"requests", "tokens", "request_share", "token_share"}} for live processes."""
+        def read(state, now):
+            processes = state.get("processes", {})
+            total_requests = sum(p.get("requests", 0) for p in processes.values()) or 1
+            total_tokens = sum(p.get("tokens", 0) for p in processes.values()) or 1
+            return {
+                int(pid): {
+                    "requests": info.get("requests", 0),
+                    "tokens": info.get("tokens", 0),
+                    "request_share": info.get("requests", 0) / total_requests,
+                    "token_share": info.get("tokens", 0) / total_tokens,
+                }
+                for pid, info in processes.items()
+            }
+        if not self.available:
+            return {}
+        try:
+            return self.update(read)
+        except OSError:
+            return {}
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+class SharedTokenBucket:
+    """
+    TokenBucket with the same interface whose level is stored in a SharedRateState,
+    so concurrent CLI runs draw from one machine-wide budget.
+    """
+
+    def __init__(self, shared, name, capacity, refill_per_second):
+        self.shared = shared
+        self.name = name
+        self._defaults = {"capacity": float(capacity), "rate": float(refill_per_second),
+                          "level": float(capacity), "paused_until": 0.0}
+        self._local = TokenBucket(capacity, refill_per_second)  # used once the shared state is unavailable
+
+    def _update(self, mutate, local):
+        """Apply mutate to the shared bucket, or local to the in-process bucket if the state file failed."""
+        if self.shared.available:
+            try:
+                return self.shared.update(mutate)
+            except OSError:
+                pass
+        return local(self._local)
+
+    def _bucket(self, state, now):
+        bucket = state.setdefault("buckets", {}).setdefault(self.name, dict(self._defaults, updated=now))
+        elapsed = max(0.0, now - bucket["updated"])
+        bucket["updated"] = now
+        bucket["level"] = min(bucket["capacity"], bucket["level"] + elapsed * bucket["rate"])
+        return bucket
+
+    @property
+    def capacity(self):
+        return self._update(lambda state, now: self._bucket(state, now)["capacity"], lambda bucket: bucket.capacity)
+
+    @property
+    def refill_per_second(self):
+        return self._update(lambda state, now: self._bucket(state, now)["rate"],
+                            lambda bucket: bucket.refill_per_second)
+
+    def reserve(self, amount):
+        def mutate(state, now):
+            bucket = self._bucket(state, now)
+            taken = min(float(amount), bucket["capacity"])
+            bucket["level"] -= taken
+            self.shared.record_usage(state, now, **{self.name: taken})
+            wait = -bucket["level"] / bucket["rate"] if bucket["level"] < 0 and bucket["rate"] > 0 else 0.0
+            return max(wait, bucket["paused_until"] - now)
+        return self._update(mutate, lambda bucket: bucket.reserve(amount))
+
+    def refund(self, amount):
+        def mutate(state, now):
+            bucket = self._bucket(state, now)
+            bucket["level"] = min(bucket["capacity"], bucket["level"] + amount)
+            self.shared.record_usage(state, now, **{self.name: -amount})
+        self._update(mutate, lambda bucket: bucket.refund(amount))
+
+    def sync_with_server(self, limit, remaining, reset_seconds):
+        def mutate(state, now):
+            bucket = self._bucket(state, now)
+            if limit:
+                bucket["capacity"] = float(limit)
+            if remaining is not None:
+                bucket["level"] = min(bucket["capacity"], float(remaining))
+            if reset_seconds and limit and remaining is not None and remaining < limit:
+                bucket["rate"] = (float(limit) - float(remaining)) / reset_seconds
+        self._update(mutate, lambda bucket: bucket.sync_with_server(limit, remaining, reset_seconds))
+
+    def pause(self, seconds):
+        def mutate(state, now):
+            bucket = self._bucket(state, now)
+            bucket["paused_until"] = max(bucket["paused_until"], now + seconds)
+        self._update(mutate, lambda bucket: bucket.pause(seconds))
+
+def shared_state_path(api_key=GROQ_API_KEY, state_dir=GROQ_RATE_STATE_DIR):
+    """State file for an API key; the key itself is never written to disk, only a hash."""
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return os.path.join(state_dir, f"autoscholar_rate_{key_hash}.json")
+
+class AdaptiveRateLimiter:
+    """
+    Paces Groq requests against requests-per-minute and tokens-per-minute budgets
+    and adapts concurrency AIMD-style: each success grows the in-flight limit a
+    little, each 429 halves it and pauses both buckets for the server's retry-after.
+    With a SharedRateState the budgets are shared with other processes on the machine.
+    """
+
+    def __init__(self, rpm=GROQ_RATE_LIMIT_RPM, tpm=GROQ_RATE_LIMIT_TPM,
+                 initial_concurrency=GROQ_CONCURRENCY, max_concurrency=GROQ_MAX_CONCURRENCY,
+                 shared_state=None):
+        self.shared_state = shared_state
+        if shared_state is not None:
+            self.requests = SharedTokenBucket(shared_state, "requests", rpm, rpm / 60.0)
+            self.tokens = SharedTokenBucket(shared_state, "tokens", tpm, tpm / 60.0)
+        else:
+            self.requests = TokenBucket(rpm, rpm / 60.0)
+            self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.concurrency_limit = float(max(1, initial_concurrency))
+        self.max_concurrency = max(1, max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, estimated_tokens):
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def _try_take_slot(self):
+        with self._lock:
+            if self.in_flight < int(self.concurrency_limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self, estimated_tokens):
+        """Block until a concurrency slot and rate budget are available (sync callers)."""
+        while not self._try_take_slot():
+            time.sleep(0.05)
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, estimated_tokens):
+        """Await a concurrency slot and rate budget without blocking the event loop."""
+        while not self._try_take_slot():
+            await asyncio.sleep(0.05)
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def release(self, outcome="success", headers=None, estimated_tokens=0, used_tokens=None, retry_after=None):
+        """
+        Finish a request: free its slot, learn from headers and adjust concurrency.
+        outcome is "success" (additive increase), "throttled" (halve and pause) or "error" (no change).
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if outcome == "throttled":
+                self.throttled += 1
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            elif outcome == "success":
+                self.concurrency_limit = min(
+                    float(self.max_concurrency),
+                    self.concurrency_limit + 1.0 / self.concurrency_limit,
+                )
+        if used_tokens is not None and estimated_tokens > used_tokens:
+            self.tokens.refund(estimated_tokens - used_tokens)
+        if headers is not None:
+            self.update_from_headers(headers)
+        if outcome == "throttled":
+            pause = retry_after if retry_after is not None else 1.0
+            self.requests.pause(pause)
+            self.tokens.pause(pause)
+
+    def update_from_headers(self, headers):
+        """Re-initialise both buckets from x-ratelimit-* response headers."""
+        def number(name):
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+
+        if headers.get("x-ratelimit-limit-requests") is not None:
+            self.requests.sync_with_server(
+                number("x-ratelimit-limit-requests"),
+                number("x-ratelimit-remaining-requests"),
+                parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+            )
+        if headers.get("x-ratelimit-limit-tokens") is not None:
+            self.tokens.sync_with_server(
+                number("x-ratelimit-limit-tokens"),
+                number("x-ratelimit-remaining-tokens"),
+                parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+            )
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter, creating it on first use."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                shared_state = None
+                if GROQ_SHARED_RATE_LIMIT and fcntl is not None:
+                    shared_state = SharedRateState(shared_state_path())
+                _rate_limiter = AdaptiveRateLimiter(shared_state=shared_state)
+    return _rate_limiter
+
+def reset_rate_limiter(**settings):
+    """
+    Replace the process-wide rate limiter with a fresh one built from settings
+    (AdaptiveRateLimiter arguments), e.g. to start a benchmark run from a cold limiter.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        _rate_limiter = AdaptiveRateLimiter(**settings)
+    return _rate_limiter
+
+def report_rate_budget_share():
+    """Print how much of the machine-wide rate budget each process has used."""
+    limiter = get_rate_limiter()
+    if limiter.shared_state is None:
+        return
+    shares = limiter.shared_state.process_shares()
+    if len(shares) <= 1:
+        return
+    print(f"📊 Shared rate budget across {len(shares)} processes:")
+    for pid, share in sorted(shares.items()):
+        marker = " (this run)" if pid == os.getpid() else ""
+        print(f"  PID {pid}{marker}: {share['request_share']:.0%} of requests, "
+              f"{share['token_share']:.0%} of tokens")
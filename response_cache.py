@@ -0,0 +1,137 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from config import (
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_MAX_BYTES,
+)
+
+class ResponseCache:
+    """
+    SQLite-backed cache of LLM completions.
+
+    Entries are keyed by model, temperature, max_tokens and a SHA-256 of the
+    prompt. Expired entries (older than ttl_seconds) are treated as misses and
+    deleted; when the stored responses exceed max_bytes the least recently used
+    rows are evicted.
+    """
+
+    def __init__(self, db_path=RESPONSE_CACHE_PATH, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                 max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(model, prompt, temperature, max_tokens):
+        """Build the cache key for one request."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model}|{temperature}|{max_tokens}|{prompt_hash}"
+
+    def get(self, model, prompt, temperature, max_tokens):
+        """Return the cached response, or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        key = self.make_key(model, prompt, temperature, max_tokens)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return response
+
+    def put(self, model, prompt, temperature, max_tokens, response):
+        """Store a response and evict old entries if the cache is over its size limit."""
+        if not self.enabled or response is None:
+            return
+        key = self.make_key(model, prompt, temperature, max_tokens)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            conn.commit()
+            self._evict_locked(conn)
+
+    def _evict_locked(self, conn):
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+            stale = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        conn.commit()
+
+    def clear(self):
+        """Delete every cached response. Returns the number of rows removed."""
+        with self._lock:
+            conn = self._connection()
+            removed = conn.execute("DELETE FROM responses").rowcount
+            conn.commit()
+            return removed
+
+    def stats(self):
+        """Return hit/miss counters for this process and the number of stored entries."""
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+_response_cache = None
+
+def get_response_cache():
+    """Return the process-wide response cache, creating it on first use."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,102 @@
+import re
+from functools import lru_cache
+
+# One alternative per section type; a heading line starts with one of these (optionally numbered)
+SECTION_TYPES = [
+    ("abstract", r"abstract|summary"),
+    ("introduction", r"introduction"),
+    ("literature", r"literature review|theoretical background|background|theory and hypotheses|theoretical framework"),
+    ("methods", r"methods?|methodology|research design|data and methods?|data"),
+    ("results", r"results|findings"),
+    ("discussion", r"discussion|implications"),
+    ("conclusion", r"conclusions?|concluding remarks"),
+    ("limitations", r"limitations|future research"),
+    ("references", r"references|bibliography|works cited"),
+    ("appendix", r"appendix|appendices|supplementary material"),
+]
+
+MAX_HEADING_CHARS = 100  # Longer lines are prose that happens to start with a section word
+
+_NUMBERING = r"(?:(?:\d+(?:\.\d+)*|[IVX]+)\.?[ \t]*)?"
+# After the section word a heading line may hold a label ("Appendix B") and then either a
+# capitalized title after punctuation ("Appendix A: Survey items") or more title-case words
+# ("Results and Discussion"). Prose that merely starts with a section word ("Appendix B reports
+# the robustness checks.") does not end the line that way, so it is not taken for a heading.
+_HEADING_TAIL = (
+    r"(?:[ \t]+(?-i:[A-Z0-9]+)\b)?"
+    r"(?:[ \t]*[:.–—-][ \t]*(?-i:[A-Z])[^\n]*"
+    r"|(?:[ \t]+(?:(?-i:[A-Z])[\w'-]*|and|or|of|for|in|on|the|to|&))*[ \t]*[.:]?)"
+    r"[ \t]*(?=\n|\Z)"
+)
+# Anchored on a literal newline rather than ^ with MULTILINE, so the regex engine can skip
+# straight from line break to line break instead of trying every character
+_HEADING_PATTERN = re.compile(
+    r"\n[ \t]*" + _NUMBERING + "(?:(?:"
+    + "|".join(f"(?P<{name}>{alternatives})" for name, alternatives in SECTION_TYPES if name != "references")
+    # References count only as a heading on their own line, not as the first word of a sentence
+    + r")\b" + _HEADING_TAIL + r"|(?P<references>references|bibliography|works cited)[ \t]*(?=\n|\Z))",
+    re.IGNORECASE,
+)
+
+class SectionIndex:
+    """
+    Offsets of every section heading in a paper, found in one regex pass over the text.
+    Consumers slice the text by section type instead of rescanning it.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.headings = []  # (offset, section type, heading line)
+        # With a newline prepended, each match starts at the original offset of its heading line
+        for match in _HEADING_PATTERN.finditer("\n" + text):
+            line = match.group(0).strip()
+            if len(line) < MAX_HEADING_CHARS:
+                self.headings.append((match.start(), match.lastgroup, line))
+        self.references_start = self.find("references")
+
+    def find(self, *section_types, after=0):
+        """Offset of the first heading of any of section_types at or after offset `after`, or -1."""
+        for offset, section_type, _ in self.headings:
+            if offset >= after and section_type in section_types:
+                return offset
+        return -1
+
+    def span(self, *section_types, until=("references",)):
+        """
+        (start, end) of the text from the first heading of section_types up to the next heading of
+        any `until` type (the end of the text if there is none), or None if no such heading exists.
+        """
+        start = self.find(*section_types)
+        if start == -1:
+            return None
+        end = self.find(*until, after=start + 1)
+        return start, end if end != -1 else len(self.text)
+
+    def section(self, *section_types, until=("references",)):
+        """Text of span(section_types, until), or an empty string."""
+        span = self.span(*section_types, until=until)
+        return self.text[span[0]:span[1]].strip() if span else ""
+
+    def body(self):
+        """Text before the References heading."""
+        return self.text[:self.references_start] if self.references_start != -1 else self.text
+
+    def tail(self, fraction=0.3):
+        """The last `fraction` of the body, starting at a line boundary."""
+        body_end = len(self.body())
+        cut = int(len(self.text) * (1 - fraction))
+        start = self.text.rfind("\n", 0, cut) + 1
+        return self.text[start:body_end].strip() if start < body_end else ""
+
+    def discussion(self, min_chars=500):
+        """
+        The Discussion/Conclusion/Implications section up to the References.
+        Falls back to the last 30% of the body when no such heading exists or the section is very short.
+        """
+        text = self.section("discussion", "conclusion")
+        return text if len(text) >= min_chars else self.tail()
+
+@lru_cache(maxsize=16)
+def get_section_index(text):
+    """Return the SectionIndex for text, reusing it for repeated calls on the same paper."""
+    return SectionIndex(text)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are atomic but not merged across processes
+    fcntl = None
+
+from config import (
+    GROQ_MODEL,
+    PHD_STUDENT_PROMPT,
+    PHD_COMBINE_PROMPT,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    EXTRACTOR_VERSION,
+    SUMMARY_MANIFEST_PATH,
+)
+from utils import current_extraction_variant
+
+def summary_prompt_version():
+    """
+    Fingerprint of everything besides the paper that shapes an Agent 1 summary, including the
+    extractor version and settings that decide which pages of the paper reach the prompt.
+    """
+    fingerprint = (f"{PHD_STUDENT_PROMPT}\0{PHD_COMBINE_PROMPT}\0{CHUNK_SIZE}\0{CHUNK_OVERLAP}"
+                   f"\0{EXTRACTOR_VERSION}\0{current_extraction_variant()}")
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+class SummaryManifest:
+    """
+    Record of Agent 1 summaries keyed by the content hash of each reference file.
+
+    An entry is reused only if it was produced by the current model and prompt
+    version, so changing either re-summarizes every paper. Saving merges this run's
+    new entries into the file under a lock, so concurrent runs do not drop each other's work.
+    """
+
+    def __init__(self, path=SUMMARY_MANIFEST_PATH, model=GROQ_MODEL, prompt_version=None):
+        self.path = path
+        self.model = model
+        self.prompt_version = prompt_version or summary_prompt_version()
+        self._lock = threading.Lock()
+        self._added = set()  # hashes put since the last save
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file).get("papers", {})
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, file_hash):
+        """Return the stored entry for file_hash if it matches the current model and prompt version."""
+        entry = self.entries.get(file_hash)
+        if entry and entry.get("model") == self.model and entry.get("prompt_version") == self.prompt_version:
+            return entry
+        return None
+
+    def put(self, file_hash, title, summary, calls=1, prompt_tokens=0, completion_tokens=0):
+        """Record the summary produced for file_hash under the current model and prompt version."""
+        with self._lock:
+            self._added.add(file_hash)
+            self.entries[file_hash] = {
+                "title": title,
+                "summary": summary,
+                "model": self.model,
+                "prompt_version": self.prompt_version,
+                "calls": calls,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            }
+
+    def save(self):
+        """
+        Write the manifest atomically. Under an exclusive lock the file is re-read and the
+        entries put since the last save are merged into it, keeping what other runs stored meanwhile.
+        """
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    entries = self._load()
+                    entries.update((file_hash, self.entries[file_hash]) for file_hash in self._added)
+                    tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as file:
+                        json.dump({"papers": entries}, file, ensure_ascii=False)
+                    os.replace(tmp_path, self.path)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            self.entries = entries
+            self._added.clear()
+
+_summary_manifest = None
+
+def get_summary_manifest():
+    """Return the process-wide Agent 1 summary manifest, loading it on first use."""
+    global _summary_manifest
+    if _summary_manifest is None:
+        _summary_manifest = SummaryManifest()
+    return _summary_manifest
@@ -0,0 +1,353 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime
+
+from config import GROQ_MODEL, TELEMETRY_DIR, TELEMETRY_KEEP_RUNS, TELEMETRY_OTLP
+
+LATENCY_BUCKETS = [0.5, 1, 2, 5, 10, 30, 60, 120, 300]
+
+_current_span = contextvars.ContextVar("autoscholar_span", default=None)
+
+def _now_ns():
+    return time.time_ns()
+
+def _label_value(value):
+    """Escape a Prometheus label value: backslash, double quote and newline."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Telemetry:
+    """
+    In-process recorder for one run: API calls, batch jobs and nested spans (stages, agents).
+    Everything is kept in memory and exported at the end as a JSON run report,
+    a Prometheus text-format file and, optionally, OTLP-JSON trace spans.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + secrets.token_hex(3)
+        self.trace_id = secrets.token_hex(16)
+        self.started_ns = _now_ns()
+        self.attributes = {}  # run-level facts such as the command and cache hit counts
+        self.spans = []  # finished spans, including one per API call
+        self.calls = []
+        self.batches = []
+
+    def annotate(self, **attributes):
+        """Attach run-level attributes to the report."""
+        with self._lock:
+            self.attributes.update(attributes)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time a block as a span; spans opened inside it (same thread or task) become its children."""
+        parent = _current_span.get()
+        span = {
+            "name": name,
+            "span_id": secrets.token_hex(8),
+            "parent_id": parent["span_id"] if parent else None,
+            "start_ns": _now_ns(),
+            "attributes": dict(attributes),
+            "status": "ok",
+        }
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span["status"] = "error"
+            span["attributes"]["error"] = str(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span["end_ns"] = _now_ns()
+            with self._lock:
+                self.spans.append(span)
+
+    def record_call(self, kind, started_ns, latency, queue_wait=0.0, attempt=1, status=None,
+                    prompt_tokens=None, completion_tokens=None, error=None, **extra):
+        """
+        Record one API request attempt.
+        Args:
+            kind (str): "sync", "async" or "stream"
+            started_ns (int): Wall-clock start of the request in nanoseconds
+            latency (float): Seconds from sending the request to the complete response
+            queue_wait (float): Seconds spent waiting for a concurrency slot and the rate limiter
+            attempt (int): 1 for the first try; higher numbers are retries (including 429s)
+            status (int): HTTP status code, if one was received
+        """
+        parent = _current_span.get()
+        call = {
+            "kind": kind,
+            "stage": parent["name"] if parent else None,
+            "latency_seconds": round(latency, 4),
+            "queue_wait_seconds": round(queue_wait, 4),
+            "attempt": attempt,
+            "status": status,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "error": error,
+        }
+        call.update(extra)
+        span = {
+            "name": f"groq.chat.{kind}",
+            "span_id": secrets.token_hex(8),
+            "parent_id": parent["span_id"] if parent else None,
+            "start_ns": started_ns,
+            "end_ns": started_ns + int(latency * 1e9),
+            "attributes": {key: value for key, value in call.items() if value is not None and key != "kind"},
+            "status": "error" if error else "ok",
+        }
+        with self._lock:
+            self.calls.append(call)
+            self.spans.append(span)
+
+    def record_batch(self, batch_id, requests, wait_seconds, status, started_ns, prompt_tokens=0, completion_tokens=0):
+        """Record one Batch API job: requests submitted, seconds from creation to a terminal status and tokens used."""
+        parent = _current_span.get()
+        batch = {
+            "batch_id": batch_id,
+            "stage": parent["name"] if parent else None,
+            "requests": requests,
+            "wait_seconds": round(wait_seconds, 3),
+            "status": status,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+        span = {
+            "name": "groq.batch",
+            "span_id": secrets.token_hex(8),
+            "parent_id": parent["span_id"] if parent else None,
+            "start_ns": started_ns,
+            "end_ns": started_ns + int(wait_seconds * 1e9),
+            "attributes": dict(batch),
+            "status": "ok" if status == "completed" else "error",
+        }
+        with self._lock:
+            self.batches.append(batch)
+            self.spans.append(span)
+
+    def summary(self):
+        """Totals per stage and for the whole run."""
+        with self._lock:
+            calls = list(self.calls)
+            spans = list(self.spans)
+            batches = list(self.batches)
+
+        def totals(stage=None):
+            records = [call for call in calls if stage is None or call["stage"] == stage]
+            jobs = [batch for batch in batches if stage is None or batch["stage"] == stage]
+            return {
+                "calls": len(records),
+                "retries": sum(1 for call in records if call["attempt"] > 1),
+                "errors": sum(1 for call in records if call["error"]),
+                "prompt_tokens": sum(record["prompt_tokens"] or 0 for record in records + jobs),
+                "completion_tokens": sum(record["completion_tokens"] or 0 for record in records + jobs),
+                "latency_seconds": round(sum(call["latency_seconds"] for call in records), 3),
+                "queue_wait_seconds": round(sum(call["queue_wait_seconds"] for call in records), 3),
+                "batch_requests": sum(batch["requests"] for batch in jobs),
+                "batch_wait_seconds": round(sum(batch["wait_seconds"] for batch in jobs), 3),
+            }
+
+        stages = {}
+        for span in spans:
+            if span["name"].startswith("groq."):
+                continue
+            stage = stages.setdefault(span["name"], {"runs": 0, "duration_seconds": 0.0})
+            stage["runs"] += 1
+            stage["duration_seconds"] = round(stage["duration_seconds"] + (span["end_ns"] - span["start_ns"]) / 1e9, 3)
+        for name, stage in stages.items():
+            stage.update(totals(name))
+
+        return {
+            "run_id": self.run_id,
+            "model": GROQ_MODEL,
+            "started": datetime.fromtimestamp(self.started_ns / 1e9).isoformat(timespec="seconds"),
+            "wall_seconds": round((_now_ns() - self.started_ns) / 1e9, 3),
+            "attributes": dict(self.attributes),
+            "totals": totals(),
+            "stages": stages,
+        }
+
+    def run_report(self):
+        """Full JSON-serializable run report: summary plus every call, batch and span."""
+        report = self.summary()
+        with self._lock:
+            report["calls"] = list(self.calls)
+            report["batches"] = list(self.batches)
+            report["spans"] = [
+                {
+                    "name": span["name"],
+                    "span_id": span["span_id"],
+                    "parent_id": span["parent_id"],
+                    "start_offset_seconds": round((span["start_ns"] - self.started_ns) / 1e9, 4),
+                    "duration_seconds": round((span["end_ns"] - span["start_ns"]) / 1e9, 4),
+                    "status": span["status"],
+                }
+                for span in self.spans if not span["name"].startswith("groq.chat")
+            ]
+        return report
+
+    def prometheus_text(self):
+        """Metrics in the Prometheus text exposition format."""
+        summary = self.summary()
+        with self._lock:
+            calls = list(self.calls)
+            batches = list(self.batches)
+        lines = []
+
+        def metric(name, kind, help_text, samples, suffix=""):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_label_value(label)}"' for key, label in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+
+        by_outcome = {}
+        for call in calls:
+            key = (call["kind"], str(call["status"] or ("error" if call["error"] else "unknown")))
+            by_outcome[key] = by_outcome.get(key, 0) + 1
+        metric("autoscholar_api_requests_total", "counter", "Groq API request attempts by kind and HTTP status.",
+               [({"kind": kind, "status": status}, count) for (kind, status), count in sorted(by_outcome.items())])
+        metric("autoscholar_api_retries_total", "counter", "Groq API request attempts that were retries.",
+               [({}, summary["totals"]["retries"])])
+        metric("autoscholar_api_tokens_total", "counter", "Tokens sent and generated.",
+               [({"type": "prompt"}, summary["totals"]["prompt_tokens"]),
+                ({"type": "completion"}, summary["totals"]["completion_tokens"])])
+
+        buckets = [0] * len(LATENCY_BUCKETS)
+        for call in calls:
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if call["latency_seconds"] <= bound:
+                    buckets[i] += 1
+        samples = [({"le": str(bound)}, count) for bound, count in zip(LATENCY_BUCKETS, buckets)]
+        samples.append(({"le": "+Inf"}, len(calls)))
+        metric("autoscholar_api_latency_seconds", "histogram", "Groq API request latency.", samples, suffix="_bucket")
+        lines.append(f"autoscholar_api_latency_seconds_sum {summary['totals']['latency_seconds']}")
+        lines.append(f"autoscholar_api_latency_seconds_count {len(calls)}")
+
+        metric("autoscholar_api_queue_wait_seconds_total", "counter",
+               "Seconds requests waited for a concurrency slot and the rate limiter.",
+               [({}, summary["totals"]["queue_wait_seconds"])])
+        metric("autoscholar_batch_wait_seconds_total", "counter", "Seconds Batch API jobs spent queued and running.",
+               [({}, summary["totals"]["batch_wait_seconds"])])
+        metric("autoscholar_batch_jobs_total", "counter", "Batch API jobs by final status.",
+               [({"status": status}, sum(1 for batch in batches if batch["status"] == status))
+                for status in sorted({batch["status"] for batch in batches})])
+        metric("autoscholar_stage_duration_seconds", "gauge", "Wall-clock seconds spent in each stage.",
+               [({"stage": name}, stage["duration_seconds"]) for name, stage in sorted(summary["stages"].items())])
+        metric("autoscholar_stage_tokens_total", "counter", "Prompt plus completion tokens used by each stage.",
+               [({"stage": name}, stage["prompt_tokens"] + stage["completion_tokens"])
+                for name, stage in sorted(summary["stages"].items())])
+        metric("autoscholar_run_wall_seconds", "gauge", "Wall-clock seconds since the run started.",
+               [({}, summary["wall_seconds"])])
+        return "\n".join(lines) + "\n"
+
+    def otlp_json(self):
+        """All spans as an OTLP/JSON ExportTraceServiceRequest."""
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        with self._lock:
+            spans = [
+                {
+                    "traceId": self.trace_id,
+                    "spanId": span["span_id"],
+                    **({"parentSpanId": span["parent_id"]} if span["parent_id"] else {}),
+                    "name": span["name"],
+                    "kind": 3 if span["name"].startswith("groq.") else 1,  # CLIENT for API calls, INTERNAL otherwise
+                    "startTimeUnixNano": str(span["start_ns"]),
+                    "endTimeUnixNano": str(span["end_ns"]),
+                    "attributes": [attribute(key, value) for key, value in span["attributes"].items()],
+                    "status": {"code": 2 if span["status"] == "error" else 1},
+                }
+                for span in self.spans
+            ]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    attribute("service.name", "autoscholar"),
+                    attribute("autoscholar.run_id", self.run_id),
+                    attribute("gen_ai.request.model", GROQ_MODEL),
+                    *(attribute(f"autoscholar.{key}", value) for key, value in self.attributes.items()),
+                ]},
+                "scopeSpans": [{"scope": {"name": "autoscholar"}, "spans": spans}],
+            }]
+        }
+
+    def export(self, directory=TELEMETRY_DIR, otlp=TELEMETRY_OTLP, keep_runs=TELEMETRY_KEEP_RUNS):
+        """
+        Write run_<id>.json and run_<id>.prom (and run_<id>.otlp.json if otlp) to directory,
+        then delete the files of all but the newest keep_runs runs (0 keeps everything).
+        Returns the list of written paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"run_{self.run_id}")
+        paths = [f"{base}.json", f"{base}.prom"]
+        with open(paths[0], 'w', encoding='utf-8') as f:
+            json.dump(self.run_report(), f, indent=2, ensure_ascii=False)
+        with open(paths[1], 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        if otlp:
+            paths.append(f"{base}.otlp.json")
+            with open(paths[2], 'w', encoding='utf-8') as f:
+                json.dump(self.otlp_json(), f, ensure_ascii=False)
+        if keep_runs:
+            prune_runs(directory, keep_runs)
+        return paths
+
+def prune_runs(directory, keep_runs):
+    """Delete the telemetry files of all but the newest keep_runs runs; run ids sort by start time."""
+    runs = {}
+    for name in os.listdir(directory):
+        if name.startswith("run_"):
+            runs.setdefault(name[len("run_"):].split(".", 1)[0], []).append(name)
+    for run_id in sorted(runs)[:-keep_runs]:
+        for name in runs[run_id]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+_telemetry = Telemetry()
+
+def get_telemetry():
+    """Return the process-wide telemetry recorder."""
+    return _telemetry
+
+def span(name, **attributes):
+    """Shortcut for get_telemetry().span(name, **attributes)."""
+    return _telemetry.span(name, **attributes)
+
+def traced(name):
+    """Decorator: run every call of the function inside span(name)."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _telemetry.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def export_telemetry(directory=None, otlp=None):
+    """Export the current run and print a one-line summary with the written paths."""
+    telemetry = get_telemetry()
+    try:
+        paths = telemetry.export(directory or TELEMETRY_DIR, TELEMETRY_OTLP if otlp is None else otlp)
+    except OSError as e:
+        print(f"❌ Error writing telemetry: {e}")
+        return []
+    totals = telemetry.summary()["totals"]
+    print(f"📈 Telemetry: {totals['calls']} API calls, {totals['retries']} retries, "
+          f"{totals['prompt_tokens'] + totals['completion_tokens']:,} tokens -> {', '.join(paths)}")
+    return paths
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py reads the environment at import time, so point every cache and the Groq
+# clients at throwaway locations and the local fake server before any module is imported
+_state_dir = tempfile.mkdtemp(prefix="autoscholar_tests_")
+os.environ.update({
+    "GROQ_API_KEY": "fake-test-key",
+    "GROQ_SHARED_RATE_LIMIT": "0",
+    "GROQ_RATE_LIMIT_RPM": "100000",
+    "GROQ_RATE_LIMIT_TPM": "100000000",
+    "BATCH_POLL_SECONDS": "0.05",
+    "EXTRACTION_CACHE_DIR": os.path.join(_state_dir, "extracted"),
+    "RESPONSE_CACHE_PATH": os.path.join(_state_dir, "responses.sqlite3"),
+    "SUMMARY_MANIFEST_PATH": os.path.join(_state_dir, "agent1_manifest.json"),
+    "THEME_VECTOR_CACHE_PATH": os.path.join(_state_dir, "theme_vectors.npz"),
+    "TELEMETRY_DIR": os.path.join(_state_dir, "telemetry"),
+})
+
+from fake_groq import FakeGroq, FakeGroqServer  # noqa: E402
+
+_server = FakeGroqServer(FakeGroq(latency="fixed:0.01", tokens_per_second=100000, completion_tokens=20,
+                                  batch_delay="fixed:0.1")).start()
+os.environ["GROQ_BASE_URL"] = _server.base_url
+
+def _write_pdf(path, pages):
+    """Minimal uncompressed PDF with one line of Helvetica text per entry of each page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))}] "
+               f"/Count {len(pages)} >>".encode()]
+    font = 3 + 2 * len(pages)
+    for i, lines in enumerate(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font} 0 R >> >> >>".encode())
+        body = "BT /F1 12 Tf 14 TL 72 720 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.fixture
+def write_pdf(tmp_path):
+    """Write a minimal PDF named name under tmp_path from pages (lists of text lines); returns its path."""
+    return lambda name, pages: _write_pdf(tmp_path / name, pages)
+
+@pytest.fixture
+def fake_groq():
+    """The session's FakeGroq state; fault settings changed by a test are restored afterwards."""
+    fake = _server.fake
+    saved = (fake.rate_429, fake.rate_5xx, fake.retry_after)
+    yield fake
+    fake.rate_429, fake.rate_5xx, fake.retry_after = saved
+
+@pytest.fixture
+def fake_groq_server(fake_groq):
+    """The session's FakeGroqServer (its fake is the fake_groq fixture)."""
+    return _server
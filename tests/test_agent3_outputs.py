@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+import cli
+import corpus
+from professor_agent import ProfessorAgent
+from utils import call_groq_api_stream, call_groq_api_stream_many
+
+def test_failed_stream_leaves_the_previous_output(tmp_path, fake_groq):
+    output_path = tmp_path / "synthesis.txt"
+    output_path.write_text("previous synthesis", encoding="utf-8")
+    fake_groq.rate_5xx = 1.0
+    with pytest.raises(Exception):
+        call_groq_api_stream("This stream always fails.", output_path=str(output_path), max_retries=1,
+                             use_cache=False)
+    assert output_path.read_text(encoding="utf-8") == "previous synthesis"
+    assert os.listdir(tmp_path) == ["synthesis.txt"]
+
+def test_stream_many_replaces_only_finished_outputs(tmp_path, fake_groq):
+    paths = [tmp_path / "ok.txt", tmp_path / "failed.txt"]
+    paths[1].write_text("previous synthesis", encoding="utf-8")
+    texts = call_groq_api_stream_many(["Finish this synthesis."], output_paths=[str(paths[0])], use_cache=False)
+    fake_groq.rate_5xx = 1.0
+    failed = call_groq_api_stream_many(["Fail this synthesis."], output_paths=[str(paths[1])], max_retries=1,
+                                       use_cache=False)
+    assert paths[0].read_text(encoding="utf-8") == texts[0]
+    assert failed[0].startswith("ERROR:")
+    assert paths[1].read_text(encoding="utf-8") == "previous synthesis"
+    assert sorted(os.listdir(tmp_path)) == ["failed.txt", "ok.txt"]
+
+def _failing_reports(self, main_papers, fragmentation_analysis, save_paths=None, discussions=None,
+                     index_path=None, stream=False):
+    return ["ERROR: model unavailable"] * len(main_papers)
+
+def test_cli_fails_when_every_synthesis_fails(write_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(ProfessorAgent, "generate_final_reports", _failing_reports)
+    main_papers = [write_pdf(f"main{i}.pdf", [["Discussion", f"Main paper {i} findings."]]) for i in range(2)]
+    assert cli.run_agent3_all(main_papers, "analysis", str(tmp_path / "agent3.txt")) is False
+
+def test_cli_fails_without_main_paper_text(write_pdf, tmp_path):
+    empty = write_pdf("empty.pdf", [[]])
+    assert cli.run_agent3_all([empty], "analysis", str(tmp_path / "agent3.txt")) is False
+
+def test_corpus_project_fails_when_every_synthesis_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(ProfessorAgent, "generate_final_reports", _failing_reports)
+    failures = {}
+    project = {"name": "alpha", "main_paper": str(tmp_path / "main"), "references": str(tmp_path / "refs")}
+    stages = corpus.build_corpus_pipeline([project], str(tmp_path / "out"), all_main_papers=True, failures=failures)
+    agent3 = next(stage for stage in stages if stage.name == "agent3:alpha")
+    inputs = {"main_paper:alpha": {"titles": ["main.pdf"], "contents": ["Discussion\nFindings."]},
+              "agent2:alpha": "analysis"}
+    assert agent3.func(inputs) is None
+    assert failures == {"alpha": "Agent 3: Every main-paper synthesis failed"}
@@ -0,0 +1,39 @@
+from artifacts import (
+    jsonl_path_for,
+    load_fragmentation_analysis,
+    load_summaries,
+    render_agent1_text,
+    render_agent2_text,
+    text_path_for,
+    write_jsonl,
+)
+
+RECORDS = [
+    {"type": "paper", "title": "a.pdf", "file_hash": "ha", "summary": "1. Summary of A"},
+    {"type": "paper", "title": "b.pdf", "file_hash": "hb", "summary": "ERROR: timed out"},
+    {"type": "paper", "title": "c.pdf", "file_hash": "hc", "summary": "1. Summary of C\n2. More"},
+]
+
+def test_text_and_jsonl_paths_never_collide():
+    assert (jsonl_path_for("out/agent1.txt"), text_path_for("out/agent1.txt")) == ("out/agent1.jsonl", "out/agent1.txt")
+    assert (jsonl_path_for("out/agent1.jsonl"), text_path_for("out/agent1.jsonl")) == ("out/agent1.jsonl", "out/agent1.txt")
+
+def test_summaries_load_from_jsonl_and_skip_failures(tmp_path):
+    write_jsonl(tmp_path / "agent1.jsonl", RECORDS)
+    (tmp_path / "agent1.txt").write_text("ignored when the JSONL artifact exists")
+    assert load_summaries(str(tmp_path / "agent1.txt")) == (
+        ["a.pdf", "c.pdf"], ["1. Summary of A", "1. Summary of C\n2. More"], ["ha", "hc"])
+
+def test_rendered_text_parses_back_without_the_jsonl(tmp_path):
+    path = tmp_path / "agent1.txt"
+    path.write_text(render_agent1_text(RECORDS))
+    titles, summaries, _ = load_summaries(str(path))
+    assert titles == ["a.pdf", "c.pdf"] and summaries[1] == "1. Summary of C\n2. More"
+
+def test_fragmentation_analysis_prefers_the_jsonl(tmp_path):
+    record = {"type": "analysis", "papers": 2, "analysis": "Themes: legitimacy"}
+    write_jsonl(tmp_path / "agent2.jsonl", [record])
+    (tmp_path / "agent2.txt").write_text(render_agent2_text(record))
+    assert load_fragmentation_analysis(str(tmp_path / "agent2.txt")) == "Themes: legitimacy"
+    (tmp_path / "agent2.jsonl").unlink()
+    assert load_fragmentation_analysis(str(tmp_path / "agent2.txt")).endswith("Themes: legitimacy")
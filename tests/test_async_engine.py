@@ -0,0 +1,23 @@
+import hashlib
+
+import pytest
+
+from utils import call_groq_api_async, run_async
+
+PROMPTS = [f"Summarize async paper {i}" for i in range(8)]
+
+def _digest(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+def test_sliding_window_keeps_at_most_concurrency_requests_in_flight(fake_groq):
+    fake_groq.stats["max_in_flight"] = 0
+    results = run_async(call_groq_api_async(PROMPTS, concurrency=2, use_cache=False))
+    assert [_digest(prompt) in result for prompt, result in zip(PROMPTS, results)] == [True] * len(PROMPTS)
+    assert fake_groq.stats["max_in_flight"] <= 2
+
+def test_failed_prompts_come_back_as_error_strings(fake_groq):
+    fake_groq.rate_5xx = 1.0
+    results = run_async(call_groq_api_async(PROMPTS[:3], max_retries=1, use_cache=False))
+    assert all(result.startswith("ERROR:") for result in results)
+    with pytest.raises(Exception):
+        run_async(call_groq_api_async(PROMPTS[0], max_retries=1, use_cache=False))
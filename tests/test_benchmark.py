@@ -0,0 +1,18 @@
+from benchmark import make_prompts, percentile, run_case
+from rate_limiter import reset_rate_limiter
+
+def test_percentile_is_nearest_rank():
+    values = [0.5, 0.1, 0.4, 0.2, 0.3]
+    assert percentile(values, 0.50) == 0.3
+    assert percentile(values, 0.99) == 0.5
+    assert percentile([], 0.5) is None
+
+def test_async_case_respects_its_concurrency(fake_groq_server):
+    fake_groq_server.fake.stats["max_in_flight"] = 0
+    try:
+        row = run_case("async", 2, make_prompts(6, 50, "test-async"), fake_groq_server)
+    finally:
+        reset_rate_limiter()
+    assert (row["requests"], row["ok"], row["errors"]) == (6, 6, 0)
+    assert row["server_max_in_flight"] <= 2
+    assert row["p50_seconds"] is not None
@@ -0,0 +1,44 @@
+import phd_student_agent
+from phd_student_agent import PhDStudentAgent
+from utils import chunk_text, estimate_tokens, iter_chunks
+
+SENTENCES = [f"Sentence {i} describes how institutions shape legitimacy." for i in range(40)]
+
+def test_chunks_end_on_sentences_and_stay_under_the_budget():
+    chunks = chunk_text(" ".join(SENTENCES), chunk_size=60, overlap=0)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 60 and chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == " ".join(SENTENCES)
+
+def test_chunks_repeat_trailing_sentences_as_overlap():
+    chunks = chunk_text(" ".join(SENTENCES), chunk_size=60, overlap=20)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_sentence = previous[previous.rindex("Sentence"):]
+        assert chunk.startswith(last_sentence)
+
+def test_sentences_split_across_pieces_are_joined():
+    pieces = ["First sentence is complete. The second one", "continues on the next page."]
+    assert list(iter_chunks(pieces, chunk_size=100, overlap=0)) == [
+        "First sentence is complete. The second one continues on the next page."]
+
+def test_a_sentence_over_the_budget_is_split_on_words():
+    chunks = chunk_text("word " * 200, chunk_size=50, overlap=0)
+    assert len(chunks) > 1 and all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+
+def test_long_paper_is_summarized_map_reduce_in_the_batch_path(monkeypatch):
+    dispatches = []
+
+    def fake_call(prompts, dispatch=None):
+        dispatches.append(prompts)
+        if "combine these section summaries" in prompts[0]:
+            return ["combined summary"] * len(prompts)
+        return [f"summary {i}" for i in range(len(prompts))]
+
+    monkeypatch.setattr(phd_student_agent, "call_groq_api", fake_call)
+    monkeypatch.setattr(PhDStudentAgent, "_input_budget", lambda self, template: 200)
+    monkeypatch.setattr(phd_student_agent, "chunk_text", lambda text: chunk_text(text, chunk_size=100, overlap=10))
+    long_paper = " ".join(SENTENCES * 2)
+    summaries = PhDStudentAgent().summarize_paper_batch([long_paper, "A short paper."], incremental=False)
+    chunks = len(chunk_text(long_paper, chunk_size=100, overlap=10))
+    assert [len(prompts) for prompts in dispatches] == [chunks + 1, 1]  # one map dispatch, then the combine
+    assert summaries == ["combined summary", f"summary {chunks}"]
@@ -0,0 +1,65 @@
+import json
+import os
+
+import pytest
+
+import corpus
+from corpus import collect_references, load_corpus_manifest, run_corpus
+
+def _project(root, write_pdf, name, references, main_lines=("Discussion", "Main paper findings.")):
+    """A project directory with mainPaper/ and subFolder/; references maps file name -> text lines."""
+    for folder in ("mainPaper", "subFolder"):
+        os.makedirs(root / name / folder, exist_ok=True)
+    write_pdf(f"{name}/mainPaper/main.pdf", [list(main_lines)])
+    for file_name, lines in references.items():
+        write_pdf(f"{name}/subFolder/{file_name}", [lines])
+    return str(root / name)
+
+def _reference(i):
+    return [f"Reference paper {i} studies institutional logics in hospitals number {i}.",
+            f"It finds that actors number {i} combine logics through sensemaking."]
+
+@pytest.fixture
+def manifest(tmp_path, write_pdf):
+    shared = _reference(0)
+    alpha = _project(tmp_path, write_pdf, "alpha", {"a1.pdf": _reference(1), "shared.pdf": shared,
+                                                    "a2.pdf": _reference(2), "empty.pdf": []})
+    beta = _project(tmp_path, write_pdf, "beta", {"b1.pdf": _reference(3), "copy_of_shared.pdf": shared,
+                                                  "b2.pdf": _reference(4)}, main_lines=())
+    path = tmp_path / "corpus.json"
+    path.write_text(json.dumps({"projects": [alpha, beta, {"name": "gamma", "main_paper": "missing",
+                                                           "references": "missing"}]}))
+    return str(path)
+
+def test_manifest_skips_projects_with_missing_folders(manifest):
+    projects = load_corpus_manifest(manifest)
+    assert [project["name"] for project in projects] == ["alpha", "beta"]
+
+def test_collect_references_counts_exact_duplicates(manifest):
+    unique, membership, files, duplicates = collect_references(load_corpus_manifest(manifest))
+    assert files == 7
+    assert duplicates == 1
+    assert len(unique) == 6
+    alpha, beta = dict(membership["alpha"]), dict(membership["beta"])
+    assert alpha["shared.pdf"] == beta["copy_of_shared.pdf"]
+
+def test_failed_project_does_not_stop_the_others(manifest, tmp_path, fake_groq):
+    output_dir = tmp_path / "corpus_run"
+    assert run_corpus(manifest, str(output_dir), incremental=False) is not None
+    summary = json.loads((output_dir / "corpus_summary.json").read_text(encoding="utf-8"))
+    assert summary["reference_files"] == 7
+    assert summary["unique_papers"] == 5
+    assert summary["duplicates_skipped"] == 1
+    assert [os.path.basename(path) for path in summary["extraction_failures"]] == ["empty.pdf"]
+    status = {project["name"]: (project["status"], project["error"]) for project in summary["projects"]}
+    assert status["alpha"] == ("ok", None)
+    assert status["beta"][0] == "failed" and status["beta"][1].startswith("main paper:")
+    assert (output_dir / "alpha" / "agent3_synthesis.txt").exists()
+    assert not (output_dir / "beta" / "agent3_synthesis.txt").exists()
+
+def test_run_fails_when_every_project_fails(manifest, tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("model unavailable")
+    monkeypatch.setattr(corpus.PostdocAgent, "review_and_refine_batch", fail)
+    monkeypatch.setattr(corpus.PhDStudentAgent, "summarize_paper_batch", lambda self, **kwargs: None)
+    assert run_corpus(manifest, str(tmp_path / "corpus_run"), incremental=False) is None
@@ -0,0 +1,31 @@
+import hashlib
+
+import pytest
+
+from utils import call_groq_api
+
+PROMPTS = [f"Summarize paper {i}" for i in range(5)]
+
+def _answers(prompts, results):
+    """True if every result is the fake server's completion for the prompt at the same position."""
+    return all(result.startswith(f"Fake completion {hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]}:")
+               for prompt, result in zip(prompts, results)) and len(prompts) == len(results)
+
+@pytest.mark.parametrize("dispatch", ["sync", "async", "batch"])
+def test_call_groq_api_dispatch_modes(fake_groq, dispatch):
+    results = call_groq_api(PROMPTS, use_cache=False, dispatch=dispatch)
+    assert _answers(PROMPTS, results)
+
+def test_single_prompt(fake_groq):
+    assert _answers(PROMPTS[:1], [call_groq_api(PROMPTS[0], use_cache=False)])
+
+def test_failed_prompts_in_a_list_are_error_strings(fake_groq):
+    fake_groq.rate_5xx = 1.0
+    results = call_groq_api(PROMPTS[:2], use_cache=False, dispatch="sync", max_retries=1)
+    assert all(result.startswith("ERROR:") for result in results)
+
+@pytest.mark.parametrize("dispatch", ["sync", "async"])
+def test_failed_lone_prompt_in_a_list_raises(fake_groq, dispatch):
+    fake_groq.rate_5xx = 1.0
+    with pytest.raises(Exception):
+        call_groq_api(PROMPTS[:1], use_cache=False, dispatch=dispatch, max_retries=1)
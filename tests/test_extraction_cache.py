@@ -0,0 +1,50 @@
+import os
+import time
+
+from extraction_cache import ExtractionCache
+
+def _cache(tmp_path, max_bytes=1 << 20):
+    return ExtractionCache(cache_dir=str(tmp_path / "cache"), max_bytes=max_bytes, extractor_version="test")
+
+def test_key_follows_content_not_path(tmp_path):
+    cache = _cache(tmp_path)
+    first, moved, edited = tmp_path / "a.pdf", tmp_path / "b.pdf", tmp_path / "c.pdf"
+    first.write_bytes(b"same bytes")
+    moved.write_bytes(b"same bytes")
+    edited.write_bytes(b"other bytes")
+    assert cache.file_key(str(first)) == cache.file_key(str(moved))
+    assert cache.file_key(str(first)) != cache.file_key(str(edited))
+    assert cache.file_key(str(first)) != cache.file_key(str(first), variant="full")
+
+def test_hit_returns_text_and_metadata(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, "extracted text", {"pages": 3})
+    assert cache.get("ab" * 32) == "extracted text"
+    assert cache.get_meta("ab" * 32) == {"pages": 3}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = _cache(tmp_path, max_bytes=3500)
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, "x" * 1000)
+        os.utime(cache._entry_path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    cache.get(keys[0])  # touched, so keys[1] is now the oldest
+    cache.put("ff" * 32, "y" * 1000)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "x" * 1000 and cache.get("ff" * 32) == "y" * 1000
+    assert cache.size_bytes() == 3000
+
+def test_put_walks_the_cache_only_when_the_estimate_crosses_the_cap(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, max_bytes=10000)
+    walks = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: walks.append(1) or entries())
+    for i in range(9):
+        cache.put(f"{i:02d}" * 32, "x" * 1000)
+    assert len(walks) == 1  # the first put of the process measures the cache
+    cache.put("aa" * 32, "x" * 1000)
+    cache.put("bb" * 32, "x" * 1000)
+    assert len(walks) == 2
+    assert cache.size_bytes() <= 9000  # evicted in one batch below the cap
@@ -0,0 +1,42 @@
+import hashlib
+import json
+
+from groq_batch import run_batch_prompts, split_into_batches
+from groq_client import get_groq_client
+
+PROMPTS = [f"Batch prompt {i}" for i in range(5)]
+
+def _digest(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+def test_split_respects_request_and_byte_limits():
+    assert [indices for indices, _ in split_into_batches(PROMPTS, max_requests=2)] == [[0, 1], [2, 3], [4]]
+    line = len(next(split_into_batches(PROMPTS[:1]))[1][0])
+    parts = list(split_into_batches(PROMPTS, max_bytes=line * 3))
+    assert [indices for indices, _ in parts] == [[0, 1, 2], [3, 4]]
+    assert [json.loads(line)["custom_id"] for line in parts[1][1]] == ["req-3", "req-4"]
+
+def test_split_jobs_are_merged_back_in_prompt_order(fake_groq):
+    results = run_batch_prompts(get_groq_client(), PROMPTS, max_requests=2)
+    assert [_digest(prompt) in result for prompt, result in zip(PROMPTS, results)] == [True] * len(PROMPTS)
+
+class _FailingPart:
+    """Groq client whose upload of one batch part fails."""
+
+    def __init__(self, client, part):
+        self._client, self._part = client, part
+        self.batches = client.batches
+        self.files = self
+
+    def create(self, file, purpose):
+        if file[0].endswith(f"_{self._part}.jsonl"):
+            raise RuntimeError("upload refused")
+        return self._client.files.create(file=file, purpose=purpose)
+
+    def content(self, file_id):
+        return self._client.files.content(file_id)
+
+def test_a_failed_part_keeps_the_other_parts_results(fake_groq):
+    results = run_batch_prompts(_FailingPart(get_groq_client(), 1), PROMPTS, max_requests=2)
+    assert [result.startswith("ERROR:") for result in results] == [False, False, True, True, False]
+    assert "upload refused" in results[2]
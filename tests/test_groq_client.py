@@ -0,0 +1,28 @@
+import threading
+
+import pytest
+
+from groq_client import get_async_groq_client, get_groq_client
+from utils import run_async
+
+def test_threads_share_one_sync_client():
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(get_groq_client())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in clients}) == 1
+
+def test_run_async_reuses_the_background_loop_client():
+    async def client():
+        return get_async_groq_client()
+    assert run_async(client()) is run_async(client())
+
+def test_run_async_refuses_to_block_its_own_loop():
+    async def nested():
+        async def inner():
+            return 1
+        return run_async(inner())
+    with pytest.raises(RuntimeError):
+        run_async(nested())
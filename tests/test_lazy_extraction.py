@@ -0,0 +1,66 @@
+import pytest
+
+import utils
+from utils import (configure_extraction, extract_document, extract_texts_parallel, extraction_settings,
+                   file_content_hash, kept_references)
+
+@pytest.fixture
+def paper(write_pdf):
+    body = [[f"Body page {page} line {line} on institutional theory." for line in range(8)] for page in range(4)]
+    return write_pdf("paper.pdf", body + [["References", "Smith J 2020 Legitimacy."], ["Appendix A", "Extra tables."]])
+
+@pytest.fixture
+def extraction_defaults():
+    """Restore the process-wide extraction settings a test changes."""
+    saved = dict(utils._extraction_settings)
+    yield
+    utils._extraction_settings.update(saved)
+
+SETTINGS = {"stop_at_references": True, "skip_appendix": False, "keep_references": False}
+
+def test_extraction_stops_at_references(paper):
+    document = extract_document(paper, use_cache=False, settings=SETTINGS)
+    assert "Body page 3" in document["text"]
+    assert "Smith J" not in document["text"] and "Extra tables" not in document["text"]
+    assert (document["pages"], document["pages_skipped"]) == (6, 2)
+    assert document["pages_parsed"] < document["pages"]
+
+def test_full_text_and_kept_references(paper):
+    full = extract_document(paper, use_cache=False, settings=dict(SETTINGS, stop_at_references=False))
+    assert "Smith J" in full["text"] and full["pages_skipped"] == 0
+    kept = extract_document(paper, use_cache=False, settings=dict(SETTINGS, keep_references=True))
+    assert "Smith J" in kept["references"] and "Smith J" not in kept["text"]
+
+def test_only_reference_papers_stop_at_references_by_default(paper):
+    assert "Smith J" in extract_document(paper, use_cache=False)["text"]
+    main, = extract_texts_parallel([paper], workers=1, use_cache=False)
+    reference, = extract_texts_parallel([paper], workers=1, use_cache=False, reference_papers=True)
+    assert "Extra tables" in main
+    assert "Body page 3" in reference and "Smith J" not in reference
+
+def test_full_text_reads_reference_papers_in_full(paper, extraction_defaults):
+    configure_extraction(full_text=True)
+    assert extraction_settings(reference_papers=True)["stop_at_references"] is False
+    reference, = extract_texts_parallel([paper], workers=1, use_cache=False, reference_papers=True)
+    assert "Smith J" in reference
+
+def test_appendix_prose_does_not_end_the_body(write_pdf):
+    body = [[f"Body page {page} on institutional theory." for _ in range(4)] for page in range(3)]
+    path = write_pdf("prose.pdf", body + [["Appendix B reports the robustness checks.", "More findings."],
+                                          ["Appendix B", "Robustness tables."]])
+    document = extract_document(path, use_cache=False, settings=dict(SETTINGS, skip_appendix=True))
+    assert "More findings" in document["text"]
+    assert "Robustness tables" not in document["text"]
+
+def test_cached_extraction_keeps_page_statistics(paper):
+    first = extract_document(paper, settings=SETTINGS)
+    again = extract_document(paper, settings=SETTINGS)
+    assert again == first
+
+def test_parallel_extraction_keeps_reference_lists(paper, write_pdf, extraction_defaults):
+    other = write_pdf("other.pdf", [["Body without references."]])
+    configure_extraction(keep_references=True)
+    texts = extract_texts_parallel([paper, other], workers=2, use_cache=False, reference_papers=True)
+    assert "Smith J" not in texts[0]
+    assert "Smith J" in kept_references(file_content_hash(paper))
+    assert kept_references(file_content_hash(other)) == ""
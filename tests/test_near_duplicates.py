@@ -0,0 +1,54 @@
+import random
+
+from near_duplicates import NearDuplicateIndex, dedupe_papers
+
+WORDS = ("institutional legitimacy theory firms adopt practices network ties resource dependence "
+         "organizational field isomorphism stakeholder pressure strategic response market entry").split()
+
+def _paper(seed, length=1500):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randrange(50)) for _ in range(length))
+
+def _revise(text, fraction, seed):
+    """Replace a fraction of the words, like a preprint turning into the published version."""
+    rng = random.Random(seed)
+    words = text.split()
+    for i in rng.sample(range(len(words)), int(len(words) * fraction)):
+        words[i] = "revised" + str(i)
+    return " ".join(words)
+
+def test_near_duplicate_is_matched_to_kept_paper():
+    index = NearDuplicateIndex(threshold=0.7)
+    original = _paper(1)
+    assert index.add("original", original) is None
+    assert index.add("other", _paper(2)) is None
+    kept, similarity = index.add("preprint", _revise(original, 0.02, seed=3))
+    assert kept == "original" and similarity >= 0.7
+    assert index.duplicate_clusters() == [("original", [("preprint", similarity)])]
+
+def test_dedupe_papers_modes():
+    original = _paper(4)
+    papers = {"texts": [original, _paper(5), _revise(original, 0.02, seed=6)],
+              "titles": ["a.pdf", "b.pdf", "a_preprint.pdf"], "hashes": ["h1", "h2", "h3"]}
+    skipped, duplicate_of = dedupe_papers(papers, mode="skip")
+    assert duplicate_of == {2: 0} and skipped["hashes"] == ["h1", "h2"]
+    merged, _ = dedupe_papers(papers, mode="merge")
+    assert merged["titles"][0] == "a.pdf (also: a_preprint.pdf)"
+    reported, duplicate_of = dedupe_papers(papers, mode="report")
+    assert reported is papers and duplicate_of == {2: 0}
+
+def test_non_ascii_papers_are_compared_by_their_words():
+    rng = random.Random(7)
+    vocabulary = "合法性 制度 理论 企业 网络 资源 依赖 组织 场域 利益 相关者 压力 战略 市场 进入".split()
+    first = " ".join(rng.choice(vocabulary) + str(rng.randrange(50)) for _ in range(1500))
+    second = " ".join(rng.choice(vocabulary) + str(rng.randrange(50)) for _ in range(1500))
+    index = NearDuplicateIndex(threshold=0.7)
+    assert index.add("first", first) is None
+    assert index.add("second", second) is None
+    assert index.add("copy", _revise(first, 0.02, seed=8))[0] == "first"
+
+def test_texts_without_words_are_never_duplicates():
+    index = NearDuplicateIndex(threshold=0.7)
+    assert index.add("scan1", "   ...  ") is None
+    assert index.add("scan2", "—— ¶ ——") is None
+    assert index.duplicate_clusters() == []
@@ -0,0 +1,17 @@
+from utils import extract_texts_parallel, iter_extracted_texts
+
+def _papers(write_pdf, count):
+    return [write_pdf(f"paper{i}.pdf", [[f"Paper {i} studies legitimacy."]]) for i in range(count)]
+
+def test_parallel_texts_keep_the_input_order(write_pdf):
+    paths = _papers(write_pdf, 5)
+    texts = extract_texts_parallel(paths, workers=3, use_cache=False)
+    assert [f"Paper {i} studies" in text for i, text in enumerate(texts)] == [True] * 5
+    assert extract_texts_parallel(paths, workers=1, use_cache=False) == texts
+
+def test_a_broken_file_yields_empty_text(write_pdf, tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    paths = _papers(write_pdf, 2) + [str(broken)]
+    results = {i: text for i, _, text in iter_extracted_texts(paths, workers=2, use_cache=False, max_pending=1)}
+    assert results[2] == "" and "Paper 1 studies" in results[1]
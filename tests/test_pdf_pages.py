@@ -0,0 +1,14 @@
+import pytest
+
+from utils import iter_document_text, iter_pdf_pages
+
+def test_pages_are_yielded_one_at_a_time(write_pdf):
+    pages = iter_pdf_pages(write_pdf("paper.pdf", [["First page."], ["Second page."], ["Third page."]]))
+    assert "First page." in next(pages)
+    assert ["Second page." in text for text in pages] == [True, False]
+
+def test_unsupported_documents_are_rejected(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("plain text")
+    with pytest.raises(ValueError):
+        iter_document_text(str(path))
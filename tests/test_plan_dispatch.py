@@ -0,0 +1,21 @@
+from rate_limiter import reset_rate_limiter
+from utils import plan_dispatch
+
+def _plan(prompt_count, latency_target, **limiter):
+    reset_rate_limiter(rpm=100000, tpm=10 ** 9, **limiter)
+    try:
+        return plan_dispatch(["Summarize this paper."] * prompt_count, latency_target=latency_target)
+    finally:
+        reset_rate_limiter()
+
+def test_small_lists_are_sent_sequentially():
+    assert _plan(2, 300)[0] == "sync"
+
+def test_estimate_uses_the_current_concurrency_not_the_ceiling():
+    # 40 prompts at 4 in flight take 10 rounds of ~20s; at the ceiling of 64 they would take one
+    mode, reason = _plan(40, 100, initial_concurrency=4, max_concurrency=64)
+    assert mode == "batch" and "with 4 in flight" in reason
+    assert _plan(40, 100, initial_concurrency=64, max_concurrency=64)[0] == "async"
+
+def test_workloads_that_fit_the_latency_target_go_async():
+    assert _plan(8, 300, initial_concurrency=4)[0] == "async"
@@ -0,0 +1,43 @@
+import pytest
+
+from rate_limiter import AdaptiveRateLimiter, get_rate_limiter, parse_reset_duration, reset_rate_limiter
+from utils import call_groq_api
+
+def test_reset_durations():
+    assert parse_reset_duration("2m59.5s") == pytest.approx(179.5)
+    assert parse_reset_duration("250ms") == pytest.approx(0.25)
+    assert parse_reset_duration("7") == 7.0
+    assert parse_reset_duration("soon") is None
+
+def test_successes_grow_concurrency_additively_and_429s_halve_it():
+    limiter = AdaptiveRateLimiter(rpm=1000, tpm=10 ** 6, initial_concurrency=4, max_concurrency=5)
+    limiter.acquire(10)
+    limiter.release("success", estimated_tokens=10)
+    assert limiter.concurrency_limit == 4.25  # +1/limit per success
+    for _ in range(20):
+        limiter.acquire(10)
+        limiter.release("success", estimated_tokens=10)
+    assert limiter.concurrency_limit == 5.0  # capped at max_concurrency
+    limiter.acquire(10)
+    limiter.release("throttled", retry_after=30)
+    assert (limiter.concurrency_limit, limiter.throttled) == (2.5, 1)
+    assert limiter.requests.reserve(1) > 29  # both buckets pause for the retry-after
+
+def test_headers_resync_the_buckets():
+    limiter = AdaptiveRateLimiter(rpm=1000, tpm=10 ** 6)
+    limiter.update_from_headers({
+        "x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "6s",
+    })
+    assert limiter.requests.capacity == 100
+    assert limiter.requests.reserve(1) == pytest.approx(0.06, rel=0.1)
+
+def test_throttled_calls_are_retried_and_back_off(fake_groq):
+    fake_groq.rate_429, fake_groq.retry_after = 0.5, 0.01
+    reset_rate_limiter()
+    try:
+        results = call_groq_api([f"Throttled prompt {i}" for i in range(12)], use_cache=False, dispatch="async")
+        assert not any(result.startswith("ERROR:") for result in results)
+        assert get_rate_limiter().throttled > 0
+    finally:
+        reset_rate_limiter()
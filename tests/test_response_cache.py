@@ -0,0 +1,41 @@
+import response_cache
+from response_cache import ResponseCache
+from utils import call_groq_api
+
+def _cache(tmp_path, **settings):
+    return ResponseCache(db_path=str(tmp_path / "responses.sqlite3"), **settings)
+
+def test_key_covers_model_and_sampling_settings(tmp_path):
+    cache = _cache(tmp_path, ttl_seconds=0, max_bytes=1 << 20)
+    cache.put("m", "prompt", 0.3, 100, "answer")
+    assert cache.get("m", "prompt", 0.3, 100) == "answer"
+    assert cache.get("m", "prompt", 0.7, 100) is None
+    assert cache.get("other", "prompt", 0.3, 100) is None
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, ttl_seconds=60, max_bytes=1 << 20)
+    now = 1000.0
+    monkeypatch.setattr(response_cache.time, "time", lambda: now)
+    cache.put("m", "prompt", 0.3, 100, "answer")
+    now += 59
+    assert cache.get("m", "prompt", 0.3, 100) == "answer"
+    now += 2
+    assert cache.get("m", "prompt", 0.3, 100) is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_rows_are_evicted(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, ttl_seconds=0, max_bytes=250)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(response_cache.time, "time", lambda: next(clock))
+    for prompt in ("a", "b"):
+        cache.put("m", prompt, 0.3, 100, "x" * 100)
+    cache.get("m", "a", 0.3, 100)
+    cache.put("m", "c", 0.3, 100, "x" * 100)
+    assert [cache.get("m", prompt, 0.3, 100) is not None for prompt in "abc"] == [True, False, True]
+
+def test_repeated_call_is_served_from_the_cache(fake_groq):
+    prompt = "Summarize the cached paper"
+    first = call_groq_api(prompt)
+    requests = fake_groq.stats["requests"]
+    assert call_groq_api(prompt) == first
+    assert fake_groq.stats["requests"] == requests
@@ -0,0 +1,51 @@
+from sections import SECTION_TYPES, SectionIndex, get_section_index
+
+PAPER = (
+    "A Study of Organizations\n"
+    "Abstract\nWe study firms.\n"
+    "1. Introduction\nFirms matter.\n"
+    "2. Methods\nWe interviewed managers.\n"
+    "3. Results\nManagers talk.\n"
+    "4. Discussion\nThis matters for theory.\n"
+    "References are listed in the order they are cited.\n"
+    "References\nSmith, J. (2020). Firms. Journal.\n"
+)
+
+def test_headings_are_found_in_order():
+    index = SectionIndex(PAPER)
+    types = [section_type for _, section_type, _ in index.headings]
+    assert types == ["abstract", "introduction", "methods", "results", "discussion", "references"]
+    assert all(PAPER[offset:].startswith(line) for offset, _, line in index.headings)
+    assert {name for name, _ in SECTION_TYPES} >= set(types)
+
+def test_references_heading_needs_its_own_line():
+    index = SectionIndex(PAPER)
+    assert PAPER[index.references_start:].startswith("References\nSmith")
+    assert "Smith" not in index.body()
+
+def test_section_slices_up_to_the_references():
+    index = SectionIndex(PAPER)
+    assert index.section("discussion") == (
+        "4. Discussion\nThis matters for theory.\nReferences are listed in the order they are cited."
+    )
+    assert index.section("methods", until=("results",)) == "2. Methods\nWe interviewed managers."
+    assert index.span("limitations") is None
+    assert index.section("limitations") == ""
+
+def test_discussion_falls_back_to_the_tail_of_the_body():
+    index = SectionIndex(PAPER)
+    assert index.discussion(min_chars=10_000) == index.tail()
+    assert "Smith" not in index.tail()
+
+def test_long_lines_are_not_headings():
+    text = "Introduction " + "Word " * 30 + "\nMethods\nText"
+    assert [section_type for _, section_type, _ in SectionIndex(text).headings] == ["methods"]
+
+def test_index_is_reused_for_the_same_text():
+    assert get_section_index(PAPER) is get_section_index(PAPER)
+
+def test_prose_starting_with_a_section_word_is_not_a_heading():
+    text = "Body\nAppendix B reports the robustness checks.\nData were collected in 2020.\nAppendix B\nTables"
+    assert [line for _, _, line in SectionIndex(text).headings] == ["Appendix B"]
+    labelled = "Body\nAppendix A: Survey items\nResults and Discussion\nText"
+    assert [section_type for _, section_type, _ in SectionIndex(labelled).headings] == ["appendix", "results"]
@@ -0,0 +1,34 @@
+import os
+
+from rate_limiter import SharedRateState, SharedTokenBucket
+
+def _bucket(path, capacity=10):
+    return SharedTokenBucket(SharedRateState(str(path)), "requests", capacity, 1.0)
+
+def test_runs_draw_from_one_budget(tmp_path):
+    path = tmp_path / "state" / "rate.json"
+    first, second = _bucket(path), _bucket(path)
+    assert first.reserve(10) == 0
+    assert second.reserve(1) > 0.5  # the first run used the whole machine-wide budget
+    shares = first.shared.process_shares()
+    assert shares[os.getpid()]["requests"] == 11
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+def test_unusable_state_file_falls_back_to_local_limits(tmp_path, capsys):
+    blocker = tmp_path / "not_a_directory"
+    blocker.write_text("")
+    bucket = _bucket(blocker / "rate.json")
+    assert bucket.reserve(10) == 0
+    assert bucket.reserve(1) > 0.5  # paced by the in-process bucket
+    assert not bucket.shared.available
+    assert bucket.shared.process_shares() == {}
+    assert capsys.readouterr().out.count("falling back") == 1  # warned once
+
+def test_symlinked_state_file_is_not_followed(tmp_path):
+    target = tmp_path / "elsewhere.json"
+    target.write_text("{}")
+    link = tmp_path / "rate.json"
+    link.symlink_to(target)
+    bucket = _bucket(link)
+    bucket.reserve(1)
+    assert target.read_text() == "{}" and not bucket.shared.available
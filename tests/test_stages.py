@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from pipeline import Stage, StageError, critical_path, load_main_paper, run_stages
+
+def test_independent_stages_overlap_and_artifacts_flow_downstream():
+    def slow(value):
+        def run(inputs):
+            time.sleep(0.1)
+            return value
+        return run
+
+    stages = [
+        Stage("references", slow(2)),
+        Stage("main", slow(3)),
+        Stage("report", lambda inputs: inputs["references"] * inputs["main"], ["references", "main"]),
+    ]
+    started = time.perf_counter()
+    artifacts, timings = run_stages(stages)
+    assert artifacts["report"] == 6
+    assert time.perf_counter() - started < 0.19  # references and main ran concurrently
+    assert timings["report"][0] >= max(timings["references"][1], timings["main"][1])
+
+def test_critical_path_follows_the_dependency_that_finished_last():
+    stages = [Stage("a", None), Stage("b", None), Stage("c", None, ["a", "b"]), Stage("d", None, ["a"])]
+    timings = {"a": (0, 1), "b": (0, 3), "c": (3, 5), "d": (1, 2)}
+    assert critical_path(stages, timings) == ["b", "c"]
+
+def test_a_failed_stage_stops_its_dependents():
+    ran = []
+
+    def fail(inputs):
+        raise ValueError("no papers")
+
+    stages = [Stage("agent1", fail), Stage("agent2", lambda inputs: ran.append("agent2"), ["agent1"])]
+    with pytest.raises(StageError) as raised:
+        run_stages(stages)
+    assert raised.value.stage == "agent1" and isinstance(raised.value.error, ValueError)
+    assert ran == [] and "agent1" in raised.value.timings
+
+def test_graph_errors_are_reported():
+    with pytest.raises(ValueError):
+        run_stages([Stage("a", lambda inputs: 1, ["missing"])])
+    with pytest.raises(ValueError):
+        run_stages([Stage("a", lambda inputs: 1, ["b"]), Stage("b", lambda inputs: 1, ["a"])])
+
+def test_main_paper_without_text_fails_the_stage(tmp_path, write_pdf):
+    write_pdf("main.pdf", [[]])
+    with pytest.raises(RuntimeError):
+        load_main_paper(str(tmp_path))
@@ -0,0 +1,26 @@
+from artifacts import iter_jsonl
+from phd_student_agent import PhDStudentAgent
+
+def _papers(write_pdf, count):
+    return [write_pdf(f"stream{i}.pdf", [[f"Streamed paper {i} on institutional logics."]]) for i in range(count)]
+
+def test_stream_summarizes_and_writes_each_paper(write_pdf, tmp_path, fake_groq):
+    save_path = str(tmp_path / "agent1.txt")
+    records = PhDStudentAgent().summarize_paper_stream(_papers(write_pdf, 4), save_path=save_path, workers=2,
+                                                       incremental=False, queue_size=1, summary_workers=2)
+    assert sorted(record["title"] for record in records) == [f"stream{i}.pdf" for i in range(4)]
+    assert all(record["summary"].startswith("Fake completion") for record in records)
+    assert len(list(iter_jsonl(tmp_path / "agent1.jsonl"))) == 4
+    assert open(save_path, encoding="utf-8").read().count("## stream") == 4
+
+def test_a_failed_paper_is_left_out(write_pdf, tmp_path, monkeypatch):
+    def summarize(self, texts, titles, dispatch=None):
+        if titles[0] == "stream1.pdf":
+            raise RuntimeError("model unavailable")
+        return ["summary"], [{"calls": 1, "prompt_tokens": 1, "completion_tokens": 1}]
+
+    monkeypatch.setattr(PhDStudentAgent, "_summarize_texts", summarize)
+    records = PhDStudentAgent().summarize_paper_stream(_papers(write_pdf, 3), save_path=str(tmp_path / "out.txt"),
+                                                       workers=1, incremental=False)
+    assert sorted(record["title"] for record in records) == ["stream0.pdf", "stream2.pdf"]
+    assert len(list(iter_jsonl(tmp_path / "out.jsonl"))) == 2
@@ -0,0 +1,32 @@
+from utils import call_groq_api_stream, call_groq_api_stream_many, iter_groq_stream, stream_stats
+
+def test_stream_writes_pieces_as_they_arrive(tmp_path, fake_groq):
+    output_path = tmp_path / "report.txt"
+    pieces = []
+    before = len(stream_stats())
+    text = call_groq_api_stream("Stream a report on legitimacy.", output_path=str(output_path),
+                                on_token=pieces.append, use_cache=False)
+    assert text.startswith("Fake completion")
+    assert len(pieces) > 1 and "".join(pieces) == text
+    assert output_path.read_text(encoding="utf-8") == text
+    stats = stream_stats()[before:]
+    assert len(stats) == 1
+    assert stats[0]["completion_tokens"] == 20
+    assert stats[0]["ttft_seconds"] <= stats[0]["duration_seconds"]
+
+def test_cached_stream_is_yielded_in_one_piece(fake_groq):
+    prompt = "Stream once, then serve from the cache."
+    streamed = list(iter_groq_stream(prompt))
+    assert len(streamed) > 1
+    assert list(iter_groq_stream(prompt)) == ["".join(streamed)]
+
+def test_stream_many_keeps_prompt_order(tmp_path, fake_groq):
+    prompts = [f"Stream report {i} on sensemaking." for i in range(4)]
+    paths = [str(tmp_path / f"report{i}.txt") for i in range(4)]
+    pieces = {}
+    texts = call_groq_api_stream_many(prompts, output_paths=paths, concurrency=2, use_cache=False,
+                                      on_token=lambda index, delta: pieces.setdefault(index, []).append(delta))
+    assert len(texts) == 4 and len(set(texts)) == 4
+    for index, text in enumerate(texts):
+        assert "".join(pieces[index]) == text
+        assert open(paths[index], encoding="utf-8").read() == text
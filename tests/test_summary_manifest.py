@@ -0,0 +1,49 @@
+import phd_student_agent
+import summary_manifest
+import utils
+from phd_student_agent import PhDStudentAgent
+from summary_manifest import SummaryManifest, summary_prompt_version
+from utils import configure_extraction
+
+def test_entries_are_reused_only_for_the_same_model_and_prompt_version(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = SummaryManifest(path, model="m1", prompt_version="v1")
+    manifest.put("hash", "paper.pdf", "summary", calls=2)
+    manifest.save()
+    assert SummaryManifest(path, model="m1", prompt_version="v1").get("hash")["calls"] == 2
+    assert SummaryManifest(path, model="m2", prompt_version="v1").get("hash") is None
+    assert SummaryManifest(path, model="m1", prompt_version="v2").get("hash") is None
+
+def test_concurrent_saves_merge(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    first = SummaryManifest(path, model="m", prompt_version="v")
+    second = SummaryManifest(path, model="m", prompt_version="v")
+    first.put("a", "a.pdf", "summary a")
+    second.put("b", "b.pdf", "summary b")
+    first.save()
+    second.save()
+    assert sorted(SummaryManifest(path, model="m", prompt_version="v").entries) == ["a", "b"]
+
+def test_prompt_version_covers_reference_paper_extraction(monkeypatch):
+    monkeypatch.setattr(utils, "_extraction_settings", dict(utils._extraction_settings))
+    default = summary_prompt_version()
+    configure_extraction(stop_at_references=True)
+    assert summary_prompt_version() == default  # reference papers stop at their References anyway
+    configure_extraction(full_text=True)
+    assert summary_prompt_version() != default
+
+def test_agent1_only_summarizes_new_papers(tmp_path, monkeypatch):
+    monkeypatch.setattr(summary_manifest, "_summary_manifest", SummaryManifest(str(tmp_path / "manifest.json")))
+    sent = []
+
+    def fake_call(prompts, dispatch=None):
+        sent.extend(prompts)
+        return [f"summary {len(sent) - len(prompts) + i}" for i in range(len(prompts))]
+
+    monkeypatch.setattr(phd_student_agent, "call_groq_api", fake_call)
+    agent = PhDStudentAgent()
+    first = agent.summarize_paper_batch(["Paper one text.", "Paper two text."], file_hashes=["h1", "h2"])
+    assert len(sent) == 2
+    again = agent.summarize_paper_batch(["Paper one text.", "Paper two text.", "Paper three."],
+                                        file_hashes=["h1", "h2", "h3"])
+    assert len(sent) == 3 and again == first + ["summary 2"]
@@ -0,0 +1,50 @@
+import json
+import os
+
+from telemetry import Telemetry, get_telemetry, prune_runs
+from utils import call_groq_api
+
+def test_calls_are_attributed_to_their_stage():
+    telemetry = Telemetry()
+    with telemetry.span("agent1"):
+        telemetry.record_call("sync", 0, 0.2, queue_wait=0.1, status=200, prompt_tokens=10, completion_tokens=5)
+        telemetry.record_call("sync", 0, 0.3, attempt=2, status=429, error="rate limited")
+    summary = telemetry.summary()
+    assert summary["stages"]["agent1"]["calls"] == 2
+    assert summary["totals"]["retries"] == 1
+    assert summary["totals"]["errors"] == 1
+    assert summary["totals"]["prompt_tokens"] == 10
+    spans = telemetry.otlp_json()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    stage = next(span for span in spans if span["name"] == "agent1")
+    assert all(span["parentSpanId"] == stage["spanId"] for span in spans if span["name"].startswith("groq."))
+
+def test_prometheus_text_escapes_label_values():
+    telemetry = Telemetry()
+    with telemetry.span('stage "a"\\b\nc'):
+        pass
+    text = telemetry.prometheus_text()
+    assert 'autoscholar_stage_duration_seconds{stage="stage \\"a\\"\\\\b\\nc"}' in text
+    assert all(line.startswith(("#", "autoscholar_")) for line in text.splitlines())
+
+def test_export_writes_reports_and_prunes_old_runs(tmp_path):
+    for run_id in ("20240101_000000_aaaaaa", "20240102_000000_bbbbbb"):
+        for suffix in (".json", ".prom"):
+            (tmp_path / f"run_{run_id}{suffix}").write_text("{}")
+    telemetry = Telemetry()
+    paths = telemetry.export(str(tmp_path), otlp=True, keep_runs=2)
+    assert [os.path.basename(path) for path in paths] == [
+        f"run_{telemetry.run_id}.json", f"run_{telemetry.run_id}.prom", f"run_{telemetry.run_id}.otlp.json"]
+    assert json.loads(open(paths[0], encoding="utf-8").read())["run_id"] == telemetry.run_id
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ["run_20240102_000000_bbbbbb.json", "run_20240102_000000_bbbbbb.prom"] + [os.path.basename(p) for p in paths])
+    prune_runs(str(tmp_path), 1)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in paths)
+
+def test_api_calls_are_recorded(fake_groq):
+    telemetry = get_telemetry()
+    before = len(telemetry.calls)
+    with telemetry.span("telemetry-test"):
+        call_groq_api(["Record this call in telemetry."])
+    calls = telemetry.calls[before:]
+    assert calls and calls[-1]["stage"] == "telemetry-test"
+    assert calls[-1]["status"] == 200 and calls[-1]["completion_tokens"] == 20
@@ -0,0 +1,52 @@
+import numpy as np
+
+from theme_clusters import ThemeVectorCache, cluster_themes, extract_constructs
+
+def _summary(*constructs):
+    lines = ["1. Research question: how?", "2. Core theoretical constructs:"]
+    lines += [f"- {name}: {note}" for name, note in constructs]
+    lines.append("3. Method: case study")
+    return "\n".join(lines)
+
+SUMMARIES = [
+    _summary(("Institutional logics", "competing field-level logics"), ("Resource dependence", "power from resources")),
+    _summary(("Institutional logic", "logics shape practice"), ("Sensemaking", "how actors interpret events")),
+    _summary(("Institutional logics", ""), ("Resource dependence theory", "")),
+]
+
+def test_extract_constructs_splits_names_and_notes():
+    constructs = extract_constructs(SUMMARIES[0])
+    assert ("Institutional logics", "competing field-level logics") in constructs
+    assert ("Resource dependence", "power from resources") in constructs
+
+def test_similar_constructs_share_a_theme(tmp_path):
+    cache = ThemeVectorCache(path=str(tmp_path / "vectors.npz"))
+    themes = cluster_themes(SUMMARIES, cache=cache)
+    assert themes[0]["theme"] == "Institutional logics"
+    assert themes[0]["also_called"] == ["Institutional logic"]
+    assert themes[0]["papers"] == [1, 2, 3]
+    assert themes[0]["note"] == "competing field-level logics"
+    by_name = {theme["theme"]: theme for theme in themes}
+    assert by_name["Sensemaking"]["papers"] == [2]
+    assert by_name["Resource dependence"]["papers"] == [1, 3]
+    assert len(themes) == 3
+
+def test_threshold_zero_puts_everything_in_one_theme(tmp_path):
+    themes = cluster_themes(SUMMARIES, threshold=0, cache=ThemeVectorCache(path=str(tmp_path / "v.npz")))
+    assert len(themes) == 1
+    assert themes[0]["papers"] == [1, 2, 3]
+
+def test_cache_round_trip_gives_the_same_themes(tmp_path):
+    path = str(tmp_path / "vectors.npz")
+    first = cluster_themes(SUMMARIES, cache=ThemeVectorCache(path=path))
+    reloaded = ThemeVectorCache(path=path)
+    assert len(reloaded.entries) == len(SUMMARIES)
+    phrases, notes, terms, indices, counts, indptr = reloaded.get(SUMMARIES[0])
+    assert reloaded.hits == 1
+    assert terms == ["institutional logic", "resource dependence"]
+    assert indices.dtype == np.int32 and indptr[-1] == len(indices) == len(counts)
+    assert cluster_themes(SUMMARIES, cache=reloaded) == first
+    assert reloaded.misses == 0
+
+def test_empty_summaries_have_no_themes(tmp_path):
+    assert cluster_themes(["no constructs here"], cache=ThemeVectorCache(path=str(tmp_path / "v.npz"))) == []
@@ -0,0 +1,41 @@
+import json
+import re
+
+import postdoc_agent
+from postdoc_agent import PostdocAgent
+
+def test_tree_reduce_keeps_exact_paper_counts(monkeypatch):
+    """Each group reports the theme for its own papers; merges must union them, never lose any."""
+    monkeypatch.setattr(postdoc_agent, "POSTDOC_GROUP_SIZE", 2)
+    monkeypatch.setattr(postdoc_agent, "POSTDOC_MERGE_FANIN", 2)
+    prompts_seen = []
+
+    def fake_call(prompts):
+        prompts_seen.append(prompts)
+        results = []
+        for prompt in prompts:
+            if "ONE GROUP of paper summaries" in prompt:
+                numbers = sorted(set(int(n) for n in re.findall(r"Paper (\d+):", prompt)))
+                results.append(json.dumps([{"theme": "Legitimacy", "papers": numbers}]))
+            elif "merging partial theme maps" in prompt:
+                # A merge that forgets every paper list: _reconcile must restore them
+                results.append(json.dumps([{"theme": "legitimacy", "papers": []}]))
+            else:
+                results.append("final report")
+        return results
+
+    monkeypatch.setattr(postdoc_agent, "call_groq_api", fake_call)
+    entries = [f"Paper {i}: p{i}.pdf\nsummary {i}" for i in range(1, 8)]
+    analysis, usage, themes = PostdocAgent()._tree_reduce(entries)
+    assert analysis == "final report"
+    assert themes[0]["papers"] == list(range(1, 8))
+    assert usage["calls"] == sum(len(prompts) for prompts in prompts_seen)
+
+def test_tree_reduce_stops_on_failed_call(monkeypatch):
+    monkeypatch.setattr(postdoc_agent, "call_groq_api", lambda prompts: ["ERROR: boom"] * len(prompts))
+    try:
+        PostdocAgent()._tree_reduce([f"Paper {i}: p\nsummary" for i in range(1, 4)])
+    except RuntimeError as e:
+        assert "boom" in str(e)
+    else:
+        raise AssertionError("an ERROR result must not be passed on to the next level")
@@ -0,0 +1,399 @@
+import functools
+import hashlib
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+from config import (
+    THEME_VECTOR_DIM,
+    THEME_SIMILARITY_THRESHOLD,
+    THEME_VECTOR_CACHE_PATH,
+    THEME_VECTOR_CACHE_MAX_ROWS,
+)
+
+CONSTRUCT_EXTRACTOR_VERSION = "1"  # Bump whenever construct extraction or feature hashing changes
+_LEADER_BLOCK = 512  # Leaders whose candidate rows are looked up together
+
+_SECTION_HEADING = re.compile(r"^\W*(?:\d+[.)]|#+)?\s*\**\s*([A-Za-z][^:\n]{0,80})", re.MULTILINE)
+_THEORY_SECTION = re.compile(r"theor|construct|framework|lens|concept", re.IGNORECASE)
+_NAMED_THEORY = re.compile(
+    r"\b((?:[A-Za-z][\w'-]*\s+){1,4}(?:theory|theories|perspective|view|framework|lens|model|logic|paradigm))\b",
+    re.IGNORECASE,
+)
+_NUMBERED_ITEM = re.compile(r"^\W*\d+[.)]\s")
+_DEFINITION_SEPARATOR = re.compile(r":|\s[-–—]\s")
+_WORD = re.compile(r"[a-z][a-z'-]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it its of on or that the their this to with "
+    "using used use based paper study authors article".split()
+)
+
+@functools.lru_cache(maxsize=1 << 16)
+def _stem(word):
+    """Crude plural folding so 'institutions' and 'institution' hash to the same feature."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def _terms(phrase):
+    return [_stem(word) for word in _WORD.findall(phrase.lower()) if word not in _STOPWORDS]
+
+def extract_constructs(summary):
+    """
+    Return (phrase, note) pairs naming the theoretical frameworks and constructs in an Agent 1 summary.
+    Lines of the "Theoretical frameworks" and "Core theoretical constructs" sections are split into
+    names and definitions; named theories anywhere in the summary are added as well.
+    """
+    return [(phrase, note) for phrase, note, _ in _constructs_with_terms(summary)]
+
+def _constructs_with_terms(summary):
+    """extract_constructs, with each construct's normalized terms as a third element."""
+    constructs = []
+    in_section = False
+    for line in summary.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        heading = _SECTION_HEADING.match(stripped)
+        if _NUMBERED_ITEM.match(stripped) or stripped.startswith("#") or stripped.startswith("**"):
+            in_section = bool(heading and _THEORY_SECTION.search(heading.group(1)))
+            if in_section and ":" in stripped:
+                body = stripped.split(":", 1)[1].strip(" *")
+                if body:
+                    constructs.extend((part, "") for part in re.split(r"[;,]", body))
+            continue
+        if in_section:
+            item = stripped.lstrip("-*•·> ").replace("**", "")
+            separator = _DEFINITION_SEPARATOR.search(item)
+            name, note = (item[:separator.start()], item[separator.end():]) if separator else (item, "")
+            parts = re.split(r"[;,]|\band\b", name) if len(name.split()) > 6 else [name]
+            constructs.extend((part, note.strip()) for part in parts)
+    constructs.extend((match.group(1), "") for match in _NAMED_THEORY.finditer(summary))
+
+    seen = set()
+    cleaned = []
+    for phrase, note in constructs:
+        phrase = phrase.strip(" .*()[]\"'")
+        terms = _terms(phrase)
+        key = " ".join(terms)
+        if not key or len(phrase.split()) > 8 or key in seen:
+            continue
+        seen.add(key)
+        cleaned.append((phrase, note[:200], terms))
+    return cleaned
+
+def _features(terms, dim):
+    """Hashed unigram + bigram term counts of a construct's terms as (indices, counts)."""
+    grams = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+    counts = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % dim
+        counts[index] = counts.get(index, 0) + 1
+    return list(counts), list(counts.values())
+
+def _ranges(starts, lengths):
+    """Concatenation of np.arange(start, start + length) for each start and length."""
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - ends + lengths, lengths) + np.arange(total)
+
+class ThemeVectorCache:
+    """
+    Hashed term vectors of summary constructs, keyed by summary content, persisted as one .npz file.
+    Vectors are stored sparsely (CSR layout) with each construct's normalized terms, so a cache
+    hit needs no text processing.
+    """
+
+    def __init__(self, path=THEME_VECTOR_CACHE_PATH, dim=THEME_VECTOR_DIM, max_rows=THEME_VECTOR_CACHE_MAX_ROWS):
+        self.path = path
+        self.dim = dim
+        self.max_rows = max_rows
+        self.entries = {}  # key -> (phrases, notes, terms, indices, counts, indptr)
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._load()
+
+    def key(self, summary):
+        fingerprint = f"{CONSTRUCT_EXTRACTOR_VERSION}\0{self.dim}\0{summary}"
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if int(data["dim"]) != self.dim:
+                    return
+                keys, rows = data["keys"], data["rows"]
+                phrases, notes, terms = data["phrases"], data["notes"], data["terms"]
+                indices, counts, indptr = data["indices"], data["counts"], data["indptr"]
+        except (OSError, KeyError, ValueError):
+            return
+        row = 0
+        for key, n in zip(keys.tolist(), rows.tolist()):
+            start, end = indptr[row], indptr[row + n]
+            self.entries[key] = (
+                phrases[row:row + n].tolist(),
+                notes[row:row + n].tolist(),
+                terms[row:row + n].tolist(),
+                indices[start:end],
+                counts[start:end],
+                indptr[row:row + n + 1] - start,
+            )
+            row += n
+
+    def get(self, summary):
+        """Return (phrases, notes, terms, indices, counts, indptr) for summary, computing and caching on a miss."""
+        key = self.key(summary)
+        self.used.add(key)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        constructs = _constructs_with_terms(summary)
+        indices, counts, indptr = [], [], [0]
+        for _, _, terms in constructs:
+            phrase_indices, phrase_counts = _features(terms, self.dim)
+            indices.extend(phrase_indices)
+            counts.extend(phrase_counts)
+            indptr.append(len(indices))
+        entry = (
+            [phrase for phrase, _, _ in constructs],
+            [note for _, note, _ in constructs],
+            [" ".join(terms) for _, _, terms in constructs],
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(counts, dtype=np.float32),
+            np.asarray(indptr, dtype=np.int64),
+        )
+        self.entries[key] = entry
+        self._dirty = True
+        return entry
+
+    def save(self):
+        """Write the cache, keeping entries used in this run first and dropping others beyond max_rows."""
+        if not self._dirty:
+            return
+        ordered = [key for key in self.entries if key in self.used]
+        ordered += [key for key in self.entries if key not in self.used]
+        keys, rows, phrases, notes, terms, indices, counts, indptr = [], [], [], [], [], [], [], [0]
+        total = 0
+        for key in ordered:
+            entry_phrases, entry_notes, entry_terms, entry_indices, entry_counts, entry_indptr = self.entries[key]
+            if total + len(entry_phrases) > self.max_rows and key not in self.used:
+                break
+            keys.append(key)
+            rows.append(len(entry_phrases))
+            phrases.extend(entry_phrases)
+            notes.extend(entry_notes)
+            terms.extend(entry_terms)
+            indices.append(entry_indices)
+            counts.append(entry_counts)
+            indptr.extend((entry_indptr[1:] + indptr[-1]).tolist())
+            total += len(entry_phrases)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            dim=np.int64(self.dim),
+            keys=np.asarray(keys, dtype=str),
+            rows=np.asarray(rows, dtype=np.int64),
+            phrases=np.asarray(phrases, dtype=str),
+            notes=np.asarray(notes, dtype=str),
+            terms=np.asarray(terms, dtype=str),
+            indices=np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+            counts=np.concatenate(counts) if counts else np.zeros(0, dtype=np.float32),
+            indptr=np.asarray(indptr, dtype=np.int64),
+        )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+def _leader_clusters(order, row_starts, features, weights, dim, threshold):
+    """
+    Leader clustering of L2-normalized sparse rows: each row, in order, that has no theme yet
+    leads a new one and takes every row without a theme whose cosine similarity to it is at least
+    threshold. Returns the leader of every row.
+
+    Candidates come from an inverted index of the features, a block of leaders at a time. A leader's
+    features whose combined contribution cannot reach the threshold (given the largest weight each
+    feature has in any row) cannot admit a row on their own, so their long postings are not scanned.
+    """
+    n_rows = len(row_starts) - 1
+    lengths = np.diff(row_starts)
+    assigned = np.full(n_rows, -1, dtype=np.int64)
+    if threshold <= 0:
+        assigned[:] = order[0]
+        return assigned
+    row_ids = np.repeat(np.arange(n_rows), lengths)
+    max_weight = np.zeros(dim, dtype=np.float32)
+    np.maximum.at(max_weight, features, weights)
+    by_feature = np.argsort(features, kind="stable")
+    posting_rows, posting_features = row_ids[by_feature], features[by_feature]
+
+    for start in range(0, n_rows, _LEADER_BLOCK):
+        leaders = order[start:start + _LEADER_BLOCK]
+        leaders = leaders[assigned[leaders] < 0]
+        if not len(leaders):
+            continue
+        # Drop rows that already have a theme from the postings
+        open_postings = assigned[posting_rows] < 0
+        posting_rows, posting_features = posting_rows[open_postings], posting_features[open_postings]
+        posting_starts = np.concatenate(([0], np.cumsum(np.bincount(posting_features, minlength=dim))))
+
+        # Each leader's features, ranked by the most they can add to a similarity
+        leader_lengths = lengths[leaders]
+        positions = _ranges(row_starts[leaders], leader_lengths)
+        slot = np.repeat(np.arange(len(leaders)), leader_lengths)
+        bound = weights[positions] * max_weight[features[positions]]
+        ranked = np.lexsort((bound, slot))
+        running = np.cumsum(bound[ranked])
+        group_starts = np.repeat(np.cumsum(leader_lengths) - leader_lengths, leader_lengths)
+        running -= running[group_starts] - bound[ranked][group_starts]
+        looked_up = ranked[running >= threshold - 1e-6]
+
+        # Candidate (leader, row) pairs through the postings of the looked-up features
+        lookup_features = features[positions[looked_up]]
+        posting_lengths = posting_starts[lookup_features + 1] - posting_starts[lookup_features]
+        candidates = posting_rows[_ranges(posting_starts[lookup_features], posting_lengths)]
+        pairs = np.unique(np.repeat(slot[looked_up], posting_lengths) * n_rows + candidates)
+        pair_slots, pair_rows = pairs // n_rows, pairs % n_rows
+
+        # Exact similarity of each pair against a dense block of the leaders' vectors
+        dense = np.zeros((len(leaders), dim), dtype=np.float32)
+        dense[slot, features[positions]] = weights[positions]
+        pair_lengths = lengths[pair_rows]
+        pair_positions = _ranges(row_starts[pair_rows], pair_lengths)
+        products = dense[np.repeat(pair_slots, pair_lengths), features[pair_positions]] * weights[pair_positions]
+        similarity = np.bincount(np.repeat(np.arange(len(pairs)), pair_lengths), weights=products,
+                                 minlength=len(pairs))
+        close = similarity >= threshold
+        pair_slots, pair_rows = pair_slots[close], pair_rows[close]
+        bounds = np.searchsorted(pair_slots, np.arange(len(leaders) + 1))
+
+        for position, leader in enumerate(leaders.tolist()):
+            if assigned[leader] >= 0:
+                continue
+            members = pair_rows[bounds[position]:bounds[position + 1]]
+            assigned[members[assigned[members] < 0]] = leader
+            assigned[leader] = leader
+    return assigned
+
+def cluster_themes(summaries, threshold=THEME_SIMILARITY_THRESHOLD, cache=None):
+    """
+    Cluster the theoretical constructs of many summaries and count the papers behind each theme.
+
+    Constructs are turned into TF-IDF weighted hashed term vectors; identical constructs are
+    folded together, then leader clustering by cosine similarity (most widespread construct first)
+    groups the rest. Vectors stay sparse throughout. Returns themes as dicts with theme, also_called,
+    kind (None: not judged locally), papers (1-based paper numbers) and note, sorted by paper count.
+    """
+    started = time.perf_counter()
+    cache = cache or ThemeVectorCache()
+
+    # Gather construct rows for every paper
+    phrases, notes, keys, sizes = [], [], [], []
+    indices, counts, indptr = [], [], [np.zeros(1, dtype=np.int64)]
+    base = 0
+    for summary in summaries:
+        entry_phrases, entry_notes, entry_keys, entry_indices, entry_counts, entry_indptr = cache.get(summary)
+        phrases.extend(entry_phrases)
+        notes.extend(entry_notes)
+        keys.extend(entry_keys)
+        sizes.append(len(entry_phrases))
+        indices.append(entry_indices)
+        counts.append(entry_counts)
+        indptr.append(entry_indptr[1:] + base)
+        base += len(entry_indices)
+    cache.save()
+    if not phrases:
+        return []
+    offsets = np.concatenate(indptr)
+    indices = np.concatenate(indices)
+    counts = np.concatenate(counts)
+    owners = np.repeat(np.arange(1, len(summaries) + 1), sizes)
+    occurrences = len(phrases)
+
+    # Fold identical constructs (same normalized terms) into one sparse row, numbered by first appearance
+    unique_keys = {}
+    row_of = np.fromiter((unique_keys.setdefault(key, len(unique_keys)) for key in keys), dtype=np.int64,
+                         count=occurrences)
+    n_rows = len(unique_keys)
+    first = np.unique(row_of, return_index=True)[1]
+    lengths = offsets[first + 1] - offsets[first]
+    positions = _ranges(offsets[first], lengths)
+    row_starts = np.concatenate(([0], np.cumsum(lengths)))
+    row_ids = np.repeat(np.arange(n_rows), lengths)
+    features = indices[positions]
+
+    # TF-IDF weighting and L2 normalization (a feature occurs at most once per row)
+    df = np.bincount(features, minlength=cache.dim)
+    idf = np.log((1 + n_rows) / (1 + df)).astype(np.float32) + 1
+    weights = counts[positions] * idf[features]
+    norms = np.sqrt(np.bincount(row_ids, weights=weights * weights, minlength=n_rows)).astype(np.float32)
+    weights /= np.where(norms == 0, 1, norms)[row_ids]
+
+    # Widest-spread constructs lead
+    papers_total = len(summaries) + 1
+    row_papers = np.unique(row_of * papers_total + owners)
+    spread = np.bincount(row_papers // papers_total, minlength=n_rows)
+    order = np.argsort(-spread, kind="stable")
+    assigned = _leader_clusters(order, row_starts, features, weights, cache.dim, threshold)
+
+    # Papers of each theme
+    theme_of = assigned[row_of]
+    theme_papers = np.unique(theme_of * papers_total + owners)
+    paper_themes, paper_starts = np.unique(theme_papers // papers_total, return_index=True)
+    paper_lists = np.split(theme_papers % papers_total, paper_starts[1:])
+
+    # Surface forms of each theme: most frequent first, ties in the order they were first seen
+    phrase_ids = {}
+    phrase_of = np.fromiter((phrase_ids.setdefault(phrase, len(phrase_ids)) for phrase in phrases),
+                            dtype=np.int64, count=occurrences)
+    names, name_of, name_counts = np.unique(theme_of * len(phrase_ids) + phrase_of, return_inverse=True,
+                                            return_counts=True)
+    first_seen = np.full(len(names), np.iinfo(np.int64).max)
+    np.minimum.at(first_seen, name_of, row_of * occurrences + np.arange(occurrences))
+    name_themes = names // len(phrase_ids)
+    ranked = np.lexsort((first_seen, -name_counts, name_themes))
+    name_starts = np.unique(name_themes[ranked], return_index=True)[1]
+    name_lists = np.split((names % len(phrase_ids))[ranked], name_starts[1:])
+    phrase_texts = list(phrase_ids)
+
+    # Note of each theme: its leader's, else that of its first row with one
+    noted = np.flatnonzero(np.fromiter(map(bool, notes), dtype=bool, count=occurrences))
+    noted_rows, first_noted = np.unique(row_of[noted], return_index=True)
+    row_note = np.full(n_rows, -1, dtype=np.int64)
+    row_note[noted_rows] = noted[first_noted]
+    noted_themes, first_noted_row = np.unique(assigned[noted_rows], return_index=True)
+    theme_note = dict(zip(noted_themes.tolist(), row_note[noted_rows[first_noted_row]].tolist()))
+    for leader in noted_themes[row_note[noted_themes] >= 0].tolist():
+        theme_note[leader] = row_note[leader]
+
+    # Themes in order of their first row, so equal-sized themes keep a stable order
+    first_rows = np.unique(assigned, return_index=True)[1]
+    results = []
+    for position in np.argsort(first_rows, kind="stable").tolist():
+        leader = int(paper_themes[position])
+        theme_names = [phrase_texts[name] for name in name_lists[position][:6].tolist()]
+        note = theme_note.get(leader)
+        results.append({
+            "theme": theme_names[0],
+            "also_called": theme_names[1:],
+            "kind": None,
+            "papers": paper_lists[position].tolist(),
+            "note": notes[note] if note is not None else "",
+        })
+    results.sort(key=lambda theme: (-len(theme["papers"]), theme["theme"].lower()))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"🧮 Theme pre-pass: {len(phrases)} constructs -> {len(results)} themes in {elapsed_ms:.0f} ms "
+          f"(vectors cached for {cache.hits}/{cache.hits + cache.misses} summaries)")
+    return results
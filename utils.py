@@ -1,21 +1,202 @@
+import atexit
+import mmap
 import os
+import re
+import threading
 import time
 import PyPDF2
-from groq import Groq
-from config import GROQ_API_KEY, GROQ_MODEL, MAX_RETRIES, CHUNK_SIZE
+from config import (
+    GROQ_MODEL, GROQ_TEMPERATURE, GROQ_MAX_TOKENS,
+    GROQ_MAX_CONCURRENCY, GROQ_DISPATCH, DISPATCH_LATENCY_TARGET_SECONDS,
+    SYNC_DISPATCH_MAX_PROMPTS, GROQ_EST_CALL_SECONDS, MAX_RETRIES, MAX_THROTTLE_RETRIES, CHUNK_SIZE, CHUNK_OVERLAP, EXTRACTION_WORKERS,
+    EXTRACTION_STOP_AT_REFERENCES, EXTRACTION_FULL_TEXT, EXTRACTION_SKIP_APPENDIX, EXTRACTION_KEEP_REFERENCES,
+    EXTRACTION_MIN_BODY_FRACTION,
+)
+from extraction_cache import file_content_hash, get_extraction_cache
+from response_cache import get_response_cache
+from groq_client import get_groq_client, get_async_groq_client, close_async_groq_client
+from rate_limiter import get_rate_limiter, parse_reset_duration
+from groq import RateLimitError
+from groq_batch import run_batch_prompts
+from telemetry import get_telemetry, traced
+
+def iter_pdf_pages(pdf_path):
+    """
+    Lazily yield the text of each page of a PDF file.
+    The file is read through a read-only memory map, so pages are parsed on demand
+    without loading the whole document into Python memory first.
+    """
+    with open(pdf_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            pdf_reader = PyPDF2.PdfReader(mapped)
+            for page in pdf_reader.pages:
+                yield page.extract_text() or ""
+
+def iter_word_paragraphs(word_path):
+    """Lazily yield paragraphs of a Word document (.docx or .doc)."""
+    # For .docx files
+    if word_path.lower().endswith('.docx'):
+        from docx import Document
+        doc = Document(word_path)
+        for paragraph in doc.paragraphs:
+            yield paragraph.text
+    
+    # For .doc files, we need python-docx2txt or similar
+    elif word_path.lower().endswith('.doc'):
+        import docx2txt
+        text = docx2txt.process(word_path) or ""
+        yield from text.split("\n")
+
+def iter_document_text(file_path):
+    """Lazily yield pages (PDF) or paragraphs (Word) of a document."""
+    file_ext = os.path.splitext(file_path)[1].lower()
+    
+    if file_ext == '.pdf':
+        return iter_pdf_pages(file_path)
+    elif file_ext in ['.docx', '.doc']:
+        return iter_word_paragraphs(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+_extraction_settings = {
+    "stop_at_references": EXTRACTION_STOP_AT_REFERENCES,
+    "full_text": EXTRACTION_FULL_TEXT,
+    "skip_appendix": EXTRACTION_SKIP_APPENDIX,
+    "keep_references": EXTRACTION_KEEP_REFERENCES,
+}
+EXTRACTION_STAT_KEYS = ("pages", "pages_parsed", "pages_skipped", "skipped_tokens")
+_extraction_totals = dict.fromkeys(("documents",) + EXTRACTION_STAT_KEYS, 0)
+_extraction_totals_lock = threading.Lock()
+
+def configure_extraction(stop_at_references=None, skip_appendix=None, keep_references=None, full_text=None):
+    """
+    Set the process-wide lazy PDF extraction options (None leaves an option unchanged).
+    stop_at_references applies to every PDF; reference papers stop at their References heading
+    regardless, unless full_text is set.
+    """
+    for name, value in (("stop_at_references", stop_at_references), ("skip_appendix", skip_appendix),
+                        ("keep_references", keep_references), ("full_text", full_text)):
+        if value is not None:
+            _extraction_settings[name] = bool(value)
+
+def extraction_settings(reference_papers=False):
+    """The settings extract_document applies to a main paper, or to a reference paper if reference_papers."""
+    settings = {name: _extraction_settings[name] for name in ("stop_at_references", "skip_appendix", "keep_references")}
+    if _extraction_settings["full_text"]:
+        settings["stop_at_references"] = False
+    elif reference_papers:
+        settings["stop_at_references"] = True
+    return settings
+
+def _extraction_variant(settings):
+    """Extraction settings as part of the cache key, so each mode has its own cached text."""
+    return ",".join(f"{name}={int(settings[name])}" for name in sorted(settings))
+
+def current_extraction_variant():
+    """Extraction settings in effect for reference papers in this process, as in the cache key."""
+    return _extraction_variant(extraction_settings(reference_papers=True))
+
+_kept_references = {}  # file content hash -> reference list, filled while keep_references is set
+_kept_references_lock = threading.Lock()
+
+def _keep_references(file_path, references, content_hash=None):
+    """Remember a document's parsed reference list so Agent 1 can save it with the paper's record."""
+    if not references:
+        return
+    try:
+        content_hash = content_hash or file_content_hash(file_path)
+    except OSError:
+        return
+    with _kept_references_lock:
+        _kept_references[content_hash] = references
 
-# Debug print to see what model is being used
-print(f"🔍 DEBUG: Using GROQ_MODEL = {GROQ_MODEL}")
+def kept_references(file_hash):
+    """Reference list extracted from the file with this content hash, or "" if none was kept."""
+    with _kept_references_lock:
+        return _kept_references.get(file_hash, "")
+
+def _next_state(state, section_type, settings):
+    """Where a References or Appendix heading moves the page reader: body, appendix, references or done."""
+    if section_type == "references" and state in ("body", "appendix"):
+        if settings["keep_references"]:
+            return "references"
+        return "done" if settings["stop_at_references"] else "body"
+    if section_type == "appendix":
+        if state == "references":
+            # The reference list ends where the appendices start
+            return "done" if settings["stop_at_references"] or settings["skip_appendix"] else "body"
+        if state == "body" and settings["skip_appendix"]:
+            return "appendix"
+    return state
+
+def extract_pdf_document(pdf_path, settings=None):
+    """
+    Lazily extract a PDF, stopping at the References heading if settings say so.
+    Pages are parsed one at a time and scanned for References/Appendix headings (see sections.py);
+    once the body has ended, the remaining pages are not parsed at all. Appendix pages before the
+    References can be dropped too, and the reference list can be kept in its own field.
+    Headings in the first EXTRACTION_MIN_BODY_FRACTION of the pages are ignored, since they are
+    usually a table of contents.
+    Args:
+        pdf_path (str): PDF file
+        settings (dict): stop_at_references, skip_appendix and keep_references (default: extraction_settings())
+    Returns:
+        dict: text (the body), references (empty unless kept), pages, pages_parsed, pages_skipped
+        (pages left out of text, parsed or not) and skipped_tokens (estimated tokens left out of text)
+    """
+    from sections import SectionIndex
+    
+    settings = settings or extraction_settings()
+    lazy = any(settings.values())
+    body_pages, references, dropped = [], [], []
+    pages_parsed = pages_skipped = 0
+    with open(pdf_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            pdf_reader = PyPDF2.PdfReader(mapped)
+            pages = len(pdf_reader.pages)
+            first_heading_page = int(pages * EXTRACTION_MIN_BODY_FRACTION)
+            state = "body"
+            for number, page in enumerate(pdf_reader.pages):
+                if state == "done":
+                    break
+                text = page.extract_text() or ""
+                pages_parsed += 1
+                # Split the page where a heading changes what its text is
+                segments, start = [], 0
+                if lazy and number >= first_heading_page:
+                    for offset, section_type, _ in SectionIndex(text).headings:
+                        next_state = _next_state(state, section_type, settings)
+                        if next_state != state:
+                            segments.append((state, text[start:offset]))
+                            state, start = next_state, offset
+                segments.append((state, text[start:]))
+                body = "".join(segment for segment_state, segment in segments if segment_state == "body")
+                references.extend(segment for segment_state, segment in segments if segment_state == "references")
+                dropped.extend(segment for segment_state, segment in segments if segment_state in ("appendix", "done"))
+                if body.strip():
+                    body_pages.append(body)
+                elif text.strip():
+                    pages_skipped += 1
+    
+    # Unparsed pages are assumed to be as long as the parsed ones on average
+    parsed_tokens = estimate_tokens("\n".join(body_pages + references + dropped))
+    unparsed = pages - pages_parsed
+    skipped_tokens = estimate_tokens("\n".join(references + dropped))
+    if unparsed and pages_parsed:
+        skipped_tokens += round(parsed_tokens / pages_parsed * unparsed)
+    return {
+        "text": "\n".join(body_pages).strip(),
+        "references": "\n".join(references).strip(),
+        "pages": pages,
+        "pages_parsed": pages_parsed,
+        "pages_skipped": pages_skipped + unparsed,
+        "skipped_tokens": skipped_tokens,
+    }
 
 def extract_text_from_pdf(pdf_path):
-    """Extract text content from a PDF file."""
+    """Extract text content from a PDF file (lazily: see extract_pdf_document)."""
     try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text.strip()
+        return extract_pdf_document(pdf_path)["text"]
     except Exception as e:
         print(f"Error extracting text from {pdf_path}: {str(e)}")
         return ""
@@ -23,95 +204,881 @@ def extract_text_from_pdf(pdf_path):
 def extract_text_from_word(word_path):
     """Extract text content from a Word document (.docx or .doc)."""
     try:
-        # Try to import python-docx
-        from docx import Document
-        
-        # For .docx files
-        if word_path.lower().endswith('.docx'):
-            doc = Document(word_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text.strip()
-        
-        # For .doc files, we need python-docx2txt or similar
-        elif word_path.lower().endswith('.doc'):
-            try:
-                import docx2txt
-                text = docx2txt.process(word_path)
-                return text.strip()
-            except ImportError:
-                print(f"⚠️  docx2txt not installed. Cannot process .doc files: {word_path}")
-                return ""
-        
-        return ""
+        return "\n".join(iter_word_paragraphs(word_path)).strip()
     except ImportError:
-        print(f"⚠️  python-docx not installed. Cannot process Word files: {word_path}")
+        if word_path.lower().endswith('.doc'):
+            print(f"⚠️  docx2txt not installed. Cannot process .doc files: {word_path}")
+        else:
+            print(f"⚠️  python-docx not installed. Cannot process Word files: {word_path}")
         return ""
     except Exception as e:
         print(f"Error extracting text from {word_path}: {str(e)}")
         return ""
 
-def extract_text_from_file(file_path):
-    """Extract text from PDF or Word documents."""
+def _document(text, **stats):
+    """Extraction result for documents that are read in full."""
+    return {"text": text, "references": "", **dict.fromkeys(EXTRACTION_STAT_KEYS, 0), **stats}
+
+def _extract_document_uncached(file_path, settings):
+    """Extract text (and PDF page statistics) from PDF or Word documents, always parsing the file."""
     file_ext = os.path.splitext(file_path)[1].lower()
     
     if file_ext == '.pdf':
-        return extract_text_from_pdf(file_path)
+        try:
+            return extract_pdf_document(file_path, settings)
+        except Exception as e:
+            print(f"Error extracting text from {file_path}: {str(e)}")
+            return _document("")
     elif file_ext in ['.docx', '.doc']:
-        return extract_text_from_word(file_path)
+        return _document(extract_text_from_word(file_path))
     else:
         print(f"⚠️  Unsupported file type: {file_ext} for file: {file_path}")
-        return ""
+        return _document("")
 
-def chunk_text(text, chunk_size=CHUNK_SIZE):
-    """Split text into chunks of specified size."""
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    for word in words:
-        word_size = len(word) + 1  # +1 for space
-        if current_size + word_size > chunk_size and current_chunk:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
-            current_size = word_size
-        else:
-            current_chunk.append(word)
-            current_size += word_size
+def extract_document(file_path, use_cache=True, settings=None, content_hash=None):
+    """
+    Extract a document as a dict: text, references (when kept, see configure_extraction), pages,
+    pages_parsed, pages_skipped and skipped_tokens.
+    Results are cached on disk by file content hash and extraction settings, so unchanged files are not re-parsed.
+    content_hash (see file_content_hash) saves hashing the file again when the caller already has it.
+    """
+    settings = settings or extraction_settings()
+    cache = get_extraction_cache()
+    if not use_cache or not cache.enabled:
+        return _extract_document_uncached(file_path, settings)
+    
+    try:
+        key = cache.file_key(file_path, _extraction_variant(settings), content_hash)
+    except OSError as e:
+        print(f"Error reading {file_path}: {str(e)}")
+        return _document("")
     
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+    text = cache.get(key)
+    if text is not None:
+        return _document(text, **(cache.get_meta(key) or {}))
     
-    return chunks
+    document = _extract_document_uncached(file_path, settings)
+    cache.put(key, document["text"], {name: value for name, value in document.items() if name != "text"})
+    return document
 
-import json
-import threading
+def _add_extraction_stats(document):
+    """Add one document's page statistics to the run totals reported in telemetry."""
+    with _extraction_totals_lock:
+        _extraction_totals["documents"] += 1
+        for name in EXTRACTION_STAT_KEYS:
+            _extraction_totals[name] += document.get(name, 0)
+        totals = dict(_extraction_totals)
+    get_telemetry().annotate(**{f"extraction_{name}": value for name, value in totals.items()})
+
+def extract_text_from_file(file_path, use_cache=True):
+    """
+    Extract text from PDF or Word documents, such as a main paper.
+    PDFs are read in full unless EXTRACTION_STOP_AT_REFERENCES is set (see extract_pdf_document).
+    Results are cached on disk by file content hash, so unchanged files are not re-parsed.
+    """
+    document = extract_document(file_path, use_cache)
+    _add_extraction_stats(document)
+    _keep_references(file_path, document["references"])
+    return document["text"]
+
+def _extract_to_temp_file(index, file_path, out_dir, use_cache, settings, content_hash=None):
+    """
+    Process-pool worker: extract one file, write its text to out_dir/<index>.txt and any kept
+    reference list to out_dir/<index>.refs.txt. Returns (index, out_path, refs_path or None, page statistics).
+    """
+    document = extract_document(file_path, use_cache=use_cache, settings=settings, content_hash=content_hash)
+    out_path = os.path.join(out_dir, f"{index}.txt")
+    with open(out_path, 'w', encoding='utf-8') as file:
+        file.write(document["text"])
+    refs_path = None
+    if document["references"]:
+        refs_path = os.path.join(out_dir, f"{index}.refs.txt")
+        with open(refs_path, 'w', encoding='utf-8') as file:
+            file.write(document["references"])
+    return index, out_path, refs_path, {name: document[name] for name in EXTRACTION_STAT_KEYS}
+
+def _content_hash_or_none(file_path):
+    try:
+        return file_content_hash(file_path)
+    except OSError:
+        return None  # the worker reports the unreadable file
+
+def _print_extraction_savings(stats):
+    if stats["pages_skipped"]:
+        print(f"✂️  Lazy extraction: {stats['pages_skipped']} of {stats['pages']} pages skipped after "
+              f"References/Appendix headings (~{stats['skipped_tokens']:,} tokens kept out of prompts)")
+
+def iter_extracted_texts(file_paths, workers=None, use_cache=True, max_pending=None, reference_papers=False):
+    """
+    Extract documents with a process pool and yield (index, file_path, text) as each one finishes.
+    At most max_pending extractions (default: twice the worker count) are outstanding at once,
+    so a slow consumer holds back extraction instead of letting texts pile up in memory.
+    Files that fail to extract are yielded with empty text. With reference_papers, PDFs stop at
+    their References heading (see extraction_settings) and kept reference lists are available
+    afterwards through kept_references.
+    """
+    import shutil
+    import tempfile
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    
+    total = len(file_paths)
+    if not total:
+        return
+    workers = workers or EXTRACTION_WORKERS or os.cpu_count() or 1
+    workers = min(workers, total)
+    use_cache = use_cache and get_extraction_cache().enabled
+    # Passed to workers explicitly: spawned processes would not see configure_extraction
+    settings = extraction_settings(reference_papers)
+    stats = dict.fromkeys(EXTRACTION_STAT_KEYS, 0)
+    
+    if workers <= 1:
+        for i, file_path in enumerate(file_paths):
+            print(f"  Processing {i + 1}/{total}: {os.path.basename(file_path)}")
+            document = extract_document(file_path, use_cache=use_cache, settings=settings)
+            _add_extraction_stats(document)
+            _keep_references(file_path, document["references"])
+            for name in EXTRACTION_STAT_KEYS:
+                stats[name] += document[name]
+            yield i, file_path, document["text"]
+        _print_extraction_savings(stats)
+        return
+    
+    max_pending = max_pending or workers * 2
+    print(f"⚙️  Extracting {total} documents with {workers} worker processes...")
+    out_dir = tempfile.mkdtemp(prefix="autoscholar_extract_")
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            queued = iter(enumerate(file_paths))
+            futures = {}
+            done_count = 0
+            while True:
+                for i, file_path in queued:
+                    # Hashed here, not in the worker, so the caller's later file_content_hash is a memo hit
+                    content_hash = _content_hash_or_none(file_path) if use_cache else None
+                    futures[pool.submit(_extract_to_temp_file, i, file_path, out_dir, use_cache, settings,
+                                        content_hash)] = i
+                    if len(futures) >= max_pending:
+                        break
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = futures.pop(future)
+                    done_count += 1
+                    text = ""
+                    try:
+                        _, out_path, refs_path, document_stats = future.result()
+                        with open(out_path, 'r', encoding='utf-8') as file:
+                            text = file.read()
+                        os.remove(out_path)
+                        if refs_path:
+                            with open(refs_path, 'r', encoding='utf-8') as file:
+                                _keep_references(file_paths[i], file.read())
+                            os.remove(refs_path)
+                        _add_extraction_stats(document_stats)
+                        for name in EXTRACTION_STAT_KEYS:
+                            stats[name] += document_stats[name]
+                    except Exception as e:
+                        print(f"Error extracting text from {file_paths[i]}: {str(e)}")
+                    print(f"  Processed {done_count}/{total}: {os.path.basename(file_paths[i])}")
+                    yield i, file_paths[i], text
+        _print_extraction_savings(stats)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+@traced("extraction")
+def extract_texts_parallel(file_paths, workers=None, use_cache=True, reference_papers=False):
+    """
+    Extract text from many documents using a process pool.
+    Workers hand results back through temp files rather than pickling large strings.
+    reference_papers is passed on to iter_extracted_texts.
+    Returns a list of texts in the same order as file_paths.
+    """
+    texts = [""] * len(file_paths)
+    for i, _, text in iter_extracted_texts(file_paths, workers, use_cache, max_pending=len(file_paths),
+                                           reference_papers=reference_papers):
+        texts[i] = text
+    return texts
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+")
+_MAX_CARRY_CHARS = 20000  # Flush unterminated text (tables, reference lists) rather than buffering it
+
+def estimate_tokens(text):
+    """
+    Approximate the LLM token count of text without a tokenizer download.
+    Word runs count as roughly one token per 4 characters and punctuation as one token,
+    which tracks BPE tokenizers closely for English academic prose.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PATTERN.findall(text))
+
+def _iter_sentences(pieces):
+    """Yield sentences from a stream of text pieces, joining sentences that span piece boundaries."""
+    carry = ""
+    for piece in pieces:
+        text = f"{carry} {piece}" if carry else piece
+        sentences = _SENTENCE_END.split(text)
+        carry = sentences.pop()
+        if len(carry) > _MAX_CARRY_CHARS:
+            sentences.append(carry)
+            carry = ""
+        for sentence in sentences:
+            sentence = " ".join(sentence.split())
+            if sentence:
+                yield sentence
+    carry = " ".join(carry.split())
+    if carry:
+        yield carry
+
+def _split_long_sentence(sentence, max_tokens):
+    """Break a sentence that alone exceeds max_tokens on word boundaries."""
+    part = []
+    part_tokens = 0
+    for word in sentence.split():
+        word_tokens = estimate_tokens(word)
+        if part and part_tokens + word_tokens > max_tokens:
+            yield " ".join(part), part_tokens
+            part = []
+            part_tokens = 0
+        part.append(word)
+        part_tokens += word_tokens
+    if part:
+        yield " ".join(part), part_tokens
+
+def iter_chunks(text_or_pieces, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Lazily split text into chunks of at most chunk_size (estimated) tokens.
+    Chunks end on sentence boundaries and each chunk repeats up to `overlap` tokens of
+    trailing sentences from the previous one. Accepts a single string or any iterable of
+    strings (e.g. iter_document_text), so a document can be chunked while it is still
+    being extracted.
+    """
+    pieces = [text_or_pieces] if isinstance(text_or_pieces, str) else text_or_pieces
+    current = []  # list of (sentence, tokens)
+    current_tokens = 0
+    
+    for sentence in _iter_sentences(pieces):
+        sentence_tokens = estimate_tokens(sentence)
+        parts = [(sentence, sentence_tokens)] if sentence_tokens <= chunk_size else _split_long_sentence(sentence, chunk_size)
+        for part, part_tokens in parts:
+            if current and current_tokens + part_tokens > chunk_size:
+                yield " ".join(text for text, _ in current)
+                # Carry trailing sentences into the next chunk as overlap
+                carried = []
+                carried_tokens = 0
+                for text, tokens in reversed(current):
+                    if carried_tokens + tokens > overlap or carried_tokens + tokens + part_tokens > chunk_size:
+                        break
+                    carried.insert(0, (text, tokens))
+                    carried_tokens += tokens
+                current = carried
+                current_tokens = carried_tokens
+            current.append((part, part_tokens))
+            current_tokens += part_tokens
+    
+    if current:
+        yield " ".join(text for text, _ in current)
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Split text (or a stream of text pieces) into token-bounded, overlapping chunks."""
+    return list(iter_chunks(text, chunk_size, overlap))
+
+import asyncio
 from typing import List, Union
 
-def call_groq_api(prompt_or_prompts: Union[str, List[str]], max_retries=MAX_RETRIES, batch_mode=True, threads=4):
+def _lookup_cached(prompts):
+    """Return (results, miss_indices) with cached responses filled in and misses left as None."""
+    cache = get_response_cache()
+    results = [cache.get(GROQ_MODEL, prompt, GROQ_TEMPERATURE, GROQ_MAX_TOKENS) for prompt in prompts]
+    miss_indices = [i for i, result in enumerate(results) if result is None]
+    print(f"💾 Response cache: {len(prompts) - len(miss_indices)} hit(s), {len(miss_indices)} miss(es)")
+    return results, miss_indices
+
+def _store_fresh(prompts, results, miss_indices, fresh):
+    """Merge freshly fetched responses into results and write successful ones to the cache."""
+    cache = get_response_cache()
+    for i, result in zip(miss_indices, fresh):
+        results[i] = result
+        if result is not None and not result.startswith("ERROR:"):
+            cache.put(GROQ_MODEL, prompts[i], GROQ_TEMPERATURE, GROQ_MAX_TOKENS, result)
+    return results
+
+DISPATCH_MODES = ["auto", "batch", "async", "sync"]
+_dispatch_settings = {"mode": GROQ_DISPATCH, "latency_target": DISPATCH_LATENCY_TARGET_SECONDS}
+
+def configure_dispatch(mode=None, latency_target=None):
+    """Set the process-wide default dispatch mode and latency target (seconds) for call_groq_api."""
+    if mode is not None:
+        if mode not in DISPATCH_MODES:
+            raise ValueError(f"Unknown dispatch mode: {mode}")
+        _dispatch_settings["mode"] = mode
+    if latency_target is not None:
+        _dispatch_settings["latency_target"] = latency_target
+
+def dispatch_mode():
+    return _dispatch_settings["mode"]
+
+def plan_dispatch(prompts, latency_target=None, concurrency=None):
+    """
+    Choose how to send a list of prompts and explain why.
+    Returns (mode, reason) where mode is "sync", "async" or "batch".
+    Sync/async are used when the rate-limited estimate fits the latency target;
+    larger workloads go to the Batch API, which is cheaper and has its own quota.
+    The estimate assumes the rate limiter's current concurrency limit (capped by concurrency).
+    """
+    latency_target = latency_target if latency_target is not None else _dispatch_settings["latency_target"]
+    count = len(prompts)
+    total_tokens = sum(estimate_tokens(prompt) + GROQ_MAX_TOKENS for prompt in prompts)
+    
+    if count <= SYNC_DISPATCH_MAX_PROMPTS:
+        return "sync", f"{count} prompt(s) is small enough for sequential calls"
+    
+    limiter = get_rate_limiter()
+    rpm = limiter.requests.refill_per_second * 60
+    tpm = limiter.tokens.refill_per_second * 60
+    # The limiter's current in-flight limit, not its ceiling: it only grows once calls succeed
+    slots = max(1, int(limiter.concurrency_limit))
+    if concurrency:
+        slots = min(slots, concurrency)
+    rate_bound = max(count / rpm * 60 if rpm else 0, total_tokens / tpm * 60 if tpm else 0)
+    concurrency_bound = -(-count // slots) * GROQ_EST_CALL_SECONDS
+    estimate = max(rate_bound, concurrency_bound)
+    details = (f"{count} prompts, ~{total_tokens:,} tokens, est. {estimate:.0f}s at {rpm:.0f} RPM / {tpm:,.0f} TPM "
+               f"with {slots} in flight")
+    
+    if estimate <= latency_target:
+        return "async", f"{details} fits the {latency_target:.0f}s latency target"
+    return "batch", f"{details} exceeds the {latency_target:.0f}s latency target"
+
+def call_groq_api(prompt_or_prompts: Union[str, List[str]], max_retries=MAX_RETRIES, batch_mode=None, threads=None,
+                  use_cache=True, dispatch=None):
     """
-    Make API call to GROQ with retry logic. Supports single prompt (sync) or list of prompts (batch).
-    If batch_mode=True and input is a list, uses Groq Batch API for efficiency.
-    If batch_mode=False, uses multithreading for parallel sync calls.
+    Make API call to GROQ with retry logic. Supports single prompt (sync) or list of prompts.
+    For a list, `dispatch` selects how the prompts are sent:
+      - "batch": Groq Batch API
+      - "async": concurrent calls on the asyncio engine, at most `threads` in flight
+      - "sync": one call after another
+      - "auto" (default, see configure_dispatch): plan_dispatch picks one per workload
+    The legacy batch_mode flag maps to "batch"/"async" when dispatch is not given.
+    The adaptive rate limiter paces sync/async calls to the account's RPM/TPM quota.
+    Responses are served from the persistent response cache when possible; for a list,
+    only the cache misses are sent to the API and results are returned in prompt order.
+    Failed prompts in a list come back as "ERROR: ..." strings, except that a list holding a
+    single prompt raises like a single-prompt call, so its error text is never used as a result.
     """
-    client = Groq(api_key=GROQ_API_KEY)
+    if dispatch is None:
+        dispatch = _dispatch_settings["mode"] if batch_mode is None else ("batch" if batch_mode else "async")
+    
+    cache = get_response_cache()
+    use_cache = use_cache and cache.enabled
+    
+    if isinstance(prompt_or_prompts, str):
+        if use_cache:
+            cached = cache.get(GROQ_MODEL, prompt_or_prompts, GROQ_TEMPERATURE, GROQ_MAX_TOKENS)
+            if cached is not None:
+                return cached
+        result = _call_groq_api_uncached(prompt_or_prompts, max_retries, dispatch, threads)
+        if use_cache:
+            cache.put(GROQ_MODEL, prompt_or_prompts, GROQ_TEMPERATURE, GROQ_MAX_TOKENS, result)
+        return result
+    
+    prompts = list(prompt_or_prompts)
+    if not use_cache:
+        results = _call_groq_api_uncached(prompts, max_retries, dispatch, threads)
+    else:
+        results, miss_indices = _lookup_cached(prompts)
+        if miss_indices:
+            fresh = _call_groq_api_uncached([prompts[i] for i in miss_indices], max_retries, dispatch, threads)
+            results = _store_fresh(prompts, results, miss_indices, fresh)
+    if len(results) == 1 and results[0].startswith("ERROR:"):
+        raise Exception(results[0][len("ERROR:"):].strip())
+    return results
+
+def _rate_limit_details(error):
+    """Return (is_throttled, headers, retry_after) for an exception raised by the Groq SDK."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    throttled = isinstance(error, RateLimitError) or getattr(error, "status_code", None) == 429
+    retry_after = parse_reset_duration(headers.get("retry-after")) if headers is not None else None
+    return throttled, headers, retry_after
+
+def _used_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+def _record_call(kind, sent_at, queue_wait, attempt, status=None, usage=None, error=None, **extra):
+    """Add one request attempt (sent at perf_counter time sent_at) to the run telemetry."""
+    latency = time.perf_counter() - sent_at
+    get_telemetry().record_call(
+        kind,
+        started_ns=time.time_ns() - int(latency * 1e9),
+        latency=latency,
+        queue_wait=queue_wait,
+        attempt=attempt,
+        status=status if status is not None else getattr(error, "status_code", None),
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+        error=str(error) if error else None,
+        **extra
+    )
+
+def _send_chat_request(client, prompt, attempt=1):
+    """Send one chat completion through the rate limiter and return the message content."""
+    limiter = get_rate_limiter()
+    estimated = estimate_tokens(prompt) + GROQ_MAX_TOKENS
+    queued_at = time.perf_counter()
+    limiter.acquire(estimated)
+    sent_at = time.perf_counter()
+    try:
+        raw = client.chat.completions.with_raw_response.create(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=GROQ_TEMPERATURE,
+            max_tokens=GROQ_MAX_TOKENS
+        )
+        response = raw.parse()
+    except Exception as e:
+        throttled, headers, retry_after = _rate_limit_details(e)
+        limiter.release("throttled" if throttled else "error", headers, estimated, retry_after=retry_after)
+        _record_call("sync", sent_at, sent_at - queued_at, attempt, error=e)
+        raise
+    limiter.release("success", raw.headers, estimated, _used_tokens(response))
+    _record_call("sync", sent_at, sent_at - queued_at, attempt, raw.status_code, response.usage)
+    return response.choices[0].message.content
+
+async def _send_chat_request_async(client, prompt, attempt=1, queued_at=None):
+    """Async counterpart of _send_chat_request; queued_at is when the caller started waiting for a slot."""
+    limiter = get_rate_limiter()
+    estimated = estimate_tokens(prompt) + GROQ_MAX_TOKENS
+    queued_at = queued_at or time.perf_counter()
+    await limiter.acquire_async(estimated)
+    sent_at = time.perf_counter()
+    try:
+        raw = await client.chat.completions.with_raw_response.create(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=GROQ_TEMPERATURE,
+            max_tokens=GROQ_MAX_TOKENS
+        )
+        response = await raw.parse()
+    except Exception as e:
+        throttled, headers, retry_after = _rate_limit_details(e)
+        limiter.release("throttled" if throttled else "error", headers, estimated, retry_after=retry_after)
+        _record_call("async", sent_at, sent_at - queued_at, attempt, error=e)
+        raise
+    limiter.release("success", raw.headers, estimated, _used_tokens(response))
+    _record_call("async", sent_at, sent_at - queued_at, attempt, raw.status_code, response.usage)
+    return response.choices[0].message.content
+
+async def _async_single_call(client, prompt, semaphore, max_retries):
+    """
+    Send one prompt on the async client, holding a semaphore slot only while the request is in flight.
+    429s are paced by the rate limiter and do not use up the retry budget (up to MAX_THROTTLE_RETRIES).
+    """
+    attempt = 0
+    throttles = 0
+    while True:
+        queued_at = time.perf_counter()
+        try:
+            async with semaphore:
+                return await _send_chat_request_async(client, prompt, attempt + throttles + 1, queued_at)
+        except Exception as e:
+            throttled, _, _ = _rate_limit_details(e)
+            if throttled and throttles < MAX_THROTTLE_RETRIES:
+                throttles += 1
+                continue
+            attempt += 1
+            print(f"API call attempt {attempt} failed: {str(e)}")
+            if attempt < max_retries:
+                await asyncio.sleep(2 ** (attempt - 1))
+            else:
+                raise Exception(f"All {max_retries} API call attempts failed")
+
+async def _run_prompts_async(prompts, max_retries=MAX_RETRIES, concurrency=None):
+    """
+    Run prompts concurrently on AsyncGroq with a sliding window of at most `concurrency` slots
+    (default GROQ_MAX_CONCURRENCY): a new request starts as soon as any in-flight request
+    finishes and the adaptive rate limiter admits it.
+    Failed prompts come back as "ERROR: ..." strings, in prompt order.
+    """
+    semaphore = asyncio.Semaphore(concurrency or GROQ_MAX_CONCURRENCY)
+    client = get_async_groq_client()
+    
+    async def guarded(prompt):
+        try:
+            return await _async_single_call(client, prompt, semaphore, max_retries)
+        except Exception as e:
+            return f"ERROR: {e}"
+    
+    return list(await asyncio.gather(*(guarded(prompt) for prompt in prompts)))
+
+async def call_groq_api_async(prompt_or_prompts: Union[str, List[str]], max_retries=MAX_RETRIES, concurrency=None,
+                              use_cache=True):
+    """
+    Awaitable counterpart of call_groq_api for parallel sync-style calls.
+    Accepts a single prompt or a list; lists return results in prompt order.
+    """
+    single = isinstance(prompt_or_prompts, str)
+    prompts = [prompt_or_prompts] if single else list(prompt_or_prompts)
+    use_cache = use_cache and get_response_cache().enabled
+    
+    if use_cache:
+        results, miss_indices = _lookup_cached(prompts)
+        if miss_indices:
+            fresh = await _run_prompts_async([prompts[i] for i in miss_indices], max_retries, concurrency)
+            _store_fresh(prompts, results, miss_indices, fresh)
+    else:
+        results = await _run_prompts_async(prompts, max_retries, concurrency)
+    
+    if single:
+        if results[0].startswith("ERROR:"):
+            raise Exception(results[0][len("ERROR: "):])
+        return results[0]
+    return results
+
+_async_loop = None
+_async_loop_lock = threading.Lock()
+
+def _background_loop():
+    """
+    Event loop on a daemon thread that lives for the whole run. Every run_async call uses it, so the
+    loop's pooled AsyncGroq client and its open connections are reused from one call to the next.
+    """
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="groq-async-loop", daemon=True).start()
+            _async_loop = loop
+            atexit.register(_close_background_loop)
+    return _async_loop
+
+def _close_background_loop():
+    """Close the background loop's AsyncGroq client, then stop the loop."""
+    global _async_loop
+    with _async_loop_lock:
+        loop, _async_loop = _async_loop, None
+    if loop is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(close_async_groq_client(), loop).result(timeout=5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+
+def run_async(coro):
+    """Run a coroutine to completion from sync code, even if an event loop is already running."""
+    loop = _background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_async cannot be called from a coroutine running on its own loop; await it instead")
+    # The caller's context (telemetry spans) is copied into the task
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+_stream_stats = []  # per streamed call: ttft_seconds, duration_seconds, completion_tokens, tokens_per_second
+
+def stream_stats():
+    """Return the timing records of every streamed completion made by this process."""
+    return list(_stream_stats)
+
+def _chunk_usage(chunk):
+    """Token usage from a stream chunk; Groq sends it in x_groq.usage on the final chunk."""
+    x_groq = getattr(chunk, "x_groq", None)
+    return getattr(x_groq, "usage", None) or getattr(chunk, "usage", None)
+
+def _chunk_text(chunk):
+    choices = getattr(chunk, "choices", None)
+    return choices[0].delta.content if choices else None
+
+def _record_stream(started, first_token_at, usage, text):
+    """Record and print time-to-first-token and generation speed for one streamed completion."""
+    finished = time.perf_counter()
+    completion_tokens = getattr(usage, "completion_tokens", None) or estimate_tokens(text)
+    ttft = (first_token_at or finished) - started
+    generating = finished - (first_token_at or finished)
+    stats = {
+        "ttft_seconds": round(ttft, 3),
+        "duration_seconds": round(finished - started, 3),
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": round(completion_tokens / generating, 1) if generating > 0 else None,
+    }
+    _stream_stats.append(stats)
+    speed = f", {stats['tokens_per_second']} tokens/s" if stats["tokens_per_second"] else ""
+    print(f"  ⏱️  Streamed {completion_tokens} tokens: first token after {ttft:.2f}s{speed}")
+    return stats
+
+def _iter_chat_stream(client, prompt, attempt=1, queued_at=None):
+    """Send one streaming chat completion through the rate limiter and yield content deltas."""
+    limiter = get_rate_limiter()
+    estimated = estimate_tokens(prompt) + GROQ_MAX_TOKENS
+    queued_at = queued_at or time.perf_counter()
+    limiter.acquire(estimated)
+    started = time.perf_counter()
+    try:
+        raw = client.chat.completions.with_raw_response.create(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=GROQ_TEMPERATURE,
+            max_tokens=GROQ_MAX_TOKENS,
+            stream=True
+        )
+        stream = raw.parse()
+    except Exception as e:
+        throttled, headers, retry_after = _rate_limit_details(e)
+        limiter.release("throttled" if throttled else "error", headers, estimated, retry_after=retry_after)
+        _record_call("stream", started, started - queued_at, attempt, error=e)
+        raise
+    
+    first_token_at = None
+    usage = None
+    parts = []
+    outcome = "error"
+    try:
+        for chunk in stream:
+            usage = _chunk_usage(chunk) or usage
+            delta = _chunk_text(chunk)
+            if delta:
+                first_token_at = first_token_at or time.perf_counter()
+                parts.append(delta)
+                yield delta
+        outcome = "success"
+    except Exception as e:
+        _record_call("stream", started, started - queued_at, attempt, raw.status_code, usage, error=e)
+        raise
+    finally:
+        stream.close()
+        limiter.release(outcome, raw.headers, estimated, getattr(usage, "total_tokens", None))
+    stats = _record_stream(started, first_token_at, usage, "".join(parts))
+    _record_call("stream", started, started - queued_at, attempt, raw.status_code, usage,
+                 ttft_seconds=stats["ttft_seconds"], tokens_per_second=stats["tokens_per_second"])
+
+async def _iter_chat_stream_async(client, prompt, attempt=1, queued_at=None):
+    """Async counterpart of _iter_chat_stream."""
+    limiter = get_rate_limiter()
+    estimated = estimate_tokens(prompt) + GROQ_MAX_TOKENS
+    queued_at = queued_at or time.perf_counter()
+    await limiter.acquire_async(estimated)
+    started = time.perf_counter()
+    try:
+        raw = await client.chat.completions.with_raw_response.create(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=GROQ_TEMPERATURE,
+            max_tokens=GROQ_MAX_TOKENS,
+            stream=True
+        )
+        stream = await raw.parse()
+    except Exception as e:
+        throttled, headers, retry_after = _rate_limit_details(e)
+        limiter.release("throttled" if throttled else "error", headers, estimated, retry_after=retry_after)
+        _record_call("stream", started, started - queued_at, attempt, error=e)
+        raise
+    
+    first_token_at = None
+    usage = None
+    parts = []
+    outcome = "error"
+    try:
+        async for chunk in stream:
+            usage = _chunk_usage(chunk) or usage
+            delta = _chunk_text(chunk)
+            if delta:
+                first_token_at = first_token_at or time.perf_counter()
+                parts.append(delta)
+                yield delta
+        outcome = "success"
+    except Exception as e:
+        _record_call("stream", started, started - queued_at, attempt, raw.status_code, usage, error=e)
+        raise
+    finally:
+        await stream.close()
+        limiter.release(outcome, raw.headers, estimated, getattr(usage, "total_tokens", None))
+    stats = _record_stream(started, first_token_at, usage, "".join(parts))
+    _record_call("stream", started, started - queued_at, attempt, raw.status_code, usage,
+                 ttft_seconds=stats["ttft_seconds"], tokens_per_second=stats["tokens_per_second"])
+
+def iter_groq_stream(prompt, max_retries=MAX_RETRIES, use_cache=True):
+    """
+    Yield the completion for prompt piece by piece as the tokens arrive (stream=True).
+    Failures before the first token are retried like call_groq_api; once text has been
+    yielded a failure is raised, since the caller has already consumed part of the answer.
+    A cached response is yielded in one piece, and a finished stream is stored in the cache.
+    """
+    cache = get_response_cache()
+    use_cache = use_cache and cache.enabled
+    if use_cache:
+        cached = cache.get(GROQ_MODEL, prompt, GROQ_TEMPERATURE, GROQ_MAX_TOKENS)
+        if cached is not None:
+            yield cached
+            return
+    
+    client = get_groq_client()
+    parts = []
+    attempt = 0
+    throttles = 0
+    while True:
+        try:
+            for delta in _iter_chat_stream(client, prompt, attempt + throttles + 1):
+                parts.append(delta)
+                yield delta
+            break
+        except Exception as e:
+            if parts:
+                raise
+            throttled, _, _ = _rate_limit_details(e)
+            if throttled and throttles < MAX_THROTTLE_RETRIES:
+                throttles += 1  # the rate limiter has already paused for retry-after
+                continue
+            attempt += 1
+            print(f"API call attempt {attempt} failed: {str(e)}")
+            if attempt < max_retries:
+                time.sleep(2 ** (attempt - 1))
+            else:
+                raise Exception(f"All {max_retries} API call attempts failed")
+    
+    if use_cache:
+        cache.put(GROQ_MODEL, prompt, GROQ_TEMPERATURE, GROQ_MAX_TOKENS, "".join(parts))
+
+def call_groq_api_stream(prompt, output_path=None, on_token=None, max_retries=MAX_RETRIES, use_cache=True):
+    """
+    Stream one completion, appending each piece to a temporary file next to output_path (and
+    passing it to on_token) as soon as it arrives. The file replaces output_path once the
+    completion has finished; a failed stream leaves output_path untouched. Returns the full completion text.
+    """
+    parts = []
+    tmp_path = f"{output_path}.{os.getpid()}.tmp" if output_path else None
+    output = open(tmp_path, 'w', encoding='utf-8') if tmp_path else None
+    finished = False
+    try:
+        for delta in iter_groq_stream(prompt, max_retries, use_cache):
+            parts.append(delta)
+            if output:
+                output.write(delta)
+                output.flush()
+            if on_token:
+                on_token(delta)
+        finished = True
+    finally:
+        if output:
+            output.close()
+            _finish_partial(tmp_path, output_path, finished)
+    return "".join(parts)
+
+def _finish_partial(tmp_path, path, finished):
+    """Move a finished streamed file into place at path, or delete it if its stream failed."""
+    if finished:
+        os.replace(tmp_path, path)
+        return
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+
+async def _async_stream_call(client, prompt, semaphore, max_retries, on_token):
+    """Streaming counterpart of _async_single_call; returns the full completion text."""
+    parts = []
+    attempt = 0
+    throttles = 0
+    while True:
+        queued_at = time.perf_counter()
+        try:
+            async with semaphore:
+                async for delta in _iter_chat_stream_async(client, prompt, attempt + throttles + 1, queued_at):
+                    parts.append(delta)
+                    on_token(delta)
+            return "".join(parts)
+        except Exception as e:
+            if parts:
+                raise
+            throttled, _, _ = _rate_limit_details(e)
+            if throttled and throttles < MAX_THROTTLE_RETRIES:
+                throttles += 1
+                continue
+            attempt += 1
+            print(f"API call attempt {attempt} failed: {str(e)}")
+            if attempt < max_retries:
+                await asyncio.sleep(2 ** (attempt - 1))
+            else:
+                raise Exception(f"All {max_retries} API call attempts failed")
+
+def call_groq_api_stream_many(prompts, output_paths=None, on_token=None, max_retries=MAX_RETRIES, concurrency=None,
+                              use_cache=True):
+    """
+    Stream several completions in parallel on the asyncio engine.
+    Each prompt's pieces are appended to a temporary file next to its output_paths entry as they
+    arrive, and on_token(index, delta) is called for every piece. A finished completion's file
+    replaces its output path; a failed one's is deleted, leaving the output path untouched.
+    Returns the full texts in prompt order; failed prompts come back as "ERROR: ..." strings.
+    """
+    prompts = list(prompts)
+    cache = get_response_cache()
+    use_cache = use_cache and cache.enabled
+    output_paths = list(output_paths or [None] * len(prompts))
+    tmp_paths = [f"{path}.{os.getpid()}.tmp" if path else None for path in output_paths]
+    outputs = [open(path, 'w', encoding='utf-8') if path else None for path in tmp_paths]
+    
+    def emit(index, delta):
+        if outputs[index]:
+            outputs[index].write(delta)
+            outputs[index].flush()
+        if on_token:
+            on_token(index, delta)
+    
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency or GROQ_MAX_CONCURRENCY)
+        client = get_async_groq_client()
+        
+        async def guarded(index, prompt):
+            if use_cache:
+                cached = cache.get(GROQ_MODEL, prompt, GROQ_TEMPERATURE, GROQ_MAX_TOKENS)
+                if cached is not None:
+                    emit(index, cached)
+                    return cached
+            try:
+                text = await _async_stream_call(client, prompt, semaphore, max_retries,
+                                                lambda delta: emit(index, delta))
+            except Exception as e:
+                return f"ERROR: {e}"
+            if use_cache:
+                cache.put(GROQ_MODEL, prompt, GROQ_TEMPERATURE, GROQ_MAX_TOKENS, text)
+            return text
+        
+        return list(await asyncio.gather(*(guarded(i, prompt) for i, prompt in enumerate(prompts))))
+    
+    texts = None
+    try:
+        texts = run_async(run_all())
+        return texts
+    finally:
+        for index, output in enumerate(outputs):
+            if output:
+                output.close()
+                finished = texts is not None and not texts[index].startswith("ERROR:")
+                _finish_partial(tmp_paths[index], output_paths[index], finished)
+
+def _call_groq_api_uncached(prompt_or_prompts, max_retries=MAX_RETRIES, dispatch="auto", threads=None):
+    """Send prompt(s) to GROQ without consulting the response cache."""
+    client = get_groq_client()
 
     def single_call(prompt):
-        for attempt in range(max_retries):
+        attempt = 0
+        throttles = 0
+        while True:
             try:
-                response = client.chat.completions.create(
-                    model=GROQ_MODEL,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.7,
-                    max_tokens=2048
-                )
-                return response.choices[0].message.content
+                return _send_chat_request(client, prompt, attempt + throttles + 1)
             except Exception as e:
-                print(f"API call attempt {attempt + 1} failed: {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                throttled, _, _ = _rate_limit_details(e)
+                if throttled and throttles < MAX_THROTTLE_RETRIES:
+                    throttles += 1  # the rate limiter has already paused for retry-after
+                    continue
+                attempt += 1
+                print(f"API call attempt {attempt} failed: {str(e)}")
+                if attempt < max_retries:
+                    time.sleep(2 ** (attempt - 1))
                 else:
                     raise Exception(f"All {max_retries} API call attempts failed")
 
@@ -119,99 +1086,30 @@ def call_groq_api(prompt_or_prompts: Union[str, List[str]], max_retries=MAX_RETR
     if isinstance(prompt_or_prompts, str):
         return single_call(prompt_or_prompts)
 
-    # List of prompts (batch or parallel)
+    # List of prompts (batch, parallel or sequential)
     prompts = prompt_or_prompts
-    results = [None] * len(prompts)
+    if not prompts:
+        return []
+    
+    if dispatch == "auto":
+        dispatch, reason = plan_dispatch(prompts, concurrency=threads)
+        print(f"🧭 Dispatch: {dispatch} ({reason})")
 
-    if batch_mode:
+    if dispatch == "batch":
         # --- Batch API logic ---
-        batch_file = "batch_file.jsonl"
-        print(f"🔍 DEBUG: Creating batch file with model: {GROQ_MODEL}")
-        with open(batch_file, "w", encoding="utf-8") as f:
-            for i, prompt in enumerate(prompts):
-                req = {
-                    "custom_id": f"req-{i}",
-                    "method": "POST",
-                    "url": "/v1/chat/completions",
-                    "body": {
-                        "model": GROQ_MODEL,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.7,
-                        "max_tokens": 2048
-                    }
-                }
-                f.write(json.dumps(req, ensure_ascii=False) + "\n")
-        print(f"🔍 DEBUG: Batch file created with {len(prompts)} requests using model: {GROQ_MODEL}")
-
-        # Upload batch file
-        file_obj = client.files.create(file=open(batch_file, "rb"), purpose="batch")
-        file_id = getattr(file_obj, "id", None) or file_obj["id"] if isinstance(file_obj, dict) else file_obj.id
-
-        # Create batch job
-        batch = client.batches.create(
-            completion_window="24h",
-            endpoint="/v1/chat/completions",
-            input_file_id=file_id,
-        )
-        batch_id = getattr(batch, "id", None) or batch["id"] if isinstance(batch, dict) else batch.id
-
-        # Wait for batch to complete
-        import time
-        while True:
-            status = client.batches.retrieve(batch_id)
-            # status may be object or dict
-            status_dict = status if isinstance(status, dict) else status.__dict__
-            if status_dict["status"] in ["completed", "failed", "expired", "cancelled"]:
-                break
-            print(f"Batch status: {status_dict['status']}... waiting...")
-            time.sleep(10)
-
-        if status_dict["status"] != "completed":
-            raise Exception(f"Batch job failed or did not complete: {status_dict['status']}")
-
-        # Download results
-        output_file_id = status_dict["output_file_id"]
-        output = client.files.content(output_file_id)
-        # output may be object with write_to_file method
-        if hasattr(output, "write_to_file"):
-            output.write_to_file("batch_results.jsonl")
-        else:
-            # fallback: assume it's bytes
-            with open("batch_results.jsonl", "wb") as f:
-                f.write(output)
-
-        # Map results by custom_id
-        id_to_result = {}
-        with open("batch_results.jsonl", "r", encoding="utf-8") as f:
-            for line in f:
-                obj = json.loads(line)
-                idx = int(obj["custom_id"].split("-")[-1])
-                # Defensive: handle both dict and object for response
-                response_body = obj["response"]["body"] if isinstance(obj["response"], dict) else obj["response"].body
-                id_to_result[idx] = response_body["choices"][0]["message"]["content"]
-        # Return results in order
-        return [id_to_result[i] for i in range(len(prompts))]
-    else:
-        # --- Multithreading for parallel sync calls ---
-        def worker(i, prompt):
+        return run_batch_prompts(client, prompts)
+    elif dispatch == "sync":
+        # --- Sequential sync calls ---
+        results = []
+        for prompt in prompts:
             try:
-                results[i] = single_call(prompt)
+                results.append(single_call(prompt))
             except Exception as e:
-                results[i] = f"ERROR: {e}"
-
-        threads_list = []
-        for i, prompt in enumerate(prompts):
-            t = threading.Thread(target=worker, args=(i, prompt))
-            threads_list.append(t)
-            t.start()
-            if len(threads_list) >= threads:
-                for t in threads_list:
-                    t.join()
-                threads_list = []
-        # Join any remaining threads
-        for t in threads_list:
-            t.join()
+                results.append(f"ERROR: {e}")
         return results
+    else:
+        # --- asyncio engine for parallel sync calls ---
+        return run_async(_run_prompts_async(prompts, max_retries, threads))
 
 def get_document_files(folder_path):
     """Get all document files (PDF, Word) from a folder."""
@@ -248,59 +1146,9 @@ def load_text_file(filepath):
         return ""
 
 def extract_discussion_section(paper_text):
-    """Extract Discussion/Conclusion section from paper text."""
-    import re
-    
-    # Common section headers to look for
-    discussion_patterns = [
-        r'\b(DISCUSSION|Discussion)\b',
-        r'\b(CONCLUSION|Conclusion|CONCLUSIONS|Conclusions)\b', 
-        r'\b(DISCUSSION AND CONCLUSION|Discussion and Conclusion)\b',
-        r'\b(IMPLICATIONS|Implications)\b',
-        r'\b(THEORETICAL IMPLICATIONS|Theoretical Implications)\b'
-    ]
-    
-    # Split text into sections
-    lines = paper_text.split('\n')
-    
-    discussion_start = -1
-    references_start = -1
-    
-    # Find discussion section start
-    for i, line in enumerate(lines):
-        line_upper = line.strip().upper()
-        for pattern in discussion_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                # Check if this looks like a section header (short line, possibly numbered)
-                if len(line.strip()) < 100 and (
-                    line_upper.startswith(('DISCUSSION', 'CONCLUSION', 'IMPLICATIONS')) or
-                    re.match(r'^\d+\.?\s*(DISCUSSION|CONCLUSION|IMPLICATIONS)', line_upper)
-                ):
-                    discussion_start = i
-                    break
-        if discussion_start != -1:
-            break
-    
-    # Find references section start
-    for i, line in enumerate(lines):
-        line_upper = line.strip().upper()
-        if re.match(r'^\s*(REFERENCES|BIBLIOGRAPHY|WORKS CITED)\s*$', line_upper):
-            references_start = i
-            break
-    
-    # Extract discussion section
-    if discussion_start != -1:
-        end_index = references_start if references_start != -1 else len(lines)
-        discussion_text = '\n'.join(lines[discussion_start:end_index])
-        
-        # If discussion section is very short, return the last 30% of the paper instead
-        if len(discussion_text.strip()) < 500:
-            last_third_start = int(len(lines) * 0.7)
-            discussion_text = '\n'.join(lines[last_third_start:end_index])
-        
-        return discussion_text.strip()
-    else:
-        # If no discussion section found, return last 30% of paper
-        last_third_start = int(len(lines) * 0.7)
-        end_index = references_start if references_start != -1 else len(lines)
-        return '\n'.join(lines[last_third_start:end_index]).strip()
+    """
+    Extract Discussion/Conclusion section from paper text.
+    Uses the cached section index, so repeated calls for the same paper do not rescan it.
+    """
+    from sections import get_section_index
+    return get_section_index(paper_text).discussion()